@@ -0,0 +1,268 @@
+"""
+Benchmarks for the specgfx hot paths. These run headless, using SDL's dummy video and audio
+drivers, and write their results as JSON so that they can be compared between releases.
+
+Example::
+
+    python benchmark.py --repeat 20 --output bench.json
+    python benchmark.py render print
+
+A benchmark is a setup function that returns the function to be timed. If that function returns a
+number, it is used as the time taken instead of timing the whole call.
+"""
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from specgfx import specgfx as sg
+
+benchmarks = {}
+
+def benchmark(name):
+    def register(f):
+        benchmarks[name] = f
+        return f
+    return register
+
+def fillscreen():
+    rng = np.random.default_rng(1982)
+    memory = sg.GETMEMORY()
+    memory[0x4000:0x5b00] = rng.integers(0, 256, 0x1b00, dtype=np.uint8)
+
+@benchmark("render_cyrender")
+def bench_cyrender():
+    fillscreen()
+    def run():
+        s = sg.GETSCREEN()
+        sg.cyrender(s.memory, s.specarray, s.ipalette, s.flashframe, s.showcursor, s.cursorx, s.cursory)
+    return run
+
+def benchscreen(**options):
+    fillscreen()
+    s = sg.Screen(HEADLESS=True, **options)
+    s.memory[:] = sg.GETMEMORY()
+    return s.render
+
+@benchmark("render_lut")
+def bench_lut():
+    return benchscreen(LUT=True)
+
+@benchmark("render_indexed")
+def bench_indexed():
+    return benchscreen(INDEXED=True)
+
+@benchmark("render_lut_indexed")
+def bench_lut_indexed():
+    return benchscreen(LUT=True, INDEXED=True)
+
+@benchmark("render_large")
+def bench_large():
+    rng = np.random.default_rng(1982)
+    s = sg.Screen(HEADLESS=True, COLS=80, ROWS=30)
+    s.memory[0x4000:s.screenend] = rng.integers(0, 256, s.screenend - 0x4000, dtype=np.uint8)
+    return s.render
+
+@benchmark("sprites")
+def bench_sprites():
+    fillscreen()
+    s = sg.GETSCREEN()
+    rng = np.random.default_rng(1982)
+    for n in range(48):
+        sg.SPRITE(n, rng.integers(0, 2, (16, 16)), INK=n % 8)
+    pos = rng.integers(0, 240, (48, 2))
+    def run():
+        for n in range(48):
+            sg.MOVESPRITE(n, *pos[n])
+        s.render()
+        sg.COLLISIONS()
+        pos[:] = (pos + 1) % 240
+    return run
+
+@benchmark("render_full")
+def bench_render():
+    fillscreen()
+    return sg.GETSCREEN().render
+
+@benchmark("render_slowrender")
+def bench_slowrender():
+    fillscreen()
+    return sg.GETSCREEN().slowrender
+
+@benchmark("print_fullscreen")
+def bench_print():
+    text = "".join(chr(32 + i % 96) for i in range(32*24))
+    def run():
+        sg.PRINT(sg.AT(0,0), text, end="")
+    return run
+
+@benchmark("draw_lines")
+def bench_draw():
+    def run():
+        for x in range(0, 256, 8):
+            sg.PLOT(x, 0)
+            sg.DRAW(255-2*x, 191)
+    return run
+
+@benchmark("draw_arc")
+def bench_arc():
+    def run():
+        sg.PLOT(20, 100)
+        sg.DRAW(216, 0, 3.14159)
+    return run
+
+@benchmark("circle_large")
+def bench_circle():
+    def run():
+        for r in range(40, 100, 10):
+            sg.CIRCLE(128, 96, r)
+    return run
+
+@benchmark("scrollup")
+def bench_scrollup():
+    fillscreen()
+    def run():
+        for i in range(24):
+            sg.SCROLLUP()
+    return run
+
+@benchmark("screenstr")
+def bench_screenstr():
+    sg.PRINT(sg.AT(0,0), "".join(chr(32 + i % 96) for i in range(32*24)), end="")
+    def run():
+        for y in range(24):
+            for x in range(32):
+                sg.SCREENSTR(x, y)
+    return run
+
+@benchmark("bulk_memory")
+def bench_bulk():
+    saved = bytes(sg.PEEKS(0x4000, 6912))
+    def run():
+        sg.POKES(0x4000, saved)
+        sg.MEMCOPY(0x4000, 0x4020, 6144 - 32)
+        sg.MEMSET(0x5800, 768, 0x38)
+    return run
+
+@benchmark("displaylist")
+def bench_displaylist():
+    dl = sg.DisplayList()
+    for i in range(100):
+        dl.PLOT(i, i)
+        dl.DRAW(50, 20)
+        dl.CIRCLE(128, 96, i % 50 + 5)
+        dl.SETATTR(i % 32, i % 24, INK=i % 8)
+        dl.PRINT(sg.AT(i % 24, 0), "val %d" % i)
+    def run():
+        sg.RUN(dl)
+    return run
+
+@benchmark("tilemap_scroll")
+def bench_tilemap():
+    level = sg.TileMap(256, 64)
+    level.codes[:] = (np.arange(256*64) % 95 + 32).reshape(64, 256)
+    level.attrs[:] = (np.arange(256*64) % 64).reshape(64, 256)
+    views = iter(range(10**9))
+    def run():
+        sg.DRAWMAP(level, next(views) % 224, 20)
+    return run
+
+@benchmark("loadimage")
+def bench_loadimage():
+    from specgfx.image import LOADIMAGE
+    y, x = np.mgrid[0:192, 0:256]
+    picture = np.stack((x, y * 255 // 191, 255 - x), axis=2).astype(np.uint8)
+    def run():
+        LOADIMAGE(picture, dither=True)
+    return run
+
+@benchmark("screenhash")
+def bench_screenhash():
+    fillscreen()
+    other = sg.Screen(HEADLESS=True)
+    def run():
+        sg.SCREENHASH()
+        sg.SCREENDIFF(other)
+    return run
+
+@benchmark("udg_churn")
+def bench_udg():
+    defs = [tuple((c * 7 + i * 13) % 256 for i in range(8)) for c in range(144, 256)]
+    def run():
+        for c, d in zip(range(144, 256), defs):
+            sg.UDG(c, d)
+        sg.RESETCHARS()
+    return run
+
+@benchmark("beep_buffer")
+def bench_beep():
+    def run():
+        for pitch in range(-24, 25, 6):
+            sg.BEEP(0, pitch)
+    return run
+
+@benchmark("import_init")
+def bench_import_init():
+    # Timed in a fresh interpreter, as the import is only slow the first time.
+    code = ("import time; t = time.perf_counter(); import specgfx; specgfx.INIT(); "
+        "print(time.perf_counter() - t)")
+    def run():
+        return float(subprocess.check_output([sys.executable, "-c", code]))
+    return run
+
+def timeit(setup, repeat):
+    sg.INIT()
+    sg.MANUALUPDATE()
+    run = setup()
+    run()
+    times = []
+    for i in range(repeat):
+        t = time.perf_counter()
+        measured = run()
+        times.append(time.perf_counter() - t if measured is None else measured)
+    return {
+        "repeat": repeat,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the specgfx hot paths.")
+    parser.add_argument("names", nargs="*", help="only run benchmarks whose names contain these strings")
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per benchmark")
+    parser.add_argument("--output", "-o", help="write JSON here instead of to stdout")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, setup in benchmarks.items():
+        if args.names and not [n for n in args.names if n in name]: continue
+        results[name] = timeit(setup, args.repeat)
+        print("%-20s %10.3f ms" % (name, results[name]["median"]*1000), file=sys.stderr)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,22 @@
 from .specgfx import (INIT, SCROLLUP,
-BORDER, 
+BORDER, PALETTE,
 INK, PAPER, FLASH, BRIGHT, INVERSE, OVER,
 AT, TAB,
 PRINT, SET, CLS,
 INPUT, INKEYS, GETKEY,
 PLOT, DRAW, MOVE, CIRCLE, DRAWTO, POINT,
-ATTR, SETATTR,
-SCREENSTR,
+ATTR, SETATTR, ATTRS, SETATTRS,
+SCREENSTR, DisplayList, RUN, TileMap, DRAWMAP,
+SPRITE, MOVESPRITE, SHOWSPRITE, HIDESPRITE, COLLISIONS,
 BEEP, PAUSE,
-GETMEMORY, PEEK, POKE,
+GETMEMORY, PEEK, POKE, PEEKS, POKES, MEMSET, MEMCOPY, GETPIXELS, SETPIXELS,
+SCREENHASH, SCREENDIFF,
 UPDATE, AUTOUPDATE, MANUALUPDATE, BYE,
-UDG, GETCHARDEF, RESETCHARS)
\ No newline at end of file
+UDG, GETCHARDEF, RESETCHARS, LOADFONT, CHARBANK,
+Screen, GETSCREEN)
+from .stream import SERVE
+from .record import RECORD, REPLAY
+from .export import EXPORT
+from .trace import TRACE
+from .terminal import TERMINAL
+from .image import LOADIMAGE
\ No newline at end of file
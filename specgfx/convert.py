@@ -0,0 +1,37 @@
+"""
+Converts pictures to screen dumps with ``specgfx.image``. Run with::
+
+    python -m specgfx.convert --output screens --dither pictures/*.png
+
+The screen dumps are 6912 bytes, as saved with ``SAVE "name" SCREEN$`` on a ZX Spectrum, and the files are shared
+between a pool of worker processes.
+"""
+
+import os
+import sys
+import argparse
+
+from .image import convertfiles
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m specgfx.convert", description="Convert pictures to screen dumps.")
+    parser.add_argument("inputs", nargs="+", help="image files")
+    parser.add_argument("--output", "-o", default=".", help="directory to write the screen dumps to")
+    parser.add_argument("--dither", action="store_true", help="use ordered dithering")
+    parser.add_argument("--processes", "-j", type=int, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    try:
+        for path, error in convertfiles(args.inputs, args.output, args.dither, args.processes):
+            if error:
+                failed += 1
+                print("%s: %s" % (path, error), file=sys.stderr)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sys.exit(main())
@@ -1,36 +1,301 @@
-def cyrender(unsigned char [:] memory, int [:,:] specarray, int [:] ipalette, int flashframe, int showcursor, int cursorx, int cursory):
-    cdef int cx, cy, attr, _ink, _paper, bright, flash, lowy, midy, highy, mp, m, xpos, ypos, b, mask, v
-    for cx in range(32):
-        for cy in range(24):
-            attr = memory[0x5800+cx+32*cy]
-            
-            _ink = attr % 8
-            
-            _paper = int(attr/8)%8
-            bright = int(attr/64)%2
-            flash = int(attr/128)
-            if showcursor and cx == cursorx and cy == cursory:
-                flash = True
-            
-            _ink += bright*8
-            _paper += bright*8
-            
-            if flash and flashframe: _ink,_paper = _paper,_ink
-            
-            _ink = ipalette[_ink]
-            _paper = ipalette[_paper]
-            
-            lowy = cy % 8
-            highy = int(cy/8)
-            mp = 0x4000+cx+32*lowy+256*8*highy
-            for midy in range(8):
-                ypos = midy+8*cy
-                m = int(memory[mp+256*midy])
-                #print(type(m))
-                xpos = 8*cx
-                for b,mask in enumerate((128,64,32,16,8,4,2,1)):
-                    v = m & mask
-                    if v:
-                        specarray[xpos+b,ypos] = _ink
-                    else: 
-                        specarray[xpos+b,ypos] = _paper
+cimport cython
+from libc.string cimport memcpy
+from cpython cimport array
+import array
+
+# The output can be packed RGB colours, or palette indices
+ctypedef fused pixel:
+    int
+    unsigned char
+
+# The address of each line of pixels on the classic 256x192 screen
+CLASSICROWS = array.array("i", [0x4000 + 256*(y % 8) + 32*((y // 8) % 8) + 2048*(y // 64) for y in range(192)])
+
+cdef int[:] checkgeometry(unsigned char [:] memory, int[:] rowaddr, int attrbase, int cols, int rows):
+    # Everything that is read from memory has to be inside it, as bounds checking is off
+    cdef int y
+    if rowaddr is None: rowaddr = CLASSICROWS
+    if cols < 1 or rows < 1 or rowaddr.shape[0] < 8*rows:
+        raise ValueError("bad screen geometry")
+    if attrbase < 0 or attrbase + cols*rows > memory.shape[0]:
+        raise ValueError("the attributes are outside memory")
+    for y in range(8*rows):
+        if rowaddr[y] < 0 or rowaddr[y] + cols > memory.shape[0]:
+            raise ValueError("the bitmap is outside memory")
+    return rowaddr
+
+cdef checklines(unsigned char [:] memory, int[:] rowaddr, int cols, int rows, int linestride):
+    # Each character cell's eight lines, linestride apart, have to be inside memory too
+    cdef int cy
+    if linestride < 1: raise ValueError("linestride is bad")
+    for cy in range(rows):
+        if rowaddr[8*cy] + 7*linestride + cols > memory.shape[0]:
+            raise ValueError("linestride is too big")
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def cyrender(unsigned char [:] memory, pixel [:,:] specarray, pixel [:] ipalette, int flashframe, int showcursor, int cursorx, int cursory,
+        int [:] rowaddr=None, int attrbase=0x5800, int cols=32, int rows=24):
+    # rowaddr is the address of each line of pixels, and the attributes are stored a row at a time from attrbase.
+    # The defaults are the classic screen.
+    cdef pixel inkpx, paperpx
+    cdef int cx, cy, attr, _ink, _paper, bright, flash, midy, m, xpos, ypos, b
+    rowaddr = checkgeometry(memory, rowaddr, attrbase, cols, rows)
+    if specarray.shape[0] < 8*cols or specarray.shape[1] < 8*rows or ipalette.shape[0] < 16:
+        raise ValueError("specarray or ipalette is too small")
+    # Nothing in here touches Python objects, so other threads can run while rendering.
+    with nogil:
+        for cy in range(rows):
+            for cx in range(cols):
+                attr = memory[attrbase+cx+cols*cy]
+
+                _ink = attr & 7
+                _paper = (attr >> 3) & 7
+                bright = (attr >> 6) & 1
+                flash = attr >> 7
+                if showcursor and cx == cursorx and cy == cursory:
+                    flash = True
+
+                _ink += bright*8
+                _paper += bright*8
+
+                if flash and flashframe: _ink,_paper = _paper,_ink
+
+                inkpx = ipalette[_ink]
+                paperpx = ipalette[_paper]
+
+                for midy in range(8):
+                    ypos = midy+8*cy
+                    m = memory[rowaddr[ypos]+cx]
+                    xpos = 8*cx
+                    for b in range(8):
+                        if m & (128 >> b):
+                            specarray[xpos+b,ypos] = inkpx
+                        else:
+                            specarray[xpos+b,ypos] = paperpx
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def lutrender(unsigned char [:] memory, pixel [:,::1] out, pixel [:,:,::1] lut, unsigned char [:] built, int [:] missing, int flashframe, int showcursor, int cursorx, int cursory,
+        int [:] rowaddr=None, int attrbase=0x5800, int cols=32, int rows=24):
+    # out is the output as [y,x], and lut[attr + 256*(flashing and flashframe), byte] is the 8 pixels for a bitmap byte.
+    # If any of the lut entries needed haven't been built, nothing is drawn: their numbers are put in missing, and the
+    # count is returned, so that they can be built before trying again. The geometry is as for cyrender.
+    cdef int cx, cy, attr, ypos, midy, n = 0
+    rowaddr = checkgeometry(memory, rowaddr, attrbase, cols, rows)
+    if out.shape[0] < 8*rows or out.shape[1] < 8*cols or lut.shape[0] < 512 or lut.shape[1] < 256 or lut.shape[2] < 8 or built.shape[0] < 512 or missing.shape[0] < 512:
+        raise ValueError("out, lut, built or missing is too small")
+    with nogil:
+        for cy in range(rows):
+            for cx in range(cols):
+                attr = memory[attrbase+cx+cols*cy]
+                if showcursor and cx == cursorx and cy == cursory:
+                    attr = attr | 128
+                if attr & 128 and flashframe:
+                    attr += 256
+                if not built[attr]:
+                    built[attr] = 2
+                    missing[n] = attr
+                    n += 1
+        if n == 0:
+            for cy in range(rows):
+                for cx in range(cols):
+                    attr = memory[attrbase+cx+cols*cy]
+                    if showcursor and cx == cursorx and cy == cursory:
+                        attr = attr | 128
+                    if attr & 128 and flashframe:
+                        attr += 256
+                    for midy in range(8):
+                        ypos = 8*cy+midy
+                        memcpy(&out[ypos, 8*cx], &lut[attr, memory[rowaddr[ypos]+cx], 0], 8*sizeof(pixel))
+    return n
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def spriterender(pixel [:,::1] out, pixel [:] ipalette, unsigned char [:,:,::1] bits, unsigned char [:,:,::1] masks, int [:,::1] table):
+    # Draws the sprites over the rendered screen in out, which is [y,x]. Each row of table is a sprite's
+    # x, y, width, height, ink, paper (-1 for none) and whether it is shown. bits and masks are its rows
+    # of pixels, packed 8 to a byte. Pixels are drawn where the mask is set, in ink where the bits are set and
+    # paper where they aren't. Later sprites are drawn over earlier ones.
+    cdef int n, sx, sy, w, h, ink, paper, r, x, y, b
+    if bits.shape[0] < table.shape[0] or masks.shape[0] < table.shape[0] or table.shape[1] < 7 or ipalette.shape[0] < 16:
+        raise ValueError("bits, masks, table or ipalette is too small")
+    for n in range(table.shape[0]):
+        if table[n,2] > 8*bits.shape[2] or table[n,3] > bits.shape[1] or table[n,2] > 8*masks.shape[2] or table[n,3] > masks.shape[1]:
+            raise ValueError("sprite %d is bigger than its bitmap" % n)
+        if table[n,4] < 0 or table[n,4] > 15 or table[n,5] < -1 or table[n,5] > 15:
+            raise ValueError("sprite %d has a bad colour" % n)
+    with nogil:
+        for n in range(table.shape[0]):
+            if not table[n,6]: continue
+            sx, sy, w, h, ink, paper = table[n,0], table[n,1], table[n,2], table[n,3], table[n,4], table[n,5]
+            for r in range(h):
+                y = sy + r
+                if y < 0 or y >= out.shape[0]: continue
+                for x in range(max(sx, 0), min(sx + w, out.shape[1])):
+                    b = x - sx
+                    if masks[n, r, b >> 3] & (128 >> (b & 7)):
+                        if bits[n, r, b >> 3] & (128 >> (b & 7)):
+                            out[y, x] = ipalette[ink]
+                        elif paper >= 0:
+                            out[y, x] = ipalette[paper]
+
+# Display list commands - see DisplayList in specgfx.py
+cpdef enum:
+    DL_PLOT = 0
+    DL_MOVE = 1
+    DL_LINE = 2
+    DL_LINETO = 3
+    DL_ARC = 4
+    DL_CIRCLE = 5
+    DL_CHARS = 6
+    DL_ATTRS = 7
+
+cdef inline void dlplot(unsigned char [:] memory, int [:] rowaddr, int attrbase, int cols, int rows,
+        int x, int y, int ink, int over, int inverse) noexcept nogil:
+    cdef int mp, a, xm
+    if x < 0 or y < 0 or x >= 8*cols or y >= 8*rows: return
+    mp = rowaddr[y] + (x >> 3)
+    xm = 128 >> (x & 7)
+    if over:
+        memory[mp] ^= xm
+    elif inverse:
+        memory[mp] &= 255 - xm
+    else:
+        memory[mp] |= xm
+    a = attrbase + (x >> 3) + cols*(y >> 3)
+    memory[a] = (memory[a] & 0xf8) | ink
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def runlist(unsigned char [:] memory, int [:] rowaddr, int attrbase, int cols, int rows, int linestride,
+        unsigned char [:,::1] charset, int [:,::1] ops, double [::1] params, int [:,::1] chars,
+        int ink, int over, int inverse, int attr, double gx, double gy, int dx, int dy):
+    # Runs a display list's commands against memory. Each row of ops is a command, its ink, over and inverse
+    # (-1 to use the screen's), and where its parameters start in params and how many there are. Each row of chars is
+    # a character code, its cell x and y, the attribute mask and value (the attribute is the screen's masked and or-ed
+    # with the value), over and inverse, and whether to set the attribute. Graphics are moved by dx,dy pixels, text and
+    # attributes by whole cells. Returns the graphics cursor afterwards.
+    cdef int n, i, k, p, c, x, y, cx, cy, w, h, addr, r, ov, iv, ik, steps, cdx = dx // 8, cdy = dy // 8
+    cdef double sx, sy, mdx, mdy, ex, ey
+    cdef unsigned char b
+    rowaddr = checkgeometry(memory, rowaddr, attrbase, cols, rows)
+    if charset.shape[0] < 256 or charset.shape[1] < 8 or ops.shape[1] < 6 or chars.shape[1] < 8:
+        raise ValueError("charset, ops or chars is bad")
+    checklines(memory, rowaddr, cols, rows, linestride)
+    for n in range(ops.shape[0]):
+        if ops[n,4] < 0 or ops[n,5] < 0 or ops[n,4] + ops[n,5] > (chars.shape[0] if ops[n,0] == DL_CHARS else params.shape[0]):
+            raise ValueError("command %d is outside its buffer" % n)
+    for n in range(chars.shape[0]):
+        if chars[n,0] < 0 or chars[n,0] > 255:
+            raise ValueError("bad character code %d" % chars[n,0])
+    with nogil:
+        for n in range(ops.shape[0]):
+            c = ops[n,0]
+            ik = ops[n,1] if ops[n,1] >= 0 else ink
+            ov = ops[n,2] if ops[n,2] >= 0 else over
+            iv = ops[n,3] if ops[n,3] >= 0 else inverse
+            p = ops[n,4]
+            k = ops[n,5]
+            if c == DL_PLOT:
+                x, y = <int>(params[p] + dx), <int>(params[p+1] + dy)
+                gx, gy = x, y
+                dlplot(memory, rowaddr, attrbase, cols, rows, x, y, ik, ov, iv)
+            elif c == DL_MOVE:
+                gx, gy = <int>(params[p] + dx), <int>(params[p+1] + dy)
+            elif c == DL_LINE or c == DL_LINETO:
+                if c == DL_LINE:
+                    mdx, mdy = params[p], params[p+1]
+                else:
+                    mdx, mdy = params[p] + dx - gx, params[p+1] + dy - gy
+                ex = mdx if mdx >= 0 else -mdx
+                ey = mdy if mdy >= 0 else -mdy
+                if ex < ey: ex = ey
+                if ex < 1: continue
+                mdx, mdy = mdx/ex, mdy/ex
+                sx, sy = gx + 0.5, gy + 0.5
+                for i in range(<int>ex):
+                    sx += mdx
+                    sy += mdy
+                    x, y = <int>sx, <int>sy
+                    gx, gy = x, y
+                    dlplot(memory, rowaddr, attrbase, cols, rows, x, y, ik, ov, iv)
+            elif c == DL_ARC:
+                # the end, relative to the start, then the points, relative to the start's centre
+                sx, sy = gx + 0.5, gy + 0.5
+                ex, ey = gx + params[p], gy + params[p+1]
+                for i in range(p+2, p+k, 2):
+                    x, y = <int>(params[i] + sx), <int>(params[i+1] + sy)
+                    dlplot(memory, rowaddr, attrbase, cols, rows, x, y, ik, ov, iv)
+                gx, gy = ex, ey
+            elif c == DL_CIRCLE:
+                # the centre, then the points relative to it
+                sx, sy = params[p] + dx, params[p+1] + dy
+                for i in range(p+2, p+k, 2):
+                    dlplot(memory, rowaddr, attrbase, cols, rows, <int>(params[i] + sx), <int>(params[i+1] + sy), ik, ov, iv)
+            elif c == DL_CHARS:
+                for i in range(p, p+k):
+                    cx, cy = chars[i,1] + cdx, chars[i,2] + cdy
+                    if cx < 0 or cy < 0 or cx >= cols or cy >= rows: continue
+                    ov = chars[i,5] if chars[i,5] >= 0 else over
+                    iv = chars[i,6] if chars[i,6] >= 0 else inverse
+                    addr = rowaddr[8*cy] + cx
+                    for r in range(8):
+                        b = charset[chars[i,0], r]
+                        if ov:
+                            memory[addr + r*linestride] ^= b
+                        elif iv:
+                            memory[addr + r*linestride] = 255 - b
+                        else:
+                            memory[addr + r*linestride] = b
+                    if chars[i,7]:
+                        memory[attrbase + cx + cols*cy] = (attr & chars[i,3]) | chars[i,4]
+            elif c == DL_ATTRS:
+                # x, y, w, h in cells, then the mask and value
+                x, y = <int>params[p] + cdx, <int>params[p+1] + cdy
+                w, h = <int>params[p+2], <int>params[p+3]
+                for cy in range(max(y, 0), min(y + h, rows)):
+                    for cx in range(max(x, 0), min(x + w, cols)):
+                        addr = attrbase + cx + cols*cy
+                        memory[addr] = (memory[addr] & <int>params[p+4]) | <int>params[p+5]
+    return gx, gy
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def drawmap(unsigned char [:] memory, int [:] rowaddr, int attrbase, int cols, int rows, int linestride,
+        unsigned char [:,::1] charset, unsigned char [:,:] codes, unsigned char [:,:] attrs, int vx, int vy,
+        int x, int y, int w, int h, int fillcode, int fillattr):
+    # Draws the part of a tile map starting at cell vx,vy into the w by h cells of the screen starting at x,y.
+    # Cells outside the map are fillcode in fillattr. Only cells whose bitmap or attribute is different are
+    # written. Returns the number of cells written.
+    cdef int cx, cy, mx, my, code, attr, addr, r, same, changed = 0
+    rowaddr = checkgeometry(memory, rowaddr, attrbase, cols, rows)
+    checklines(memory, rowaddr, cols, rows, linestride)
+    if charset.shape[0] < 256 or charset.shape[1] < 8 or codes.shape[0] != attrs.shape[0] or codes.shape[1] != attrs.shape[1]:
+        raise ValueError("charset, codes or attrs is bad")
+    if x < 0 or y < 0 or w < 0 or h < 0 or x + w > cols or y + h > rows:
+        raise ValueError("the area is outside the screen")
+    if fillcode < 0 or fillcode > 255:
+        raise ValueError("bad character code %d" % fillcode)
+    with nogil:
+        for cy in range(y, y + h):
+            my = vy + cy - y
+            for cx in range(x, x + w):
+                mx = vx + cx - x
+                if 0 <= mx < codes.shape[1] and 0 <= my < codes.shape[0]:
+                    code, attr = codes[my, mx], attrs[my, mx]
+                else:
+                    code, attr = fillcode, fillattr
+                addr = rowaddr[8*cy] + cx
+                same = memory[attrbase + cx + cols*cy] == attr
+                r = 0
+                while same and r < 8:
+                    same = memory[addr + r*linestride] == charset[code, r]
+                    r += 1
+                if same: continue
+                for r in range(8):
+                    memory[addr + r*linestride] = charset[code, r]
+                memory[attrbase + cx + cols*cy] = attr
+                changed += 1
+    return changed
@@ -0,0 +1,96 @@
+"""
+Shows a screen kept in shared memory (see ``specgfx.shared``), and sends keypresses back. ``INIT(SHARED=True)`` starts
+this for you, but it can also be run by hand with the name of the shared memory block, from ``GETSCREEN().shared.name``::
+
+    python -m specgfx.display psm_1a2b3c4d --sizex 2
+"""
+
+import os
+import sys
+import argparse
+
+from .specgfx import Screen, import_pygame
+from .shared import SharedBlock, FLASH, CURSOR
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def show(name, SIZEX=1, FULL=False, LUT=False, INDEXED=False, FPS=60):
+    """
+    Attaches to a shared screen and shows it in a window, rendering each frame the drawing process finishes, until the
+    drawing process ends. Closing the window, or pressing ESC or BREAK, asks the drawing process to stop.
+
+    Args:
+
+    - name - string - the name of the shared memory block.
+    - SIZEX - integer - size multiplier for the window.
+    - FULL - boolean - whether to show the window fullscreen.
+    - LUT - boolean - whether to render with a lookup table.
+    - INDEXED - boolean - whether to render to an 8-bit surface with a palette.
+    - FPS - number - the most frames a second to show.
+    """
+    pygame = import_pygame()
+    block = SharedBlock(name)
+    screen = Screen(FULL, SIZEX, LUT=LUT, INDEXED=INDEXED, COLS=block.cols, ROWS=block.rows)
+    screen.memory = block.memory
+    screen.spritebits, screen.spritemasks, screen.spritetable = block.spritebits, block.spritemasks, block.spritetable
+    screen.init_display()
+    pygame.display.set_caption("specgfx")
+    shown = None
+    ticks = 0
+    while True:
+        frame, border, flags, cursorx, cursory, palette = block.state()
+        if frame != shown:
+            shown = frame
+            screen.border = border
+            screen.flashframe = bool(flags & FLASH)
+            screen.showcursor = bool(flags & CURSOR)
+            screen.cursorx, screen.cursory = cursorx, cursory
+            if palette != screen.palette:
+                screen.palette = palette
+                screen.ipalette[:] = [256*256*i[0]+256*i[1]+i[2] for i in palette]
+            screen.spritesshown = int(block.spritetable[:,6].sum())
+            screen.render()
+            pygame.display.flip()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                block.setquit()
+                return
+            elif event.type == pygame.KEYDOWN:
+                if event.scancode == 69 or event.scancode == 1: # PAUSE/BREAK and ESC
+                    block.setquit()
+                    return
+                block.pushkey(True, event.key, event.unicode)
+            elif event.type == pygame.KEYUP:
+                block.pushkey(False, event.key, "")
+
+        # Stop once the drawing process has gone
+        ticks += 1
+        if ticks % 30 == 0 and not alive(block.pid): return
+        screen.clock.tick(FPS)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m specgfx.display", description="Show a specgfx screen in shared memory.")
+    parser.add_argument("name", help="the name of the shared memory block")
+    parser.add_argument("--sizex", type=int, default=1, help="size multiplier for the window")
+    parser.add_argument("--full", action="store_true", help="show the window fullscreen")
+    parser.add_argument("--lut", action="store_true", help="render with a lookup table")
+    parser.add_argument("--indexed", action="store_true", help="render to an 8-bit surface with a palette")
+    parser.add_argument("--fps", type=float, default=60, help="the most frames a second to show")
+    args = parser.parse_args(argv)
+    try:
+        show(args.name, args.sizex, args.full, args.lut, args.indexed, args.fps)
+    except (FileNotFoundError, ValueError) as e:
+        print("%s: %s" % (args.name, e), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
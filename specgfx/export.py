@@ -0,0 +1,290 @@
+"""
+Exports animations as palette-indexed GIF or APNG files. As specgfx only ever shows the 16 colours
+of the palette, frames are kept as 4-bit palette indices rather than RGB, and each frame after the first
+only stores the rectangle of character cells that changed. Start exporting with::
+
+    anim = EXPORT("demo.gif", SIZEX=2)
+
+and every frame from then on is added, until ``anim.close()`` is called or the program ends. Files
+ending in ``.png`` are written as APNG, anything else as GIF.
+"""
+
+import atexit
+import struct
+import zlib
+from fractions import Fraction
+
+import numpy as np
+
+from .specgfx import GETSCREEN
+from .cyrender import cyrender
+
+INDICES = np.arange(16, dtype=np.uint8)
+
+def screenindices(memory, flashframe=False):
+    """
+    Renders the screen memory as palette indices (0-15) - a 192x256 numpy array of unsigned 8-bit integers.
+
+    Args:
+
+    - memory - numpy array - the memory, as from ``GETMEMORY``.
+    - flashframe - boolean - which phase of flashing attributes to show.
+    """
+    out = np.zeros((192,256), dtype=np.uint8)
+    cyrender(memory, out.T, INDICES, flashframe, False, 0, 0)
+    return out
+
+def lzw(data, mincode):
+    # GIF-flavoured LZW: variable-length codes, packed least significant bit first
+    clear = 1 << mincode
+    out = bytearray()
+    acc = 0
+    nbits = 0
+    codesize = mincode + 1
+    table = {}
+    nextcode = clear + 2
+    acc |= clear << nbits
+    nbits += codesize
+    data = data.tobytes() if hasattr(data, "tobytes") else bytes(data)
+    w = data[0]
+    for c in data[1:]:
+        key = (w << 8) | c
+        code = table.get(key)
+        if code is not None:
+            w = code
+            continue
+        acc |= w << nbits
+        nbits += codesize
+        while nbits >= 8:
+            out.append(acc & 255)
+            acc >>= 8
+            nbits -= 8
+        if nextcode < 4096:
+            table[key] = nextcode
+            nextcode += 1
+            if nextcode > (1 << codesize) and codesize < 12:
+                codesize += 1
+        else:
+            acc |= clear << nbits
+            nbits += codesize
+            table = {}
+            nextcode = clear + 2
+            codesize = mincode + 1
+        w = c
+    acc |= w << nbits
+    nbits += codesize
+    acc |= (clear + 1) << nbits
+    nbits += codesize
+    while nbits > 0:
+        out.append(acc & 255)
+        acc >>= 8
+        nbits -= 8
+    return bytes(out)
+
+def subblocks(data):
+    return b"".join(bytes((len(data[i:i+255]),)) + data[i:i+255] for i in range(0, len(data), 255)) + b"\x00"
+
+def pngchunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def holds(total, most):
+    # Splits a length into pieces of at most most, for delays that don't fit in one frame
+    pieces = [most] * (total // most)
+    if total % most or not pieces: pieces.append(total % most)
+    return pieces
+
+class Animation:
+    """
+    Writes frames to an animated GIF or APNG file. Made by ``EXPORT``, or directly to add frames from
+    memory dumps without a screen.
+
+    Args:
+
+    - path - string - the file to write. Files ending in ``.png`` are APNG, others are GIF.
+    - palette - list of 16 (r,g,b) tuples - the colours to use.
+    - SIZEX - integer - size multiplier for the images.
+    - border - boolean - whether to include the border.
+    - fps - number - the number of frames a second.
+    """
+
+    def __init__(self, path, palette, SIZEX=1, border=False, fps=60):
+        self.apng = path.lower().endswith(".png")
+        self.sizex = max(int(SIZEX), 1)
+        self.border = border
+        self.fps = fps
+        # cell size and position of the screen on the image, in pixels
+        self.cell = 8 * self.sizex
+        self.offx, self.offy = (32 * self.sizex, 24 * self.sizex) if border else (0, 0)
+        self.width = 256 * self.sizex + 2 * self.offx
+        self.height = 192 * self.sizex + 2 * self.offy
+        self.palette = bytes(c for rgb in palette[:16] for c in rgb)
+        self.f = open(path, "wb")
+        self.frames = 0
+        self.time = 0
+        # The hundredths of a second of GIF frames written so far
+        self.gifdelay = 0
+        self.shown = None
+        # The image waiting for its duration to be known: (image, x, y, w, h, frames)
+        self.pending = None
+        self.sequence = 0
+        # The screen this is exporting, if made by EXPORT
+        self.screen = None
+        self.writeheader()
+        atexit.register(self.close)
+
+    def writeheader(self):
+        if self.apng:
+            self.f.write(b"\x89PNG\r\n\x1a\n")
+            self.f.write(pngchunk(b"IHDR", struct.pack(">IIBBBBB", self.width, self.height, 4, 3, 0, 0, 0)))
+            self.f.write(pngchunk(b"PLTE", self.palette))
+            # The number of frames isn't known until the end, so this is filled in by close
+            self.actl = self.f.tell()
+            self.f.write(pngchunk(b"acTL", struct.pack(">II", 0, 0)))
+        else:
+            self.f.write(b"GIF89a")
+            self.f.write(struct.pack("<HHBBB", self.width, self.height, 0xf3, 0, 0))
+            self.f.write(self.palette)
+            self.f.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def image(self, memory, flashframe, border):
+        img = screenindices(memory, flashframe)
+        if self.sizex > 1: img = img.repeat(self.sizex, 0).repeat(self.sizex, 1)
+        if not self.border: return img
+        out = np.full((self.height, self.width), border % 8, dtype=np.uint8)
+        out[self.offy:self.offy+img.shape[0], self.offx:self.offx+img.shape[1]] = img
+        return out
+
+    def changed(self, img):
+        # The rectangle of cells that differ from the image shown, as x, y, w, h in pixels
+        if self.shown is None: return 0, 0, self.width, self.height
+        diff = img != self.shown
+        rows = np.flatnonzero(diff.any(1))
+        if len(rows) == 0: return None
+        cols = np.flatnonzero(diff.any(0))
+        c = self.cell
+        x0 = self.offx + (cols[0] - self.offx) // c * c
+        y0 = self.offy + (rows[0] - self.offy) // c * c
+        x1 = min(self.offx + -(-(cols[-1] + 1 - self.offx) // c) * c, self.width)
+        y1 = min(self.offy + -(-(rows[-1] + 1 - self.offy) // c) * c, self.height)
+        x0, y0 = max(x0, 0), max(y0, 0)
+        return x0, y0, x1 - x0, y1 - y0
+
+    def add(self, memory, flashframe=False, border=7, frames=1):
+        """
+        Adds a frame, or lengthens the last one if nothing has changed.
+
+        Args:
+
+        - memory - numpy array - the memory, as from ``GETMEMORY``.
+        - flashframe - boolean - which phase of flashing attributes to show.
+        - border - integer (0-7) - the border colour.
+        - frames - integer - how many frames to show this for.
+        """
+        img = self.image(memory, flashframe, border)
+        rect = self.changed(img)
+        if rect is None:
+            self.pending = self.pending[:5] + (self.pending[5] + frames,)
+            return
+        self.writepending()
+        x, y, w, h = rect
+        self.pending = (img[y:y+h, x:x+w].copy(), x, y, w, h, frames)
+        self.shown = img
+
+    def addflash(self, memory, border=7, flashrate=25):
+        """
+        Adds both phases of flashing attributes, each shown for flashrate frames, so that a looping
+        animation of a still screen flashes properly.
+        """
+        self.add(memory, False, border, flashrate)
+        self.add(memory, True, border, flashrate)
+
+    def addscreen(self, screen):
+        """Adds the current state of a screen."""
+        self.add(screen.memory, screen.flashframe, screen.border)
+
+    def __call__(self, screen):
+        self.addscreen(screen)
+
+    def writepending(self):
+        if self.pending is None: return
+        img, x, y, w, h, frames = self.pending
+        self.pending = None
+        self.time += frames
+        if self.apng:
+            # APNG delays are fractions, so a frame rate like 59.94 is written as near as 16 bits allow
+            rate = Fraction(self.fps).limit_denominator(1000)
+            pieces = holds(frames, 65535 // rate.denominator)
+            delays = [(n * rate.denominator, rate.numerator) for n in pieces]
+        else:
+            # GIF delays are in hundredths of a second, so work them out from the end time to avoid drift. Browsers
+            # show delays under 2 hundredths as 10, so frames are held for at least 2, and the ones after made shorter.
+            delay = max(round(self.time * 100 / self.fps) - self.gifdelay, 2)
+            self.gifdelay += delay
+            delays = holds(delay, 65535)
+        # Delays are 16 bits, so a frame held for longer is followed by frames that just repeat a corner of it
+        for delay in delays:
+            if self.apng:
+                self.writepng(img, x, y, w, h, *delay)
+            else:
+                self.writegif(img, x, y, w, h, delay)
+            self.frames += 1
+            img, x, y, w, h = self.shown[:1, :2], 0, 0, 2, 1
+
+    def writegif(self, img, x, y, w, h, delay):
+        self.f.write(struct.pack("<BBBBHBB", 0x21, 0xf9, 4, 4, delay, 0, 0))
+        self.f.write(struct.pack("<BHHHHB", 0x2c, x, y, w, h, 0))
+        self.f.write(b"\x04")
+        self.f.write(subblocks(lzw(img, 4)))
+
+    def writepng(self, img, x, y, w, h, num, den):
+        fctl = struct.pack(">IIIIIHHBB", self.sequence, w, h, x, y, num, den, 0, 0)
+        self.f.write(pngchunk(b"fcTL", fctl))
+        self.sequence += 1
+        # two pixels to a byte, and a zero filter byte at the start of each row
+        packed = (img[:, 0::2] << 4) | img[:, 1::2]
+        data = zlib.compress(np.concatenate((np.zeros((h, 1), np.uint8), packed), axis=1).tobytes())
+        if self.frames == 0:
+            self.f.write(pngchunk(b"IDAT", data))
+        else:
+            self.f.write(pngchunk(b"fdAT", struct.pack(">I", self.sequence) + data))
+            self.sequence += 1
+
+    def close(self):
+        """Writes the last frame and finishes the file."""
+        if self.f.closed: return
+        if self.screen is not None and self in self.screen.framehooks:
+            self.screen.framehooks.remove(self)
+        self.writepending()
+        if self.apng:
+            self.f.write(pngchunk(b"IEND", b""))
+            self.f.seek(self.actl)
+            self.f.write(pngchunk(b"acTL", struct.pack(">II", self.frames, 0)))
+        else:
+            self.f.write(b"\x3b")
+        self.f.close()
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def EXPORT(path, SIZEX=1, border=False, screen=None):
+    """
+    Starts exporting every frame shown to an animated GIF, or APNG if the path ends with ``.png``. Exporting
+    stops when the program ends, or when the ``close`` method of the returned ``Animation`` is called.
+
+    Args:
+
+    - path - string - the file to write.
+    - SIZEX - integer - size multiplier for the images.
+    - border - boolean - whether to include the border.
+    - screen - Screen - optional - the screen to export. Defaults to the one made by ``INIT``.
+    """
+    screen = screen or GETSCREEN()
+    if screen.linear: raise ValueError("only 32x24 screens can be exported")
+    anim = Animation(path, screen.palette, SIZEX, border, fps=screen.fps)
+    anim.screen = screen
+    screen.framehooks.append(anim)
+    return anim
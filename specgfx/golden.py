@@ -0,0 +1,161 @@
+"""
+Keeps known good screens on disk, to check programs' output against in tests without saving or comparing images.
+Each check is just ``SCREENHASH`` compared with the hash stored for that name, so it takes microseconds. Example::
+
+    from specgfx import *
+    from specgfx.golden import GoldenStore
+
+    golden = GoldenStore("tests/golden")
+
+    def test_title():
+        INIT(HEADLESS=True)
+        drawtitle()
+        golden.assertscreen("title")
+
+The first time a name is checked, the screen is stored as the good one. Set the environment variable
+``SPECGFX_GOLDEN_UPDATE=1`` (or pass ``update=True``) to store the current screens instead of checking them, after a
+change that is meant to change the output.
+
+The directory has an index, ``golden.json``, of the hash of the screen for each name, and the screens themselves,
+named after their hashes, as the bytes of the bitmap and attributes, then the character set, then a ``TRAILER`` with
+the border and the size of the screen, which is everything ``SCREENHASH`` hashes. Screens that don't match are stored too, so they can be looked at with ``load``. Tests run in
+parallel processes can share a directory, as they take turns to add to the index.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    # Not on Windows, where tests saving at the same moment can still lose each other's screens
+    fcntl = None
+
+from .specgfx import Screen, GETSCREEN
+
+INDEX = "golden.json"
+# border, columns, rows
+TRAILER = struct.Struct("<BHH")
+
+def readindex(path):
+    # The index in a directory, empty if there isn't one yet
+    try:
+        with open(os.path.join(path, INDEX)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+class GoldenStore:
+    """
+    A directory of known good screens, by name.
+
+    Args:
+
+    - path - string - the directory. It is made if it doesn't exist.
+    - update - boolean - optional - whether to store screens rather than check them. Defaults to whether the
+      ``SPECGFX_GOLDEN_UPDATE`` environment variable is set to something other than 0 or nothing.
+    """
+
+    def __init__(self, path, update=None):
+        self.path = path
+        if update is None: update = os.environ.get("SPECGFX_GOLDEN_UPDATE", "0") not in ("", "0")
+        self.update = update
+        os.makedirs(path, exist_ok=True)
+        self.index = readindex(path)
+        # The names this store has saved, which win over what other processes have saved since
+        self.saved = {}
+
+    def store(self, screen):
+        # Writes a screen's bytes, unless a screen with the same hash is there already, and returns its hash
+        h = screen.SCREENHASH()
+        filename = os.path.join(self.path, h + ".bin")
+        if not os.path.exists(filename):
+            with open(filename, "wb") as f:
+                f.write(screen.memory[0x4000:screen.screenend].tobytes() + screen.charset.tobytes() +
+                    TRAILER.pack(screen.border, screen.cols, screen.rows))
+        return h
+
+    def save(self, name, h):
+        # Tests in other processes may have saved screens since the index was read, so it is read again and merged
+        # just before it is replaced, holding a lock so that they take turns. It is written to a new file and renamed,
+        # so a crash never leaves half of it
+        self.saved[name] = h
+        with open(os.path.join(self.path, INDEX + ".lock"), "w") as lock:
+            if fcntl: fcntl.flock(lock, fcntl.LOCK_EX)
+            self.index = readindex(self.path)
+            self.index.update(self.saved)
+            tmp = os.path.join(self.path, "%s.%d.tmp" % (INDEX, os.getpid()))
+            with open(tmp, "w") as f:
+                json.dump(self.index, f, indent=1, sort_keys=True)
+            os.replace(tmp, os.path.join(self.path, INDEX))
+
+    def check(self, name, screen=None):
+        """
+        Checks a screen against the good one stored with the name, and returns whether they match. If there isn't one
+        yet, or the store is updating, the screen is stored as the good one, and this returns True.
+
+        Args:
+
+        - name - string - the name of the screen, such as the name of the test.
+        - screen - Screen - optional - the screen to check. Defaults to the one made by ``INIT``.
+        """
+        screen = screen or GETSCREEN()
+        h = screen.SCREENHASH()
+        good = self.index.get(name)
+        if good == h: return True
+        self.store(screen)
+        if good is None or self.update:
+            self.save(name, h)
+            return True
+        return False
+
+    def load(self, h):
+        """
+        Makes a headless screen showing a stored screen.
+
+        Args:
+
+        - h - string - the hash of the screen, or the name of a good one.
+        """
+        with open(os.path.join(self.path, self.index.get(h, h) + ".bin"), "rb") as f:
+            data = f.read()
+        border, cols, rows = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+        screen = Screen(HEADLESS=True, COLS=cols, ROWS=rows)
+        n = screen.screenend - 0x4000
+        screen.memory[0x4000:screen.screenend] = np.frombuffer(data, dtype=np.uint8, count=n)
+        screen.charset[:] = np.frombuffer(data, dtype=np.uint8, count=screen.charset.size, offset=n).reshape(screen.charset.shape)
+        screen.border = border
+        return screen
+
+    def diff(self, name, screen=None):
+        """
+        Compares a screen with the good one stored with the name, returning a mask of the character cells that differ,
+        as from ``SCREENDIFF``.
+
+        Args:
+
+        - name - string - the name of the good screen.
+        - screen - Screen - optional - the screen to compare. Defaults to the one made by ``INIT``.
+        """
+        return (screen or GETSCREEN()).SCREENDIFF(self.load(name))
+
+    def assertscreen(self, name, screen=None):
+        """
+        Raises an AssertionError, saying which character cells are different, if a screen doesn't match the good one
+        stored with the name. For use in tests.
+
+        Args:
+
+        - name - string - the name of the good screen.
+        - screen - Screen - optional - the screen to check. Defaults to the one made by ``INIT``.
+        """
+        screen = screen or GETSCREEN()
+        if self.check(name, screen): return
+        cells = np.argwhere(self.diff(name, screen))
+        where = ", ".join("(%d,%d)" % (x, y) for y, x in cells[:10].tolist())
+        if len(cells) > 10: where += ", ..."
+        raise AssertionError("screen %r is %s, not %s: %d cells differ: %s" % (name, screen.SCREENHASH(),
+            self.index[name], len(cells), where or "none, but the border or character set does"))
@@ -0,0 +1,136 @@
+"""
+Converts pictures to specgfx screens. Each 8x8 character cell can only have two colours, an ink and a paper of
+the same brightness, so for every cell this picks the pair of palette colours that is closest to the picture, all
+cells at once with numpy, and then sets each pixel to whichever of the two is closer, optionally with ordered
+dithering. Use ``LOADIMAGE`` to put a picture on the screen, or ``convertfiles`` to convert many pictures to screen
+dumps, as ``python -m specgfx.convert`` does.
+"""
+
+import os
+
+import numpy as np
+
+from .specgfx import GETSCREEN, import_pygame
+from .pool import mapfiles
+
+# The ink and paper of each pair of colours that a cell can have: every pair of the normal colours, then every pair of
+# the bright ones, including a colour with itself
+INKS, PAPERS = np.array([(8*b + i, 8*b + p) for b in range(2) for i in range(8) for p in range(i, 8)]).T
+
+def bayer(n):
+    # The n by n ordered dithering matrix, as thresholds between 0 and 1
+    m = np.zeros((1, 1), dtype=np.int32)
+    while m.shape[0] < n:
+        m = np.block([[4*m, 4*m + 2], [4*m + 3, 4*m + 1]])
+    return (m + 0.5) / m.size
+
+BAYER = bayer(8)
+
+def readimage(source):
+    """
+    Gets a picture as an array of RGB colours, indexed [y,x].
+
+    Args:
+
+    - source - string or numpy array - a path to an image file that pygame can load, or an array indexed [y,x] of
+      RGB or RGBA colours, or of greys.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        pygame = import_pygame()
+        return pygame.surfarray.array3d(pygame.image.load(os.fspath(source))).transpose(1, 0, 2)
+    image = np.asarray(source)
+    if image.ndim == 2: image = np.stack((image,)*3, axis=2)
+    if image.ndim != 3 or image.shape[2] < 3: raise ValueError("the image must be an array of RGB colours or greys")
+    return image[:, :, :3]
+
+def quantize(image, palette, cols=32, rows=24, dither=False):
+    """
+    Converts a picture to a screen's pixels and attributes. The picture is stretched to fit the screen if it is a
+    different size. Returns the pixels, an array of 0s (paper) and 1s (ink) indexed [y,x] like ``GETPIXELS``, and the
+    attributes, indexed [row, column].
+
+    Args:
+
+    - image - numpy array - RGB colours, indexed [y,x], as from ``readimage``.
+    - palette - list - the 16 (r,g,b) colours of the screen.
+    - cols - integer - the width of the screen in character cells.
+    - rows - integer - the height of the screen in character cells.
+    - dither - boolean - whether to use ordered dithering, to show colours between the ink and paper.
+    """
+    h, w = 8*rows, 8*cols
+    if image.shape[:2] != (h, w):
+        image = image[(np.arange(h) * image.shape[0]) // h][:, (np.arange(w) * image.shape[1]) // w]
+    # The 64 pixels of each cell, one cell after another, a row of cells at a time
+    n = rows*cols
+    cells = image.reshape(rows, 8, cols, 8, 3).transpose(0, 2, 1, 3, 4).reshape(n*64, 3).astype(np.float32)
+    colours = np.array(palette, dtype=np.float32)
+    # The squared distance from each palette colour to each pixel, worked out with one matrix multiply
+    dist = (colours ** 2).sum(1)[:, None] - 2 * (colours @ cells.T) + (cells ** 2).sum(1)
+    # How far each cell is from each ink and paper pair, going through the pairs rather than the cells, as there are fewer.
+    # Without dithering that is how far each pixel is from the nearer of the two colours, and with it, how far it is
+    # from the nearest of the colours between them, so that a grey is made of black and white rather than just black
+    cost = np.empty((len(INKS), n), dtype=np.float32)
+    nearest = np.empty(n*64, dtype=np.float32)
+    for k, (a, b) in enumerate(zip(INKS, PAPERS)):
+        np.minimum(dist[a], dist[b], out=nearest)
+        length = ((colours[a] - colours[b]) ** 2).sum()
+        if dither and length > 0:
+            # How far along from a to b the nearest point is, and the squared distance to it if it is between them
+            along = (dist[a] - dist[b] + length) / (2 * length)
+            between = (along > 0) & (along < 1)
+            nearest[between] = (dist[a] - along * along * length)[between]
+        cost[k] = nearest.reshape(n, 64).sum(1)
+    best = cost.argmin(0)
+    ink, paper = INKS[best].repeat(64), PAPERS[best].repeat(64)
+    if dither:
+        # How far each pixel is along the way from the paper to the ink, compared with the matrix
+        start = colours[paper]
+        span = colours[ink] - start
+        length = (span ** 2).sum(1)
+        along = ((cells - start) * span).sum(1) / np.where(length > 0, length, 1)
+        bits = along > np.tile(BAYER, (rows, cols)).reshape(rows, 8, cols, 8).transpose(0, 2, 1, 3).ravel()
+    else:
+        pixel = np.arange(n*64)
+        bits = dist[ink, pixel] < dist[paper, pixel]
+    ink, paper = ink[::64], paper[::64]
+    pixels = bits.reshape(rows, cols, 8, 8).transpose(0, 2, 1, 3).reshape(h, w).astype(np.uint8)
+    attrs = ((ink % 8) + 8*(paper % 8) + 64*(ink // 8)).astype(np.uint8).reshape(rows, cols)
+    return pixels, attrs
+
+def LOADIMAGE(source, dither=False, screen=None):
+    """
+    Puts a picture on the screen, as closely as the ZX Spectrum's colours allow. The picture is stretched to fit the
+    screen (256x192 pixels, unless ``INIT`` made another size), and the screen's palette is used. This is quick enough
+    to do for every frame of a video, but pictures look best if they are the right size to start with.
+
+    Args:
+
+    - source - string or numpy array - a path to an image file, or an array indexed [y,x] of RGB colours or greys.
+    - dither - boolean - whether to use ordered dithering, to show colours between the two in each character cell.
+    - screen - Screen - optional - the screen to draw on. Defaults to the one made by ``INIT``.
+    """
+    screen = screen or GETSCREEN()
+    pixels, attrs = quantize(readimage(source), screen.palette, screen.cols, screen.rows, dither)
+    screen.SETPIXELS(pixels)
+    screen.attrs[:] = attrs
+    if screen.autoupdate: screen.UPDATE()
+
+def convertfile(inpath, outpath, screen, dither=False):
+    LOADIMAGE(inpath, dither, screen)
+    screen.memory[0x4000:0x5b00].tofile(outpath)
+
+def convertfiles(paths, outdir, dither=False, processes=None):
+    """
+    Converts many pictures to 6912-byte screen dumps, using a pool of processes. Yields ``(path, error)`` for each
+    input as it finishes, where error is None if the dump was written.
+
+    Args:
+
+    - paths - list of strings - the pictures to convert.
+    - outdir - string - the directory to write the dumps to. They are named after the inputs, ending in ``.scr``, so
+      the inputs must have different names. A ValueError is raised before anything is written if they don't.
+    - dither - boolean - whether to use ordered dithering.
+    - processes - integer - optional - the number of processes. Defaults to the number of CPUs. With 1, the pictures
+      are converted in this process.
+    """
+    return mapfiles(convertfile, paths, outdir, ".scr", {"dither": dither}, processes)
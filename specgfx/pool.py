@@ -0,0 +1,78 @@
+"""
+Works through many files with a pool of worker processes, for the commands that convert files in bulk
+(``python -m specgfx.render`` and ``python -m specgfx.convert``). Each worker holds one headless screen, which it
+draws every file on in turn, and each output is named after its input in an output directory.
+"""
+
+import os
+import multiprocessing
+
+from .specgfx import Screen
+
+def outputpaths(paths, outdir, ext):
+    """
+    Names the output file for each input, after the input without its directory, raising a ValueError if two inputs
+    would be written to the same file.
+
+    Args:
+
+    - paths - list of strings - the inputs.
+    - outdir - string - the directory the outputs are written to.
+    - ext - string - the extension of the outputs, such as ``".png"``.
+    """
+    outpaths = []
+    seen = {}
+    for p in paths:
+        outpath = os.path.join(outdir, os.path.splitext(os.path.basename(p))[0] + ext)
+        key = os.path.normcase(outpath)
+        if key in seen: raise ValueError("%s and %s would both be written to %s" % (seen[key], p, outpath))
+        seen[key] = p
+        outpaths.append(outpath)
+    return outpaths
+
+# Each worker process's function, headless screen and options
+worker = None
+
+def initworker(function, options):
+    global worker
+    screen = Screen(HEADLESS=True)
+    screen.MANUALUPDATE()
+    worker = (function, screen, options)
+
+def runjob(job):
+    inpath, outpath = job
+    function, screen, options = worker
+    try:
+        function(inpath, outpath, screen, **options)
+    except Exception as e:
+        return inpath, str(e)
+    return inpath, None
+
+def mapfiles(function, paths, outdir, ext, options, processes=None):
+    """
+    Calls ``function(inpath, outpath, screen, **options)`` for each input, using a pool of processes. Yields
+    ``(path, error)`` for each input as it finishes, where error is None if the function returned, or the message of
+    the exception it raised.
+
+    Args:
+
+    - function - function - what to do with each file. It must be defined at the top level of a module, so that the
+      workers can find it.
+    - paths - list of strings - the inputs.
+    - outdir - string - the directory to write the outputs to, named by ``outputpaths``. A ValueError is raised before
+      anything is written if two inputs would be written to the same file.
+    - ext - string - the extension of the outputs.
+    - options - dict - keyword arguments for the function.
+    - processes - integer - optional - the number of processes. Defaults to the number of CPUs. With 1, the files are
+      done in this process.
+    """
+    jobs = list(zip(paths, outputpaths(paths, outdir, ext)))
+    os.makedirs(outdir, exist_ok=True)
+    if processes == 1:
+        initworker(function, options)
+        for job in jobs:
+            yield runjob(job)
+        return
+    with multiprocessing.Pool(processes, initworker, (function, options), maxtasksperchild=1000) as pool:
+        for res in pool.imap_unordered(runjob, jobs, chunksize=16):
+            yield res
@@ -0,0 +1,282 @@
+"""
+Records sessions to a file and plays them back. Start recording with::
+
+    RECORD("session.sgr")
+
+and every frame from then on is logged, until the recorder is closed or the program ends. Play back with
+``REPLAY("session.sgr")``, or look at individual frames with ``Recording``.
+
+Each record in the file is an ``ENTRY`` header (kind, border, flags, cursor, number of key events,
+payload length, time), followed by the key events (``KEY`` structs, as in ``specgfx.stream``) and the
+payload. A keyframe's payload is the 6912 bytes of screen memory, compressed with zlib. A delta's
+payload is the XOR of the screen memory with the previous frame, compressed with zlib, or empty
+if nothing changed. A "same" record stands for several frames with no changes at all - its payload
+length is the number of frames. There is a keyframe every ``keyframe`` frames, and the file ends with
+an index of the keyframes' offsets, so any frame can be found by reading at most one keyframe's worth of records.
+"""
+
+import atexit
+import struct
+import time
+import zlib
+
+import numpy as np
+
+from .specgfx import GETSCREEN, INIT
+from .stream import KEY, PRESS, RELEASE, SCREENSTART, SCREENEND
+from . import specgfx
+
+MAGIC = b"SPECREC1"
+# magic, keyframe interval
+HEADER = struct.Struct("<8sI")
+# kind, border, flags (1 = flash phase, 2 = show cursor), cursor x, cursor y, key events, payload length, time
+ENTRY = struct.Struct("<BBBBBHId")
+# frames, index offset, keyframes, magic
+FOOTER = struct.Struct("<QQI8s")
+INDEXMAGIC = b"SPECIDX1"
+
+KEYFRAME = ord("K")
+DELTA = ord("D")
+SAME = ord("S")
+
+SCREENSIZE = SCREENEND - SCREENSTART
+
+class Recorder:
+    """
+    Logs every frame of a screen to a file. Made by ``RECORD``.
+
+    Args:
+
+    - screen - Screen - the screen to record.
+    - path - string - the file to write.
+    - keyframe - integer - how often, in frames, to store the whole screen.
+    """
+
+    def __init__(self, screen, path, keyframe=600):
+        if screen.linear: raise ValueError("only 32x24 screens can be recorded")
+        self.screen = screen
+        self.keyframe = keyframe
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, keyframe))
+        self.frames = 0
+        self.index = []
+        self.last = None
+        self.laststate = None
+        self.keys = []
+        # A run of unchanged frames waiting to be written: (count, time of first)
+        self.same = None
+        self.start = time.monotonic()
+        screen.framehooks.append(self)
+        screen.keyhooks.append(self.key)
+        atexit.register(self.close)
+
+    def key(self, pressed, key, u):
+        self.keys.append(KEY.pack(PRESS if pressed else RELEASE, key, ord(u) if u else 0))
+
+    def write(self, kind, state, payload, t):
+        self.f.write(ENTRY.pack(kind, *state, len(self.keys), len(payload), t))
+        self.f.write(b"".join(self.keys))
+        self.f.write(payload)
+        self.keys = []
+
+    def flushsame(self):
+        if self.same:
+            count, t = self.same
+            self.f.write(ENTRY.pack(SAME, *self.laststate, 0, count, t))
+            self.same = None
+
+    def __call__(self, screen):
+        t = time.monotonic() - self.start
+        mem = screen.memory[SCREENSTART:SCREENEND]
+        state = (screen.border, int(bool(screen.flashframe)) | 2 * int(bool(screen.showcursor)),
+            screen.cursorx % 256, screen.cursory % 256)
+        if self.frames % self.keyframe == 0:
+            self.flushsame()
+            self.index.append(self.f.tell())
+            self.write(KEYFRAME, state, zlib.compress(mem.tobytes()), t)
+            self.last = mem.copy()
+        else:
+            delta = np.bitwise_xor(mem, self.last)
+            if delta.any():
+                self.flushsame()
+                self.write(DELTA, state, zlib.compress(delta.tobytes()), t)
+                self.last[:] = mem
+            elif self.keys or state != self.laststate:
+                self.flushsame()
+                self.write(DELTA, state, b"", t)
+            elif self.same:
+                self.same = (self.same[0] + 1, self.same[1])
+            else:
+                self.same = (1, t)
+        self.laststate = state
+        self.frames += 1
+
+    def close(self):
+        """Finishes the file and stops recording."""
+        if self.f.closed: return
+        self.flushsame()
+        offset = self.f.tell()
+        self.f.write(np.array(self.index, dtype="<u8").tobytes())
+        self.f.write(FOOTER.pack(self.frames, offset, len(self.index), INDEXMAGIC))
+        self.f.close()
+        if self in self.screen.framehooks: self.screen.framehooks.remove(self)
+        if self.key in self.screen.keyhooks: self.screen.keyhooks.remove(self.key)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Frame:
+    """
+    One frame of a recording: its number and time, the 6912 bytes of screen memory (a numpy array - copy it
+    if you want to keep it, as it is reused for the next frame), the border, flash phase, cursor and the keys
+    pressed and released in this frame, as (pressed, key, character) tuples.
+    """
+    def __init__(self, number, t, screen, border, flags, cursorx, cursory, keys):
+        self.number = number
+        self.time = t
+        self.screen = screen
+        self.border = border
+        self.flashframe = bool(flags & 1)
+        self.showcursor = bool(flags & 2)
+        self.cursorx = cursorx
+        self.cursory = cursory
+        self.keys = keys
+
+class Recording:
+    """
+    Reads a file written by ``RECORD``. ``len()`` gives the number of frames, and ``frames(start)``
+    iterates over the frames from any starting point.
+
+    Args:
+
+    - path - string - the file to read.
+    """
+
+    def __init__(self, path):
+        self.f = open(path, "rb")
+        magic, self.keyframe = HEADER.unpack(self.f.read(HEADER.size))
+        if magic != MAGIC: raise ValueError("%s is not a specgfx recording" % path)
+        self.f.seek(0, 2)
+        end = self.f.tell()
+        self.f.seek(end - FOOTER.size)
+        frames, offset, count, magic = FOOTER.unpack(self.f.read(FOOTER.size))
+        if magic == INDEXMAGIC:
+            self.f.seek(offset)
+            self.index = np.frombuffer(self.f.read(8*count), dtype="<u8").tolist()
+            self.nframes = frames
+            self.end = offset
+        else:
+            # The recording wasn't closed properly, so rebuild the index
+            self.scan(end)
+
+    def scan(self, end):
+        self.index = []
+        self.nframes = 0
+        pos = HEADER.size
+        while pos + ENTRY.size <= end:
+            self.f.seek(pos)
+            kind, border, flags, cx, cy, nkeys, n, t = ENTRY.unpack(self.f.read(ENTRY.size))
+            size = ENTRY.size + KEY.size*nkeys + (0 if kind == SAME else n)
+            if pos + size > end: break
+            if kind == KEYFRAME: self.index.append(pos)
+            self.nframes += n if kind == SAME else 1
+            pos += size
+        self.end = pos
+
+    def __len__(self):
+        return self.nframes
+
+    def frames(self, start=0):
+        """
+        Yields ``Frame`` objects, starting from frame number start.
+        """
+        if start >= self.nframes: return
+        k = start // self.keyframe
+        pos = self.index[k]
+        number = k * self.keyframe
+        screen = np.zeros(SCREENSIZE, dtype=np.uint8)
+        while pos < self.end:
+            self.f.seek(pos)
+            kind, border, flags, cx, cy, nkeys, n, t = ENTRY.unpack(self.f.read(ENTRY.size))
+            keys = []
+            for i in range(nkeys):
+                kk, key, u = KEY.unpack(self.f.read(KEY.size))
+                keys.append((kk == PRESS, key, chr(u) if u else ""))
+            if kind == SAME:
+                pos += ENTRY.size + KEY.size*nkeys
+                count = n
+            else:
+                payload = self.f.read(n)
+                pos += ENTRY.size + KEY.size*nkeys + n
+                if kind == KEYFRAME:
+                    screen[:] = np.frombuffer(zlib.decompress(payload), np.uint8)
+                elif payload:
+                    np.bitwise_xor(screen, np.frombuffer(zlib.decompress(payload), np.uint8), out=screen)
+                count = 1
+            for i in range(count):
+                if number >= start:
+                    yield Frame(number, t, screen, border, flags, cx, cy, keys)
+                number += 1
+                keys = []
+
+    def frame(self, number):
+        """Gets one frame, by number."""
+        for f in self.frames(number):
+            return f
+        raise IndexError(number)
+
+    def close(self):
+        self.f.close()
+
+def RECORD(path, keyframe=600, screen=None):
+    """
+    Starts recording every frame shown, and every key pressed, to a file. Recording stops when the program
+    ends, or when the ``close`` method of the returned ``Recorder`` is called.
+
+    Args:
+
+    - path - string - the file to write.
+    - keyframe - integer - how often, in frames, to store the whole screen. Smaller values make seeking faster but the file bigger.
+    - screen - Screen - optional - the screen to record. Defaults to the one made by ``INIT``.
+    """
+    return Recorder(screen or GETSCREEN(), path, keyframe)
+
+def REPLAY(path, speed=1.0, start=0, screen=None):
+    """
+    Plays back a file made by ``RECORD``, showing it on the screen, and feeding the recorded keys to ``INKEYS``.
+
+    Args:
+
+    - path - string - the file to play.
+    - speed - float - how fast to play it, 1 being real time. 0 plays it as fast as possible.
+    - start - integer - the frame number to start from.
+    - screen - Screen - optional - the screen to play it on. Defaults to the one made by ``INIT``, calling ``INIT`` if necessary.
+    """
+    screen = screen or GETSCREEN() or INIT()
+    rec = Recording(path)
+    t0 = None
+    try:
+        for frame in rec.frames(start):
+            if speed:
+                if t0 is None: t0 = time.monotonic() - frame.time/speed
+                wait = t0 + frame.time/speed - time.monotonic()
+                if wait > 0: time.sleep(wait)
+            screen.memory[SCREENSTART:SCREENEND] = frame.screen
+            screen.border = frame.border
+            screen.flashframe = frame.flashframe
+            screen.showcursor = frame.showcursor
+            screen.cursorx, screen.cursory = frame.cursorx, frame.cursory
+            for pressed, key, u in frame.keys:
+                if pressed: screen.keydown(key, u)
+                else: screen.keyup(key)
+            screen.render()
+            if not screen.headless:
+                specgfx.pygame.display.flip()
+                for event in specgfx.pygame.event.get():
+                    if event.type == specgfx.pygame.QUIT: return
+    finally:
+        rec.close()
@@ -0,0 +1,111 @@
+"""
+Renders screen dumps to PNG images without opening a window. Run with::
+
+    python -m specgfx.render --output thumbs --sizex 2 *.scr
+
+Each input can be a 6912-byte screen dump (as saved with ``SAVE "name" SCREEN$`` on a ZX Spectrum),
+a 32k specgfx memory dump (as from ``GETMEMORY().tofile(...)``), a 48k RAM dump starting at 0x4000,
+or a 64k dump of the whole address space. The files are shared between a pool of worker processes,
+each of which only holds one screen at a time.
+"""
+
+import os
+import sys
+import argparse
+
+from .specgfx import Screen, import_pygame
+from .pool import mapfiles
+
+SCREENSIZE = 0x1b00
+
+def screenbytes(data):
+    """
+    Gets the 6912 bytes of bitmap and attributes from a screen or memory dump.
+
+    Args:
+
+    - data - bytes - the contents of the dump.
+    """
+    n = len(data)
+    if n == SCREENSIZE or n == 48*1024:
+        return data[:SCREENSIZE]
+    elif n == 32*1024 or n == 64*1024:
+        return data[0x4000:0x4000+SCREENSIZE]
+    raise ValueError("not a screen or memory dump: %d bytes" % n)
+
+def screenimage(data, SIZEX=1, flash=0, border=None, screen=None):
+    """
+    Renders a screen dump as a pygame surface.
+
+    Args:
+
+    - data - bytes - a screen or memory dump, see ``screenbytes``.
+    - SIZEX - integer - size multiplier for the image.
+    - flash - integer (0-1) - which phase of flashing attributes to show.
+    - border - integer (0-7) - optional - the border colour. Without this there is no border.
+    - screen - Screen - optional - a headless screen to render with, to save making a new one.
+    """
+    pygame = import_pygame()
+    if screen is None: screen = Screen(HEADLESS=True)
+    screen.memory[0x4000:0x4000+SCREENSIZE] = memoryview(screenbytes(data))
+    screen.flashframe = bool(flash)
+    screen.render()
+    surf = pygame.Surface((256, 192))
+    pygame.surfarray.blit_array(surf, screen.specarray)
+    sizex = max(int(SIZEX), 1)
+    if sizex > 1: surf = pygame.transform.scale(surf, (256*sizex, 192*sizex))
+    if border is None: return surf
+    out = pygame.Surface((320*sizex, 240*sizex))
+    out.fill(screen.palette[int(border) % 8])
+    out.blit(surf, (32*sizex, 24*sizex))
+    return out
+
+def renderfile(inpath, outpath, screen, SIZEX=1, flash=0, border=None):
+    with open(inpath, "rb") as f:
+        data = f.read()
+    import_pygame().image.save(screenimage(data, SIZEX, flash, border, screen), outpath)
+
+def renderfiles(paths, outdir, SIZEX=1, flash=0, border=None, processes=None):
+    """
+    Renders many screen dumps to PNG files, using a pool of processes. Yields ``(path, error)``
+    for each input as it finishes, where error is None if the image was written.
+
+    Args:
+
+    - paths - list of strings - the dumps to render.
+    - outdir - string - the directory to write the images to. They are named after the inputs, which must have
+      different names, as the directories they are in aren't kept. A ValueError is raised before anything is written
+      if they don't.
+    - SIZEX - integer - size multiplier for the images.
+    - flash - integer (0-1) - which phase of flashing attributes to show.
+    - border - integer (0-7) - optional - the border colour. Without this there is no border.
+    - processes - integer - optional - the number of processes. Defaults to the number of CPUs. With 1, the dumps
+      are rendered in this process.
+    """
+    options = {"SIZEX": SIZEX, "flash": flash, "border": border}
+    return mapfiles(renderfile, paths, outdir, ".png", options, processes)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m specgfx.render", description="Render screen dumps to PNG images.")
+    parser.add_argument("inputs", nargs="+", help="screen or memory dumps")
+    parser.add_argument("--output", "-o", default=".", help="directory to write the images to")
+    parser.add_argument("--sizex", type=int, default=1, help="size multiplier for the images")
+    parser.add_argument("--flash", type=int, default=0, choices=(0, 1), help="flash phase to show")
+    parser.add_argument("--border", type=int, help="border colour (0-7), no border if not given")
+    parser.add_argument("--processes", "-j", type=int, help="number of worker processes")
+    args = parser.parse_args(argv)
+
+    failed = 0
+    try:
+        for path, error in renderfiles(args.inputs, args.output, args.sizex, args.flash, args.border, args.processes):
+            if error:
+                failed += 1
+                print("%s: %s" % (path, error), file=sys.stderr)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sys.exit(main())
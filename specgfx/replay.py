@@ -0,0 +1,50 @@
+"""
+Replays a trace written by ``TRACE`` as a benchmark, and checks that it still draws the same screen::
+
+    python -m specgfx.replay session.sgt --json report.json
+
+Traces with pickled arguments, for things ``specgfx.trace.encode`` has no encoding of, are only replayed with
+``--allow-pickle``, as unpickling can run any code. Only use it for traces from somewhere you trust.
+"""
+
+import sys
+import json
+import argparse
+
+from .trace import BUCKETS, replay
+
+def bucketname(i):
+    if i == len(BUCKETS): return ">%gms" % (BUCKETS[-1] / 1e6)
+    t = BUCKETS[i]
+    return "<%gus" % (t / 1e3) if t < 1000000 else "<%gms" % (t / 1e6)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m specgfx.replay", description="Replay a specgfx trace as a benchmark.")
+    parser.add_argument("trace", help="a file written by TRACE")
+    parser.add_argument("--lut", action="store_true", help="render with a lookup table")
+    parser.add_argument("--indexed", action="store_true", help="render palette indices")
+    parser.add_argument("--json", help="file to write the report to, as JSON")
+    parser.add_argument("--allow-pickle", action="store_true", help="read pickled arguments, which can run any code")
+    args = parser.parse_args(argv)
+
+    try:
+        report = replay(args.trace, args.lut, args.indexed, args.allow_pickle)
+    except ValueError as e:
+        print("%s: %s" % (args.trace, e), file=sys.stderr)
+        return 1
+    print("%d calls, %d frames in %.3fs: %.0f calls/s, %.0f frames/s" % (report["calls"], report["frames"],
+        report["seconds"], report["calls_per_second"], report["frames_per_second"]))
+    for name, m in report["methods"].items():
+        hist = " ".join("%s:%d" % (bucketname(i), n) for i, n in enumerate(m["histogram"]) if n)
+        print("%-14s %8d %10.3fms %8.2fus  %s" % (name, m["count"], m["total"]*1e3, m["mean"]*1e6, hist))
+    print("hash %s" % report["hash"])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if report["traced_hash"] is not None and report["traced_hash"] != report["hash"]:
+        print("the hash differs from the traced one, %s" % report["traced_hash"], file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
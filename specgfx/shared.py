@@ -0,0 +1,132 @@
+"""
+Keeps a screen in shared memory, so that one process can draw on it while another shows it. This is used by
+``INIT(SHARED=True)``, which starts a display process (``python -m specgfx.display``) to show the screen, so that
+drawing and showing the screen happen at the same time on different cores, and if the display crashes, the program
+drawing the screen carries on.
+
+The shared block starts with a ``HEADER``, with the id of the drawing process, the size of the screen, a count of the
+frames drawn, the border, flash phase, text cursor and palette. Then there is a ring buffer of keys pressed and released
+in the display, as ``KEY`` structs (as in ``specgfx.stream``). Before the keys are a count of the keys written by the
+display, a count of the keys read by the drawing process, and a byte the display sets to stop the program. The header
+is only written by the drawing process, and each of these by one process, so neither needs a lock. After that are the
+screen memory and the sprites.
+"""
+
+import os
+import struct
+
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+
+from .specgfx import MAXSPRITES, SPRITESIZE
+from .stream import KEY, PRESS, RELEASE
+
+MAGIC = b"SPECSHM1"
+# magic, process id, columns, rows, memory size, frame number, border, flags, cursor x, cursor y, palette
+HEADER = struct.Struct("<8sIHHIQBBHH48s")
+# keys written, keys read, quit
+RING = struct.Struct("<IIB")
+RINGSIZE = 256
+
+FLASH = 1
+CURSOR = 2
+
+def align(n):
+    return (n + 63) & ~63
+
+class SharedBlock:
+    """
+    A screen's memory, sprites and state in shared memory.
+
+    Args:
+
+    - name - string - optional - the name of the block to attach to. If not given, a new block is made.
+    - cols - integer - the width of the screen in character cells, for a new block.
+    - rows - integer - the height of the screen in character cells, for a new block.
+    - memsize - integer - the number of bytes of screen memory, for a new block.
+    """
+
+    def __init__(self, name=None, cols=32, rows=24, memsize=32*1024):
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.layout(memsize))
+            self.cols, self.rows, self.memsize = cols, rows, memsize
+            self.shm.buf[:HEADER.size] = HEADER.pack(MAGIC, os.getpid(), cols, rows, memsize, 0, 7, 0, 0, 0, bytes(48))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # Otherwise the block is removed when this process ends, even though it didn't make it
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+            magic, self.pid, self.cols, self.rows, self.memsize = HEADER.unpack_from(self.shm.buf)[:5]
+            if magic != MAGIC: raise ValueError("%s is not a specgfx screen" % name)
+            self.layout(self.memsize)
+        self.name = self.shm.name
+        buf = self.shm.buf
+        self.pid = HEADER.unpack_from(buf)[1]
+        self.memory = np.ndarray((self.memsize,), np.uint8, buf, self.memstart)
+        spriteshape = (MAXSPRITES, SPRITESIZE, SPRITESIZE//8)
+        self.spritebits = np.ndarray(spriteshape, np.uint8, buf, self.bitsstart)
+        self.spritemasks = np.ndarray(spriteshape, np.uint8, buf, self.masksstart)
+        self.spritetable = np.ndarray((MAXSPRITES, 7), np.int32, buf, self.tablestart)
+
+    def layout(self, memsize):
+        # Works out where everything is, and returns the size of the block
+        self.ringstart = align(HEADER.size)
+        self.memstart = align(self.ringstart + RING.size + RINGSIZE * KEY.size)
+        spritesize = MAXSPRITES * SPRITESIZE * SPRITESIZE // 8
+        self.bitsstart = align(self.memstart + memsize)
+        self.masksstart = align(self.bitsstart + spritesize)
+        self.tablestart = align(self.masksstart + spritesize)
+        return self.tablestart + MAXSPRITES * 7 * 4
+
+    def publish(self, screen):
+        """Writes a screen's border, flash phase, cursor and palette, and counts a frame. Called by the drawing process."""
+        buf = self.shm.buf
+        header = list(HEADER.unpack_from(buf))
+        flags = (FLASH if screen.flashframe else 0) | (CURSOR if screen.showcursor else 0)
+        header[5:11] = (header[5] + 1, screen.border, flags, screen.cursorx % 65536, screen.cursory % 65536,
+            bytes(c for rgb in screen.palette for c in rgb))
+        HEADER.pack_into(buf, 0, *header)
+
+    def state(self):
+        """
+        Reads the state written by ``publish``: (frame number, border, flags, cursor x, cursor y, palette as a list of
+        (r,g,b) tuples).
+        """
+        frame, border, flags, cursorx, cursory, palette = HEADER.unpack_from(self.shm.buf)[5:]
+        return frame, border, flags, cursorx, cursory, [tuple(palette[i:i+3]) for i in range(0, 48, 3)]
+
+    def setquit(self):
+        """Asks the drawing process to stop. Called by the display."""
+        self.shm.buf[self.ringstart + 8] = 1
+
+    def quit(self):
+        return bool(self.shm.buf[self.ringstart + 8])
+
+    def pushkey(self, pressed, key, u):
+        """Adds a key pressed or released to the ring buffer, unless it is full. Called by the display."""
+        written, read = RING.unpack_from(self.shm.buf, self.ringstart)[:2]
+        if written - read >= RINGSIZE: return
+        pos = self.ringstart + RING.size + (written % RINGSIZE) * KEY.size
+        KEY.pack_into(self.shm.buf, pos, PRESS if pressed else RELEASE, key, ord(u) if len(u) == 1 else 0)
+        # The count is written after the key, so the drawing process never sees a key that isn't there yet
+        struct.pack_into("<I", self.shm.buf, self.ringstart, (written + 1) & 0xffffffff)
+
+    def popkeys(self):
+        """Takes the keys from the ring buffer, as (pressed, key, character) tuples. Called by the drawing process."""
+        written, read = RING.unpack_from(self.shm.buf, self.ringstart)[:2]
+        keys = []
+        while read != written:
+            kind, key, u = KEY.unpack_from(self.shm.buf, self.ringstart + RING.size + (read % RINGSIZE) * KEY.size)
+            keys.append((kind == PRESS, key, chr(u) if u else ""))
+            read = (read + 1) & 0xffffffff
+        struct.pack_into("<I", self.shm.buf, self.ringstart + 4, read)
+        return keys
+
+    def close(self):
+        """Removes the block, if this process made it."""
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            self.owner = False
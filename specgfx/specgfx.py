@@ -5,341 +5,131 @@ The main module. Import with::
 """
 
 import os
-os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
-import pygame
-from pygame.locals import *
 import numpy as np
 import time
 import sys
 import math
-
-from .cyrender import cyrender
-
-inkeys = ""
-
-def INIT(FULL=False, SIZEX=1):
-    """
-    Initialise the specgfx system.
-    
-    Args:
-    
-    - FULL - boolean - whether to initialise fullscreen. 
-    - SIZEX - integer - size multiplier for the output screen.
-    """
-    
-    global size, width, height, screen, specsurf, defchar, memory, autoupdate, flashframe
-    global charset
-    global palette, ipalette, specarray, defcharset
-    global flashc, flashrate, clock, cursorx, cursory, showcursor, printstate
-    global ink, paper, flash, bright, inverse, over, border, keysdown, inkeys, keyd
-    global graphicsx, graphicsy
-    global sizex, scaledsurf
-
-    graphicsx = 0
-    graphicsy = 0
-
-    pygame.mixer.pre_init(44100,8,1)
-    pygame.init()
-
-    sizex = int(SIZEX)
-    if sizex < 1:
-        sizex = 1
-
-    size = width, height = 320*sizex,240*sizex
-
-    if FULL:
-        screen = pygame.display.set_mode(size, FULLSCREEN)
-    else:
-        screen = pygame.display.set_mode(size)
-
-    specsurf = pygame.Surface((256, 192))
-    if sizex > 1: scaledsurf = pygame.Surface((256*sizex,192*sizex))
-
-    defcharset = [
-    (0,0,0,0,0,0,0,0),
-    (0,16,16,16,16,0,16,0),
-    (0,36,36,0,0,0,0,0),
-    (0,36,126,36,36,126,36,0),
-    (0,8,62,40,62,10,62,8),
-    (0,98,100,8,16,38,70,0),
-    (0,16,40,16,42,68,58,0),
-    (0,8,16,0,0,0,0,0),
-    (0,4,8,8,8,8,4,0),
-    (0,32,16,16,16,16,32,0),
-    (0,0,20,8,62,8,20,0),
-    (0,0,8,8,62,8,8,0),
-    (0,0,0,0,0,8,8,16),
-    (0,0,0,0,62,0,0,0),
-    (0,0,0,0,0,24,24,0),
-    (0,0,2,4,8,16,32,0),
-    (0,60,70,74,82,98,60,0),
-    (0,24,40,8,8,8,62,0),
-    (0,60,66,2,60,64,126,0),
-    (0,60,66,12,2,66,60,0),
-    (0,8,24,40,72,126,8,0),
-    (0,126,64,124,2,66,60,0),
-    (0,60,64,124,66,66,60,0),
-    (0,126,2,4,8,16,16,0),
-    (0,60,66,60,66,66,60,0),
-    (0,60,66,66,62,2,60,0),
-    (0,0,0,16,0,0,16,0),
-    (0,0,16,0,0,16,16,32),
-    (0,0,4,8,16,8,4,0),
-    (0,0,0,62,0,62,0,0),
-    (0,0,16,8,4,8,16,0),
-    (0,60,66,4,8,0,8,0),
-    (0,60,74,86,94,64,60,0),
-    (0,60,66,66,126,66,66,0),
-    (0,124,66,124,66,66,124,0),
-    (0,60,66,64,64,66,60,0),
-    (0,120,68,66,66,68,120,0),
-    (0,126,64,124,64,64,126,0),
-    (0,126,64,124,64,64,64,0),
-    (0,60,66,64,78,66,60,0),
-    (0,66,66,126,66,66,66,0),
-    (0,62,8,8,8,8,62,0),
-    (0,2,2,2,66,66,60,0),
-    (0,68,72,112,72,68,66,0),
-    (0,64,64,64,64,64,126,0),
-    (0,66,102,90,66,66,66,0),
-    (0,66,98,82,74,70,66,0),
-    (0,60,66,66,66,66,60,0),
-    (0,124,66,66,124,64,64,0),
-    (0,60,66,66,82,74,60,0),
-    (0,124,66,66,124,68,66,0),
-    (0,60,64,60,2,66,60,0),
-    (0,254,16,16,16,16,16,0),
-    (0,66,66,66,66,66,60,0),
-    (0,66,66,66,66,36,24,0),
-    (0,66,66,66,66,90,36,0),
-    (0,66,36,24,24,36,66,0),
-    (0,130,68,40,16,16,16,0),
-    (0,126,4,8,16,32,126,0),
-    (0,14,8,8,8,8,14,0),
-    (0,0,64,32,16,8,4,0),
-    (0,112,16,16,16,16,112,0),
-    (0,16,56,84,16,16,16,0),
-    (0,0,0,0,0,0,0,255),
-    (0,28,34,120,32,32,126,0),
-    (0,0,56,4,60,68,60,0),
-    (0,32,32,60,34,34,60,0),
-    (0,0,28,32,32,32,28,0),
-    (0,4,4,60,68,68,60,0),
-    (0,0,56,68,120,64,60,0),
-    (0,12,16,24,16,16,16,0),
-    (0,0,60,68,68,60,4,56),
-    (0,64,64,120,68,68,68,0),
-    (0,16,0,48,16,16,56,0),
-    (0,4,0,4,4,4,36,24),
-    (0,32,40,48,48,40,36,0),
-    (0,16,16,16,16,16,12,0),
-    (0,0,104,84,84,84,84,0),
-    (0,0,120,68,68,68,68,0),
-    (0,0,56,68,68,68,56,0),
-    (0,0,120,68,68,120,64,64),
-    (0,0,60,68,68,60,4,6),
-    (0,0,28,32,32,32,32,0),
-    (0,0,56,64,56,4,120,0),
-    (0,16,56,16,16,16,12,0),
-    (0,0,68,68,68,68,56,0),
-    (0,0,68,68,40,40,16,0),
-    (0,0,68,84,84,84,40,0),
-    (0,0,68,40,16,40,68,0),
-    (0,0,68,68,68,60,4,56),
-    (0,0,124,8,16,32,124,0),
-    (0,14,8,48,8,8,14,0),
-    (0,8,8,8,8,8,8,0),
-    (0,112,16,12,16,16,112,0),
-    (0,20,40,0,0,0,0,0),
-    (60,66,153,161,161,153,66,60),
-    # block character
-    (0,0,0,0,0,0,0,0),
-    (15,15,15,15,0,0,0,0),
-    (240,240,240,240,0,0,0,0),
-    (255,255,255,255,0,0,0,0),
-    (0,0,0,0,15,15,15,15),
-    (15,15,15,15,15,15,15,15),
-    (240,240,240,240,15,15,15,15),
-    (255,255,255,255,15,15,15,15),
-    (0,0,0,0,240,240,240,240),
-    (15,15,15,15,240,240,240,240),
-    (240,240,240,240,240,240,240,240),
-    (255,255,255,255,240,240,240,240),
-    (0,0,0,0,255,255,255,255),
-    (15,15,15,15,255,255,255,255),
-    (240,240,240,240,255,255,255,255),
-    (255,255,255,255,255,255,255,255)
-    ]
-    
-    charset = [defcharset[i-32] if i>32 and i-32<len(defcharset) else (0,0,0,0,0,0,0,0) for i in range(256)]
-
-    palette = [
-        (0,0,0),
-        (0,0,215),
-        (215,0,0),
-        (215,0,215),
-        (0,215,0),
-        (0,215,215),
-        (215,215,0),
-        (215,215,215),
-        (0,0,0),
-        (0,0,255),
-        (255,0,0),
-        (255,0,255),
-        (0,255,0),
-        (0,255,255),
-        (255,255,0),
-        (255,255,255)
-    ]
-
-    running = True
-
-    ipalette = np.array([256*256*i[0]+256*i[1]+i[2] for i in palette], dtype=np.int32)
-
-    memory = np.zeros((32*1024,),dtype=np.uint8)
-    screen.fill(palette[2])
-    specsurf.fill(palette[2])
-    specarray = np.zeros((256,192), dtype=np.int32)
-    #specarray = pygame.surfarray.array2d(specsurf)
-
-    autoupdate = True
-    flashframe = False
-    flashc = 0
-    flashrate = 25
-    clock = pygame.time.Clock()
-
-    cursorx = 0
-    cursory = 0
-    showcursor = False
-
-    ink = 0
-    paper = 7
-    flash = 0
-    bright = 0
-    inverse = 0
-    over = 0
-
-    border = 7
-
-    keysdown = []
-    inkeys = ""
-    keyd = {}
-
-    set_attr()
-    printstate = ""
-
-    for i in range(32):
-        for j in range(24):
-            #memory[0x5800+i+32*j] = (i+32*j)%256
-            memory[0x5800+i+32*j] = attr
-            
-
-def set_attr():
-    global attr
-    attr = ink + 8*(paper) + 64*bright + 128*flash
-
-def render():
-    t = time.time()
-    cyrender(memory, specarray, ipalette, flashframe, showcursor, cursorx, cursory)
-    screen.fill(palette[border])
-    pygame.surfarray.blit_array(specsurf, specarray)
-    if sizex == 1:
-        screen.blit(specsurf, ((width-256)/2,(height-192)/2))
-    else:
-        pygame.transform.scale(specsurf, (256*sizex,192*sizex), scaledsurf)
-        screen.blit(scaledsurf, ((width-256*sizex)/2,(height-192*sizex)/2))
-    #print(time.time()-t)
-
-# Old non-Cython render code
-def slowrender():
-    t = time.time()
-    for cx in range(32):
-        for cy in range(24):
-            attr = memory[0x5800+cx+32*cy]
-            
-            _ink = attr % 8
-            
-            _paper = int(attr/8)%8
-            bright = int(attr/64)%2
-            flash = int(attr/128)
-            if showcursor and cx == cursorx and cy == cursory:
-                _ink = ink
-                _paper = paper
-                flash = True
-            
-            _ink += bright*8
-            _paper += bright*8
-            
-            if flash and flashframe: _ink,_paper = _paper,_ink
-            
-            _ink = ipalette[_ink]
-            _paper = ipalette[_paper]
-            
-            lowy = cy % 8
-            highy = int(cy/8)
-            mp = 0x4000+cx+32*lowy+256*8*highy
-            for midy in range(8):
-                ypos = midy+8*cy
-                m = int(memory[mp+256*midy])
-                #print(type(m))
-                xpos = 8*cx
-                for b,mask in enumerate((128,64,32,16,8,4,2,1)):
-                    v = m & mask
-                    if v:
-                        specarray[xpos+b,ypos] = _ink
-                    else: 
-                        specarray[xpos+b,ypos] = _paper
-    screen.fill(palette[border])
-    pygame.surfarray.blit_array(specsurf, specarray)
-    if sizex == 1:
-        screen.blit(specsurf, ((width-256)/2,(height-192)/2))
-    else:
-        pygame.transform.scale(specsurf, (256*sizex,192*sizex), scaledsurf)
-        screen.blit(scaledsurf, ((width-256*sizex)/2,(height-192*sizex)/2))
-
-def scrollup():
-    global cursory
-    cursory -= 1
-    if cursory < 0: cursory = 0
-    for cy in range(0,23):
-        ncy = cy + 1
-        lowy = cy % 8
-        nlowy = ncy % 8
-        highy = int(cy/8)
-        nhighy = int(ncy/8)
-        baddr = 0x4000 + 32*lowy + 2048*highy
-        nbaddr = 0x4000 + 32*nlowy + 2048*nhighy
-        for midyv in range(0,2048,256):
-            addr = baddr+midyv
-            naddr = nbaddr+midyv
-            memory[addr:addr+32] = memory[naddr:naddr+32]
-        memory[0x5800+32*cy:0x5800+32*cy+32] = memory[0x5800+32*cy+32:0x5800+32*cy+64]
-    for midyv in range(0,2048,256):
-        #hex(0x4000 + 32*7 + 2048*2) = 0x50e0  
-            memory[0x50e0+midyv:0x5100+midyv] = 0
-    set_attr()
-    memory[0x5800+32*23:0x5800+32*24] = attr
-
-def SCROLLUP():
-    """
-    Scrolls the screen upwards by one character cell - i.e. 8 pixels.
-    """
-    scrollup()
-    if autoupdate: UPDATE()
-
-def putchar(ascii,x,y):
-    lowy = y % 8
-    highy = int(y/8)
-    addr = 0x4000+x+32*lowy+256*8*highy
-    if over:
-        for a in range(8):
-            memory[a*256+addr] ^= charset[ascii][a]
-    elif inverse:
-        for a in range(8):
-            memory[a*256+addr] = 255 - charset[ascii][a]        
-    else:
-        for a in range(8):
-            memory[a*256+addr] = charset[ascii][a]
+import functools
+import inspect
+import atexit
+import subprocess
+import hashlib
+
+from .cyrender import cyrender, lutrender, spriterender, runlist, drawmap, CLASSICROWS
+from .cyrender import DL_PLOT, DL_MOVE, DL_LINE, DL_LINETO, DL_ARC, DL_CIRCLE, DL_CHARS, DL_ATTRS
+
+# pygame is slow to import, so it is imported when the display or the mixer is first needed.
+pygame = None
+
+# The default character set: 8 bytes for each character from 32 to 143.
+DEFCHARS = bytes.fromhex(
+    "00000000000000000010101010001000" # 20 21
+    "002424000000000000247e24247e2400" # 22 23
+    "00083e283e0a3e080062640810264600" # 24 25
+    "001028102a443a000008100000000000" # 26 27
+    "00040808080804000020101010102000" # 28 29
+    "000014083e081400000008083e080800" # 2a 2b
+    "0000000000080810000000003e000000" # 2c 2d
+    "00000000001818000000020408102000" # 2e 2f
+    "003c464a52623c000018280808083e00" # 30 31
+    "003c42023c407e00003c420c02423c00" # 32 33
+    "00081828487e0800007e407c02423c00" # 34 35
+    "003c407c42423c00007e020408101000" # 36 37
+    "003c423c42423c00003c42423e023c00" # 38 39
+    "00000010000010000000100000101020" # 3a 3b
+    "00000408100804000000003e003e0000" # 3c 3d
+    "0000100804081000003c420408000800" # 3e 3f
+    "003c4a565e403c00003c42427e424200" # 40 41
+    "007c427c42427c00003c424040423c00" # 42 43
+    "0078444242447800007e407c40407e00" # 44 45
+    "007e407c40404000003c42404e423c00" # 46 47
+    "0042427e42424200003e080808083e00" # 48 49
+    "0002020242423c000044487048444200" # 4a 4b
+    "0040404040407e000042665a42424200" # 4c 4d
+    "004262524a464200003c424242423c00" # 4e 4f
+    "007c42427c404000003c4242524a3c00" # 50 51
+    "007c42427c444200003c403c02423c00" # 52 53
+    "00fe1010101010000042424242423c00" # 54 55
+    "004242424224180000424242425a2400" # 56 57
+    "00422418182442000082442810101000" # 58 59
+    "007e040810207e00000e080808080e00" # 5a 5b
+    "00004020100804000070101010107000" # 5c 5d
+    "001038541010100000000000000000ff" # 5e 5f
+    "001c227820207e00000038043c443c00" # 60 61
+    "0020203c22223c0000001c2020201c00" # 62 63
+    "0004043c44443c000000384478403c00" # 64 65
+    "000c10181010100000003c44443c0438" # 66 67
+    "00404078444444000010003010103800" # 68 69
+    "00040004040424180020283030282400" # 6a 6b
+    "0010101010100c000000685454545400" # 6c 6d
+    "00007844444444000000384444443800" # 6e 6f
+    "000078444478404000003c44443c0406" # 70 71
+    "00001c20202020000000384038047800" # 72 73
+    "0010381010100c000000444444443800" # 74 75
+    "00004444282810000000445454542800" # 76 77
+    "000044281028440000004444443c0438" # 78 79
+    "00007c0810207c00000e083008080e00" # 7a 7b
+    "00080808080808000070100c10107000" # 7c 7d
+    "00142800000000003c4299a1a199423c" # 7e 7f
+    "00000000000000000f0f0f0f00000000" # 80 81
+    "f0f0f0f000000000ffffffff00000000" # 82 83
+    "000000000f0f0f0f0f0f0f0f0f0f0f0f" # 84 85
+    "f0f0f0f00f0f0f0fffffffff0f0f0f0f" # 86 87
+    "00000000f0f0f0f00f0f0f0ff0f0f0f0" # 88 89
+    "f0f0f0f0f0f0f0f0fffffffff0f0f0f0" # 8a 8b
+    "00000000ffffffff0f0f0f0fffffffff" # 8c 8d
+    "f0f0f0f0ffffffffffffffffffffffff" # 8e 8f
+    )
+DEFCHARSET = bytes(8*32) + DEFCHARS + bytes(8*256 - 8*32 - len(DEFCHARS))
+# The same, as a (256,8) array with a row for each character
+DEFCHARARRAY = np.frombuffer(DEFCHARSET, dtype=np.uint8).reshape(256,8)
+
+DEFPALETTE = [
+    (0,0,0),
+    (0,0,215),
+    (215,0,0),
+    (215,0,215),
+    (0,215,0),
+    (0,215,215),
+    (215,215,0),
+    (215,215,215),
+    (0,0,0),
+    (0,0,255),
+    (255,0,0),
+    (255,0,255),
+    (0,255,0),
+    (0,255,255),
+    (255,255,0),
+    (255,255,255)
+]
+
+# BITS[b] is the 8 pixels of the byte b, as booleans
+BITS = np.unpackbits(np.arange(256, dtype=np.uint8)[:,None], axis=1).astype(bool)
+
+# The number of sprites, and the most pixels across and down each can be
+MAXSPRITES = 64
+SPRITESIZE = 32
+
+# How long each phase of flashing attributes lasts, in seconds, and the most frames in a row that can go
+# unshown when the screen can't keep up, so that it still changes now and then
+FLASHTIME = 25/60
+MAXSKIP = 4
+
+mixer = False
+
+def import_pygame():
+    global pygame
+    if pygame is None:
+        os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
+        import pygame as _pygame
+        pygame = _pygame
+    return pygame
+
+def init_mixer():
+    global mixer
+    import_pygame()
+    pygame.mixer.init(44100,8,1)
+    mixer = True
 
 stated = {
     16: "INK",
@@ -352,82 +142,1434 @@ stated = {
     23: "TAB",
 }
 
-def printchar(ch):
-    global cursorx, cursory, printstate, ink, paper, attr, bright, flash, inverse, over
-    if type(ch) == str: ch = ord(ch)
-    if printstate:
-        if printstate == "AT1":
-            cursory = ch
-            printstate = "AT2"
-        elif printstate == "AT2":
-            cursorx = ch
-            printstate = ""
-        elif printstate == "INK":
-            ink = ch % 8
-            set_attr()
-            printstate = ""
-        elif printstate == "PAPER":
-            paper = ch % 8
-            set_attr()
-            printstate = ""
-        elif printstate == "FLASH":
-            flash = ch % 2
-            set_attr()
-            printstate = ""
-        elif printstate == "BRIGHT":
-            bright = ch % 2
-            set_attr()
-            printstate = ""
-        elif printstate == "INVERSE":
-            inverse = ch % 2
-            set_attr()
-            printstate = ""
-        elif printstate == "OVER":
-            over = ch % 2
-            set_attr()
-            printstate = ""
-        elif printstate == "TAB":
-            newx = ch % 32
-            if newx < cursorx: cursory += 1
-            cursorx = newx
-            printstate = ""
-    elif ch < 32:
-        if ch == 10:
-            cursorx = 0
-            cursory += 1
-        elif ch == 12:
-            cursorx -= 1
-            if cursorx < 0:
-                cursorx = 31
-                cursory -= 1
-                if cursory < 0:
-                    cursory = 23
-            putchar(ord(" "), cursorx, cursory)
-        elif ch in stated:
-            printstate = stated[ch]
-    else:    
-        putchar(ch, cursorx, cursory)
-        memory[0x5800+cursorx+32*cursory] = attr
-        cursorx += 1
-    while cursorx >= 32:
-        cursorx -= 32
-        cursory += 1
-    while cursory >= 24:
-        scrollup()
-        #cursory -= 24
-        
-def BORDER(n):
+def attrmask(ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+    # The bits of an attribute to keep, and the bits to set
+    mask = 255
+    attr = 0
+    # todo check input
+    if ATTR is not None:
+        attr = int(ATTR) % 256
+        mask = 0
+    else:
+        if INK is not None:
+            attr += int(INK) % 8
+            mask &= 0b11111000
+        if PAPER is not None:
+            attr += 8 * (int(PAPER) % 8)
+            mask &= 0b11000111
+        if BRIGHT is not None:
+            attr += 64 * (int(BRIGHT) % 2)
+            mask &= 0b10111111
+        if FLASH is not None:
+            attr += 128 * (int(FLASH) % 2)
+            mask &= 0b01111111
+    return mask, attr
+
+def fontcount(size, offset):
+    # The number of whole characters in font data of size bytes, from offset
+    count = (size - offset) // 8
+    if count < 1: raise ValueError("there isn't a whole character in %d bytes from %d" % (size, offset))
+    return count
+
+class Screen:
     """
-    Sets the border colour.
-    
+    A specgfx screen - the screen memory, character set, text and graphics cursors, colours and
+    keyboard state. The upper-case functions in this module work on the screen made by ``INIT``;
+    the methods of the same names here work on one particular screen, so several independent
+    screens can be used at once. Example::
+
+        s = Screen(HEADLESS=True)
+        s.PRINT(AT(1,1), "Hello world!")
+        s.UPDATE()
+
+    The screen is normally 32x24 character cells, laid out in memory as on a ZX Spectrum. Other sizes, such as 80x30
+    for a text dashboard, can be set with COLS and ROWS. These have a simpler layout: the bitmap starts at 0x4000 and
+    goes a line of pixels at a time, with each line ``COLS`` bytes long, and the attributes follow it, a row at a time.
+    The memory is made bigger than 32k if it needs to be.
+
+    Only one screen can be shown in the pygame window at a time. Headless screens are rendered
+    by ``UPDATE``, but never open a window or read the keyboard. Different screens can be used from
+    different threads - the renderer releases the GIL - but one screen should only be used
+    from one thread at a time.
+
     Args:
-        
-    - n - integer - the border colour (0-7)
+
+    - FULL - boolean - whether to show the window fullscreen.
+    - SIZEX - integer - size multiplier for the output screen.
+    - HEADLESS - boolean - whether to render without a window.
+    - LUT - boolean - whether to render with a lookup table of the pixels for each attribute and byte.
+      This is faster, but the table takes 4MB (1MB if INDEXED).
+    - INDEXED - boolean - whether to render palette indices to an 8-bit surface, rather than RGB colours to a
+      32-bit one. This moves a quarter of the data, and changes to the palette don't need the screen to be rendered again.
+    - COLS - integer - the width of the screen in character cells.
+    - ROWS - integer - the height of the screen in character cells.
+    - SHARED - boolean - whether to keep the screen in shared memory, and show it from a separate display process
+      (see ``specgfx.shared``). The screen is then headless in this process.
+    - FPS - number - how many frames a second to show. Screens that are shown (not headless) keep time by the clock:
+      flashing and ``PAUSE`` take the same time however fast the computer is, and if drawing the screen falls behind,
+      some frames aren't shown. Headless screens don't wait, and count each ``UPDATE`` as one frame.
     """
-    global border
-    border = int(n) % 8
-    if autoupdate: UPDATE()
-       
+
+    def __init__(self, FULL=False, SIZEX=1, HEADLESS=False, LUT=False, INDEXED=False, COLS=32, ROWS=24, SHARED=False, FPS=60):
+        self.graphicsx = 0
+        self.graphicsy = 0
+
+        self.sizex = int(SIZEX)
+        if self.sizex < 1:
+            self.sizex = 1
+
+        # rowaddr is the address of each line of pixels, and linestride the distance between the lines of a character cell
+        self.cols, self.rows = int(COLS), int(ROWS)
+        if self.cols < 1 or self.rows < 1: raise ValueError("the screen must be at least one character cell across and down")
+        self.linear = (self.cols, self.rows) != (32, 24)
+        self.pixw, self.pixh = 8*self.cols, 8*self.rows
+        if self.linear:
+            self.rowaddr = np.arange(0x4000, 0x4000 + self.cols*self.pixh, self.cols, dtype=np.int32)
+            self.linestride = self.cols
+            self.attrbase = 0x4000 + self.cols*self.pixh
+        else:
+            self.rowaddr = np.array(CLASSICROWS, dtype=np.int32)
+            self.linestride = 256
+            self.attrbase = 0x5800
+        self.screenend = self.attrbase + self.cols*self.rows
+        self.bitmapindex = self.rowaddr[:,None] + np.arange(self.cols, dtype=np.int32)
+
+        self.size = self.width, self.height = (self.pixw+64)*self.sizex,(self.pixh+48)*self.sizex
+        self.fullscreen = FULL
+        self.headless = HEADLESS or SHARED
+        self.screen = None
+
+        # The character sets, by name. charset is the one in use, so switching banks is just changing which array that is.
+        self.charbanks = {"default": DEFCHARARRAY.copy()}
+        self.charbank = "default"
+        self.charset = self.charbanks["default"]
+
+        self.palette = list(DEFPALETTE)
+        self.ipalette = np.array([256*256*i[0]+256*i[1]+i[2] for i in self.palette], dtype=np.int32)
+
+        # A shared screen's memory and sprites are in a block that the display process can see too
+        self.shared = None
+        self.display = None
+        if SHARED:
+            from .shared import SharedBlock
+            self.shared = SharedBlock(cols=self.cols, rows=self.rows, memsize=max(32*1024, self.screenend))
+            self.memory = self.shared.memory
+        else:
+            self.memory = np.zeros((max(32*1024, self.screenend),),dtype=np.uint8)
+        # The attributes, as a view of the memory with a row for each row of the screen
+        self.attrs = self.memory[self.attrbase:self.screenend].reshape(self.rows, self.cols)
+        # specarray is indexed [x,y] like a pygame surface, but stored a row at a time. outpalette is
+        # what is written to it for each colour - either the packed RGB colour, or the palette index.
+        self.indexed = INDEXED
+        if INDEXED:
+            self.outpalette = np.arange(16, dtype=np.uint8)
+        else:
+            self.outpalette = self.ipalette
+        self.specrows = np.zeros((self.pixh,self.pixw), dtype=self.outpalette.dtype)
+        self.specarray = self.specrows.T
+
+        # lut[attr + 256*(flashing and flashframe), byte] is the pixels for a byte of the bitmap. Entries are
+        # filled in when an attribute first appears on the screen, and all emptied when the palette changes.
+        self.lut = None
+        if LUT:
+            self.lut = np.zeros((512,256,8), dtype=self.outpalette.dtype)
+            self.lutbuilt = np.zeros(512, dtype=np.uint8)
+            self.lutmissing = np.zeros(512, dtype=np.int32)
+            self.lutpalette = self.outpalette.copy()
+
+        # The sprites, drawn over the screen by render. Each row of spritetable is a sprite's
+        # x, y, width, height, ink, paper (-1 for none) and whether it is shown.
+        if SHARED:
+            self.spritebits, self.spritemasks, self.spritetable = self.shared.spritebits, self.shared.spritemasks, self.shared.spritetable
+        else:
+            self.spritebits = np.zeros((MAXSPRITES, SPRITESIZE, SPRITESIZE//8), dtype=np.uint8)
+            self.spritemasks = np.zeros_like(self.spritebits)
+            self.spritetable = np.zeros((MAXSPRITES, 7), dtype=np.int32)
+        self.spritesshown = 0
+
+        self.autoupdate = True
+        self.flashframe = False
+
+        # time is how long the screen has been running, in seconds. Paced screens take it from the clock, and wait
+        # until nextframe before each frame; others add a frame's worth each update. showtime is how long the last
+        # frame shown took to show, and skipped the number of frames in a row that weren't shown to catch up.
+        if FPS <= 0: raise ValueError("FPS must be more than 0")
+        self.fps = FPS
+        self.paced = not self.headless or SHARED
+        self.frames = 0
+        self.time = 0
+        self.starttime = self.nextframe = time.monotonic()
+        self.showtime = 0
+        self.skipped = 0
+
+        self.cursorx = 0
+        self.cursory = 0
+        self.showcursor = False
+
+        self.ink = 0
+        self.paper = 7
+        self.flash = 0
+        self.bright = 0
+        self.inverse = 0
+        self.over = 0
+
+        self.border = 7
+
+        self.keysdown = []
+        self.inkeys = ""
+        self.keyd = {}
+
+        # Functions called with the screen each time a frame is rendered, and with
+        # (pressed, key, character) each time a key is pressed or released
+        self.framehooks = []
+        self.keyhooks = []
+
+        self.set_attr()
+        self.printstate = ""
+
+        self.attrs[:] = self.attr
+
+        if SHARED:
+            self.shared.publish(self)
+            args = [sys.executable, "-m", "specgfx.display", self.shared.name, "--sizex", str(self.sizex), "--fps", str(FPS)]
+            if FULL: args.append("--full")
+            if LUT: args.append("--lut")
+            if INDEXED: args.append("--indexed")
+            self.display = subprocess.Popen(args)
+            atexit.register(self.closeshared)
+
+    def closeshared(self):
+        # Stops the display process and removes the shared memory, when the program ends
+        if self.display is not None and self.display.poll() is None:
+            self.display.terminate()
+        if self.shared is not None: self.shared.close()
+
+    def init_display(self):
+        import_pygame()
+        pygame.display.init()
+        if self.fullscreen:
+            self.screen = pygame.display.set_mode(self.size, pygame.FULLSCREEN)
+        else:
+            self.screen = pygame.display.set_mode(self.size)
+        depth = {"depth": 8} if self.indexed else {}
+        self.specsurf = pygame.Surface((self.pixw, self.pixh), **depth)
+        if self.sizex > 1: self.scaledsurf = pygame.Surface((self.pixw*self.sizex,self.pixh*self.sizex), **depth)
+        self.clock = pygame.time.Clock()
+
+    def set_attr(self):
+        self.attr = self.ink + 8*(self.paper) + 64*self.bright + 128*self.flash
+
+    def render(self):
+        if self.lut is not None:
+            if self.lutpalette.tobytes() != self.outpalette.tobytes():
+                self.lutbuilt[:] = 0
+                self.lutpalette[:] = self.outpalette
+            while True:
+                n = lutrender(self.memory, self.specrows, self.lut, self.lutbuilt, self.lutmissing,
+                    self.flashframe, self.showcursor, self.cursorx, self.cursory, *self.geometry())
+                if not n: break
+                self.buildlut(self.lutmissing[:n])
+        else:
+            cyrender(self.memory, self.specarray, self.outpalette, self.flashframe, self.showcursor, self.cursorx, self.cursory,
+                *self.geometry())
+        if self.spritesshown:
+            spriterender(self.specrows, self.outpalette, self.spritebits, self.spritemasks, self.spritetable)
+        if self.headless: return
+        if self.screen is None: self.init_display()
+        self.blit()
+
+    def geometry(self):
+        # The layout of the screen, as the renderers take it
+        return self.rowaddr, self.attrbase, self.cols, self.rows
+
+    def buildlut(self, missing):
+        bright = (missing >> 3) & 8
+        ink = (missing & 7) | bright
+        paper = ((missing >> 3) & 7) | bright
+        swap = missing >= 256
+        ink, paper = np.where(swap, paper, ink), np.where(swap, ink, paper)
+        self.lut[missing] = np.where(BITS, self.outpalette[ink][:,None,None], self.outpalette[paper][:,None,None])
+        self.lutbuilt[missing] = 1
+
+    def blit(self):
+        sizex, width, height, pixw, pixh = self.sizex, self.width, self.height, self.pixw, self.pixh
+        self.screen.fill(self.palette[self.border])
+        pygame.surfarray.blit_array(self.specsurf, self.specarray)
+        if self.indexed:
+            self.specsurf.set_palette(self.palette)
+            if sizex > 1: self.scaledsurf.set_palette(self.palette)
+        if sizex == 1:
+            self.screen.blit(self.specsurf, ((width-pixw)/2,(height-pixh)/2))
+        else:
+            pygame.transform.scale(self.specsurf, (pixw*sizex,pixh*sizex), self.scaledsurf)
+            self.screen.blit(self.scaledsurf, ((width-pixw*sizex)/2,(height-pixh*sizex)/2))
+
+    # Old non-Cython render code
+    def slowrender(self):
+        memory, specarray, outpalette = self.memory, self.specarray, self.outpalette
+        for cx in range(self.cols):
+            for cy in range(self.rows):
+                attr = memory[self.attrbase+cx+self.cols*cy]
+
+                _ink = attr % 8
+
+                _paper = int(attr/8)%8
+                bright = int(attr/64)%2
+                flash = int(attr/128)
+                if self.showcursor and cx == self.cursorx and cy == self.cursory:
+                    _ink = self.ink
+                    _paper = self.paper
+                    flash = True
+
+                _ink += bright*8
+                _paper += bright*8
+
+                if flash and self.flashframe: _ink,_paper = _paper,_ink
+
+                _ink = outpalette[_ink]
+                _paper = outpalette[_paper]
+
+                for midy in range(8):
+                    ypos = midy+8*cy
+                    m = int(memory[self.rowaddr[ypos]+cx])
+                    xpos = 8*cx
+                    for b,mask in enumerate((128,64,32,16,8,4,2,1)):
+                        v = m & mask
+                        if v:
+                            specarray[xpos+b,ypos] = _ink
+                        else:
+                            specarray[xpos+b,ypos] = _paper
+        if self.spritesshown:
+            spriterender(self.specrows, outpalette, self.spritebits, self.spritemasks, self.spritetable)
+        if self.headless: return
+        if self.screen is None: self.init_display()
+        self.blit()
+
+    def scrollup(self):
+        memory = self.memory
+        self.cursory -= 1
+        if self.cursory < 0: self.cursory = 0
+        # bitmapindex has the address of each byte of the bitmap, a line of pixels to a row
+        index = self.bitmapindex
+        memory[index[:-8]] = memory[index[8:]]
+        memory[index[-8:]] = 0
+        self.attrs[:-1] = self.attrs[1:]
+        self.set_attr()
+        self.attrs[-1] = self.attr
+
+    def SCROLLUP(self):
+        """
+        Scrolls the screen upwards by one character cell - i.e. 8 pixels.
+        """
+        self.scrollup()
+        if self.autoupdate: self.UPDATE()
+
+    def putchar(self, ascii,x,y):
+        memory = self.memory
+        char = self.charset[ascii]
+        addr = self.rowaddr[8*y]+x
+        stride = self.linestride
+        rows = memory[addr:addr+8*stride:stride]
+        if self.over:
+            rows ^= char
+        elif self.inverse:
+            rows[:] = 255 - char
+        else:
+            rows[:] = char
+
+    def printchar(self, ch):
+        if type(ch) == str: ch = ord(ch)
+        printstate = self.printstate
+        if printstate:
+            if printstate == "AT1":
+                self.cursory = ch
+                self.printstate = "AT2"
+            elif printstate == "AT2":
+                self.cursorx = ch
+                self.printstate = ""
+            elif printstate == "INK":
+                self.ink = ch % 8
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "PAPER":
+                self.paper = ch % 8
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "FLASH":
+                self.flash = ch % 2
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "BRIGHT":
+                self.bright = ch % 2
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "INVERSE":
+                self.inverse = ch % 2
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "OVER":
+                self.over = ch % 2
+                self.set_attr()
+                self.printstate = ""
+            elif printstate == "TAB":
+                newx = ch % self.cols
+                if newx < self.cursorx: self.cursory += 1
+                self.cursorx = newx
+                self.printstate = ""
+        elif ch < 32:
+            if ch == 10:
+                self.cursorx = 0
+                self.cursory += 1
+            elif ch == 12:
+                self.cursorx -= 1
+                if self.cursorx < 0:
+                    self.cursorx = self.cols - 1
+                    self.cursory -= 1
+                    if self.cursory < 0:
+                        self.cursory = self.rows - 1
+                self.putchar(ord(" "), self.cursorx, self.cursory)
+            elif ch in stated:
+                self.printstate = stated[ch]
+        else:
+            self.putchar(ch, self.cursorx, self.cursory)
+            self.memory[self.attrbase+self.cursorx+self.cols*self.cursory] = self.attr
+            self.cursorx += 1
+        while self.cursorx >= self.cols:
+            self.cursorx -= self.cols
+            self.cursory += 1
+        while self.cursory >= self.rows:
+            self.scrollup()
+
+    def PALETTE(self, colours=None):
+        """
+        Gets or sets the 16 colours that the screen is shown in - 0-7 are the normal colours and 8-15 the bright ones.
+        Returns the palette from before the call, as a list of (r,g,b) tuples.
+
+        Args:
+
+        - colours - optional - a list of 16 (r,g,b) tuples, each value 0-255.
+        """
+        old = list(self.palette)
+        if colours is not None:
+            if len(colours) != 16: raise ValueError("the palette must have 16 colours")
+            self.palette = [tuple(int(v) for v in c) for c in colours]
+            self.ipalette[:] = [256*256*i[0]+256*i[1]+i[2] for i in self.palette]
+            if self.autoupdate: self.UPDATE()
+        return old
+
+    def BORDER(self, n):
+        """
+        Sets the border colour.
+
+        Args:
+
+        - n - integer - the border colour (0-7)
+        """
+        self.border = int(n) % 8
+        if self.autoupdate: self.UPDATE()
+
+    def printitem(self, ss):
+        if type(ss) is not str: ss = str(ss)
+        for c in ss:
+            self.printchar(c)
+
+    def PRINT(self, *s, sep="", end="\n", set=False):
+        """
+        Outputs characters to the screen. By default this does not include a newline (use \\\\n),
+        or spaces between the outputs.
+
+        Args:
+
+        -    s - things to print.
+        -    sep - same as Python's sep option for print.
+        -    end - same as Python's end option for print.
+        -    set - boolean - whether any changes made with INK, PAPER, BRIGHT, FLASH, INVERSE or OVER are permanent or not.
+        """
+        if not set: store = (self.ink,self.paper,self.flash,self.bright,self.inverse,self.over)
+        first = True
+        for ss in s:
+            if first:
+                first = False
+            elif sep:
+                self.printitem(sep)
+            self.printitem(ss)
+        if end: self.printitem(end)
+        if not set:
+            self.ink,self.paper,self.flash,self.bright,self.inverse,self.over = store
+            self.set_attr()
+        if self.autoupdate: self.UPDATE()
+
+    def SET(self, *s, sep="", end=""):
+        """
+        Use this to set ink, paper, inverse etc. for text. This works like ``PRINT``, but all changes to ink
+        etc. are permanent.
+
+        Args:
+
+        -    s - things to print.
+        -    sep - same as Python's sep option for print.
+        -    end - same as Python's end option for print.
+
+        """
+        self.PRINT(*s, set=True)
+
+    def CLS(self):
+        """
+        Clears the screen, and moves the text cursor to the top left.
+        """
+        self.set_attr()
+        self.memory[0x4000:self.attrbase] = 0
+        self.attrs[:] = self.attr
+        self.cursorx, self.cursory = 0,0
+        self.set_attr()
+        if self.autoupdate: self.UPDATE()
+
+    def update(self):
+        self.frames += 1
+        if self.paced:
+            now = time.monotonic()
+            self.time = now - self.starttime
+            # Don't show this frame if the screen is a frame behind because showing frames takes too long
+            skip = now - self.nextframe > 1 / self.fps and self.showtime > 0.5 / self.fps and self.skipped < MAXSKIP
+            self.skipped = self.skipped + 1 if skip else 0
+        else:
+            self.time = self.frames / self.fps
+        self.flashframe = int(self.time / FLASHTIME + 1e-9) % 2 == 1
+        start = time.monotonic()
+        if self.shared is not None:
+            self.updateshared()
+        elif not self.skipped:
+            self.render()
+        # Hooks are called for every frame, but can check skipped to see if it is being shown
+        for hook in self.framehooks: hook(self)
+        if not self.headless and not self.skipped: pygame.display.flip()
+        if self.paced:
+            # Skipped frames halve showtime, so that it doesn't stay high if showing frames gets quicker
+            self.showtime = self.showtime / 2 if self.skipped else time.monotonic() - start
+            self.wait()
+
+    def wait(self):
+        # Waits until the next frame is due. If the screen is a long way behind, it doesn't try to catch up all the way.
+        now = time.monotonic()
+        frametime = 1 / self.fps
+        self.nextframe = max(self.nextframe + frametime, now - MAXSKIP * frametime)
+        if self.nextframe > now: time.sleep(self.nextframe - now)
+
+    def updateshared(self):
+        # The display process renders the screen, so this just tells it about the new frame and reads the keys it sends back
+        shared = self.shared
+        shared.publish(self)
+        for pressed, key, u in shared.popkeys():
+            if pressed:
+                self.keydown(key, u)
+            else:
+                self.keyup(key)
+        if shared.quit(): BYE()
+
+    def GETKEY(self):
+        """
+        Waits for a keypress, and returns the ASCII character of the key pressed.
+        """
+        # wait for no key to be pressed
+        while self.inkeys:
+            self.UPDATE()
+        # then wait for a key
+        while not self.inkeys:
+            self.UPDATE()
+        return self.inkeys
+
+    def INKEYS(self):
+        """
+        If one or more keys that produce a character are held down, returns the ASCII character of
+        the most recently held down key. Otherwise, returns "". Equivalent to INKEY$ in ZX Spectrum Basic.
+        """
+        return self.inkeys
+
+    def INPUT(self, *s, end="", **args):
+        """Interactive input - prints a prompt, returns a string. Not so much like the ZX Spectrum INPUT
+        - more like the INPUT on the Amstrad CPC.
+
+        Args:
+
+        - s - things to print for the prompt
+        - args - arguments to pass onto PRINT
+        """
+        args["end"] = end
+        self.PRINT(*s, **args)
+        res = ""
+        finished = False
+        if self.screen is None: self.init_display()
+        pygame.key.set_repeat(500,10)
+        osc = self.showcursor
+        self.showcursor = True
+        while not finished:
+            self.update()
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    BYE()
+                elif event.type == pygame.KEYDOWN:
+                    u = event.unicode
+                    if u == "\r" or u == "\n": # return
+                        finished = True
+                        self.printchar("\n")
+                        continue
+                    if u == "\x08" and len(res) > 0: # delete
+                        res = res[:-1]
+                        self.printchar(12)
+                        continue
+                    if event.scancode == 69 or event.scancode == 1: # PAUSE/BREAK and ESC
+                        BYE()
+                    if u == "£": u="`" # character set malarkey
+                    if u and (ord(u) < 32 or ord(u) > 127): u=""
+                    if u:
+                        res = res + u
+                        self.printchar(u)
+        pygame.key.set_repeat(0)
+        self.showcursor = osc
+        self.keysdown = []
+        self.inkeys = ""
+        return res
+
+    def MOVE(self, x,y):
+        """
+        Moves the graphics cursor to x,y.
+
+        Args:
+
+        - x - the x coordinate to move to
+        - y - the y coordinate to move to
+        """
+        self.graphicsx, self.graphicsy = int(x),int(y)
+
+    def plot(self, x,y,INK=None,
+        OVER=None,INVERSE=None):
+        memory = self.memory
+        x,y = int(x),int(y)
+        self.graphicsx, self.graphicsy = x,y
+        if x < 0: return
+        if x >= self.pixw: return
+        if y < 0: return
+        if y >= self.pixh: return
+        cy = int(y/8)
+        cx = int(x/8)
+        xp = x % 8
+        xm = 1 << (7-xp)
+        mp = self.rowaddr[y]+cx
+        if OVER or (OVER is None and self.over):
+            memory[mp] ^= xm
+        elif INVERSE or (INVERSE is None and self.inverse):
+            memory[mp] &= (255-xm)
+        else:
+            memory[mp] |= xm
+        mask = 7
+        val = 0
+        if INK is None:
+            val = int(self.ink)
+        else:
+            val = int(INK)
+        memory[self.attrbase+cx+self.cols*cy] &= (255-mask)
+        memory[self.attrbase+cx+self.cols*cy] |= val
+
+    def POINT(self, x,y):
+        """
+        Tests the pixel at x,y, returns 1 if it is the ink colour and 0 if it is the paper colour.
+
+        Args:
+
+        - x - the x coordinate to test
+        - y - the y coordinate to test
+        """
+        x,y = int(x),int(y)
+        if x < 0: return
+        if x >= self.pixw: return
+        if y < 0: return
+        if y >= self.pixh: return
+        cy = int(y/8)
+        cx = int(x/8)
+        xp = x % 8
+        xm = 1 << (7-xp)
+        mp = self.rowaddr[y]+cx
+        val = 1 if self.memory[mp] & xm else 0
+        return val
+
+    def PLOT(self, x,y,**args):
+        """Moves the graphics cursor to the point (x,y) and plots a pixel. NOTE: graphics coordinates
+        are relative to the top left, so (10,30) is 10 pixels to the right of and 30 below the top left.
+
+        Args:
+
+        - x - the x coordinate to move to
+        - y - the y coordinate to move to
+        - INK (0-7) - the colour to plot in
+        - OVER (0-1) - draw in XOR or not
+        - INVERSE (0-1) - erase or not
+        """
+        self.plot(x,y,**args)
+        if self.autoupdate: self.UPDATE()
+
+    def DRAWTO(self, x,y,a=None,**args):
+        """
+        Draws a line from the last graphics point drawn (by ``PLOT`` or ``DRAW``), to the
+        point specified by x and y. Note that the coordinates are absolute.
+
+        Args:
+
+        - x - the x coordinate to draw to
+        - y - the y coordinate to draw to
+        - a - optional - draws an arc the angle to turn through, in radians (can be negative)
+        - INK (0-7) - the colour to draw in
+        - OVER (0-1) - draw in XOR or not
+        - INVERSE (0-1) - erase or not
+        """
+        dx = x - self.graphicsx
+        dy = y - self.graphicsy
+        return self.DRAW(dx,dy,a,**args)
+
+    def DRAW(self, dx,dy,a=None,**args):
+        """
+        Draws a line from the last graphics point drawn (by PLOT or DRAW). Note that the
+        coordinates are relative from that point, not absolute - ie. they specify the number
+        of pixels to go right or down.
+
+        When called with the ``a`` argument, draws an arc from the graphics cursor position, ending dx pixels to the
+        right of and dy pixels below that position. Turns through a radians - to the left if a is positive, to the
+        right if a is negative.
+
+        Args:
+
+        - dx - the number of pixels to move right (can be negative)
+        - dy - the number of pixels to move down (can be negative)
+        - a - optional - draws an arc the angle to turn through, in radians (can be negative)
+        - INK (0-7) - the colour to draw in
+        - OVER (0-1) - draw in XOR or not
+        - INVERSE (0-1) - erase or not
+        """
+
+        if a is not None and abs(a) > 1e-4: return self.arc(dx, dy, a, **args)
+
+        x = self.graphicsx + 0.5
+        y = self.graphicsy + 0.5
+        steps = max(abs(dx),abs(dy))
+        if steps < 1: return
+        mdx = dx/steps
+        mdy = dy/steps
+        for i in range(int(steps)):
+            x += mdx
+            y += mdy
+            self.plot(x, y, **args)
+        if self.autoupdate: self.UPDATE()
+
+    def arc(self, dx, dy, a, **args):
+        A = 1/np.tan(a/2)
+        sgx, sgy = self.graphicsx+dx, self.graphicsy+dy
+
+        x = self.graphicsx + 0.5
+        y = self.graphicsy + 0.5
+        cx = x+(A*dy/2)+dx/2
+        cy = y-(A*dx/2)+dy/2
+
+        r = np.sqrt((x-cx)**2+(y-cy)**2)
+
+        t0=math.atan2(x-cx,y-cy)
+
+        if a > 0:
+            p = np.arange(0,a,1/r)+t0
+        else:
+            p = -np.arange(0,-a,1/r)+t0
+
+        xv = (r * np.sin(p)) + cx
+        yv = (r * np.cos(p)) + cy
+        for x, y in zip(xv, yv):
+            self.plot(x, y, **args)
+
+        self.graphicsx, self.graphicsy = sgx, sgy
+
+        if self.autoupdate: self.UPDATE()
+
+    def CIRCLE(self, x, y, r, **args):
+        """Draws a circle.
+
+        - x - the x coordinate of the circle center
+        - y - the y coordinate of the circle center
+        - r - the radius of the circle, in pixels
+        - INK (0-7)
+        - PAPER (0-7)
+        - BRIGHT (0-1)
+        - FLASH (0-1)
+        - OVER (0-1) - draw in XOR or not
+        - INVERSE (0-1) - erase or not
+        """
+        sgx, sgy = self.graphicsx, self.graphicsy
+
+        # These make the circles come out nicer
+        cx=x
+        cy=y
+
+        p = np.arange(0,np.pi*2,1/r)
+
+        xv = (r * np.sin(p)) + cx
+        yv = (r * np.cos(p)) + cy
+        for x, y in zip(xv, yv):
+            self.plot(x, y, **args)
+
+        self.graphicsx, self.graphicsy = sgx, sgy
+
+        if self.autoupdate: self.UPDATE()
+
+    def ATTR(self, x,y):
+        """Gets the attribute at a given text position. The attribute is an 8-bit value. The lowest three bits
+        specify the ink colour, the next three bits specify the paper, the next bit specifies brightness,
+        and the highest bit specified flash.
+
+        Args:
+
+        - x - integer (0-31) - the column of the attribute to get
+        - y - integer (0-23) - the row of the attribute to get
+        """
+        x = int(x)
+        y = int(y)
+        if x<0 or x>=self.cols or y<0 or y>=self.rows: return -1
+        return self.attrs[y,x]
+
+    def SETATTR(self, x, y, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+        """Sets the attribute at a given text position. The attribute is an 8-bit value. The lowest three bits
+        specify the ink colour, the next three bits specify the paper, the next bit specifies brightness,
+        and the highest bit specified flash.
+
+        Calling this with only x and y will have no effect. Calling this with x, y and ATTR will change the
+        whole attribute. Calling this with x, y, and at least one of INK, PAPER, BRIGHT and FLASH will
+
+        Args:
+
+        - x - integer (0-31) - the column of the attribute to set
+        - y - integer (0-23) - the row of the attribute to set
+        - ATTR - integer (0-255) - optional - the new attribute
+        - INK - integer (0-7) - optional - the new ink value
+        - PAPER - integer (0-7) - optional - the new paper value
+        - BRIGHT - integer (0-1) - optional - the new brightness value
+        - FLASH - integer (0-1) - optional - the new flash value
+        """
+        x = int(x)
+        y = int(y)
+        if x<0 or x>=self.cols or y<0 or y>=self.rows: return -1
+        mask, attr = attrmask(ATTR, INK, PAPER, BRIGHT, FLASH)
+        self.attrs[y,x] = (mask & self.attrs[y,x]) | attr
+        if self.autoupdate: self.UPDATE()
+
+    def attrrect(self, x, y, w, h):
+        x0, y0 = max(int(x), 0), max(int(y), 0)
+        x1, y1 = min(int(x)+int(w), self.cols), min(int(y)+int(h), self.rows)
+        if x0 >= x1 or y0 >= y1: return None
+        return self.attrs[y0:y1, x0:x1]
+
+    def ATTRS(self, x, y, w, h):
+        """Gets the attributes of a rectangle of text positions, as a 2D numpy array with h rows and w columns. This is
+        a view of the screen memory, so changing it changes the attributes. The parts of the rectangle that are off the
+        screen are left out, and if all of it is off the screen, returns None.
+
+        Args:
+
+        - x - integer (0-31) - the leftmost column
+        - y - integer (0-23) - the top row
+        - w - integer - the number of columns
+        - h - integer - the number of rows
+        """
+        return self.attrrect(x, y, w, h)
+
+    def SETATTRS(self, x, y, w, h, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+        """Sets the attributes of a rectangle of text positions, in the same way as ``SETATTR``, all at once. The parts of
+        the rectangle that are off the screen are left out. Example::
+
+            # a highlight bar across row 5
+            SETATTRS(0, 5, 32, 1, PAPER=5, BRIGHT=1)
+
+        Args:
+
+        - x - integer (0-31) - the leftmost column
+        - y - integer (0-23) - the top row
+        - w - integer - the number of columns
+        - h - integer - the number of rows
+        - ATTR - integer (0-255) - optional - the new attribute
+        - INK - integer (0-7) - optional - the new ink value
+        - PAPER - integer (0-7) - optional - the new paper value
+        - BRIGHT - integer (0-1) - optional - the new brightness value
+        - FLASH - integer (0-1) - optional - the new flash value
+        """
+        area = self.attrrect(x, y, w, h)
+        if area is None: return -1
+        mask, attr = attrmask(ATTR, INK, PAPER, BRIGHT, FLASH)
+        area &= mask
+        area |= attr
+        if self.autoupdate: self.UPDATE()
+
+    def spritepixels(self, values, width):
+        # The pixels of a sprite, as a 2D array of booleans
+        if isinstance(values, np.ndarray) and values.ndim == 2:
+            pixels = values != 0
+        else:
+            width = int(width)
+            if width < 1: raise ValueError("sprites must be at least one pixel wide")
+            rows = np.array([int(v) for v in values], dtype=np.uint64)
+            pixels = (rows[:,None] >> np.arange(width-1, -1, -1, dtype=np.uint64)) & np.uint64(1) != 0
+        if pixels.shape[0] > SPRITESIZE or pixels.shape[1] > SPRITESIZE:
+            raise ValueError("sprites can be at most %d pixels across and down" % SPRITESIZE)
+        return pixels
+
+    def SPRITE(self, n, values, x=0, y=0, INK=0, PAPER=None, BRIGHT=0, mask=None, width=8):
+        """
+        Defines a sprite, and shows it with its top left corner at x,y. Sprites are drawn over the screen when it is
+        shown, without changing the screen memory, so they can be moved without disturbing what is underneath them, and
+        have their own colours without any attribute clash. There are 64 sprites, numbered 0-63, each up to 32 pixels
+        across and down, and higher numbered sprites are drawn over lower numbered ones. They aren't included in
+        streams, recordings or exported animations, which only have the screen memory. Example::
+
+            SPRITE(0, (0b0000011111100000,
+                       0b0001111111111000,
+                       0b0011111111111100,
+                       0b0111111111111110,
+                       0b0111111111111110,
+                       0b0011111111111100,
+                       0b0001111111111000,
+                       0b0000011111100000), x=100, y=50, INK=2, BRIGHT=1, width=16)
+            for x in range(100, 200):
+                MOVESPRITE(0, x, 50)
+
+        Args:
+
+        - n - integer (0-63) - the sprite to define.
+        - values - list of integers, one for each row of pixels, each ``width`` bits, or a 2D numpy array of 0s and 1s.
+        - x - integer - the x coordinate of its left edge.
+        - y - integer - the y coordinate of its top edge.
+        - INK (0-7) - the colour of the pixels that are set.
+        - PAPER (0-7) - optional - the colour of the pixels that are not set. Without this, they are see-through.
+        - BRIGHT (0-1) - whether the colours are bright.
+        - mask - optional - the same form as values - which pixels are part of the sprite, for drawing and for
+          ``COLLISIONS``. Defaults to the pixels that are set, or all of them if PAPER is given.
+        - width - integer (1-32) - the number of pixels in each row of values.
+        """
+        pixels = self.spritepixels(values, width)
+        if mask is None:
+            maskpixels = pixels if PAPER is None else np.ones_like(pixels)
+        else:
+            maskpixels = self.spritepixels(mask, width)
+        h = max(pixels.shape[0], maskpixels.shape[0])
+        w = max(pixels.shape[1], maskpixels.shape[1])
+        for array, p in ((self.spritebits, pixels), (self.spritemasks, maskpixels)):
+            packed = np.packbits(p, axis=1)
+            array[n] = 0
+            array[n, :packed.shape[0], :packed.shape[1]] = packed
+        bright = 8 * (int(BRIGHT) % 2)
+        paper = -1 if PAPER is None else int(PAPER) % 8 + bright
+        self.spritetable[n] = (int(x), int(y), w, h, int(INK) % 8 + bright, paper, 1)
+        self.spritesshown = int(self.spritetable[:,6].sum())
+        if self.autoupdate: self.UPDATE()
+
+    def MOVESPRITE(self, n, x, y):
+        """
+        Moves a sprite, so that its top left corner is at x,y.
+
+        Args:
+
+        - n - integer (0-63) - the sprite to move.
+        - x - integer - the x coordinate of its left edge.
+        - y - integer - the y coordinate of its top edge.
+        """
+        self.spritetable[n, :2] = int(x), int(y)
+        if self.autoupdate: self.UPDATE()
+
+    def SHOWSPRITE(self, n, show=True):
+        """
+        Shows or hides a sprite. Hidden sprites are not drawn, and don't collide with anything.
+
+        Args:
+
+        - n - integer (0-63) - the sprite to show or hide.
+        - show - boolean - whether to show it.
+        """
+        self.spritetable[n, 6] = 1 if show else 0
+        self.spritesshown = int(self.spritetable[:,6].sum())
+        if self.autoupdate: self.UPDATE()
+
+    def HIDESPRITE(self, n):
+        """
+        Hides a sprite. Same as ``SHOWSPRITE(n, False)``.
+
+        Args:
+
+        - n - integer (0-63) - the sprite to hide.
+        """
+        self.SHOWSPRITE(n, False)
+
+    def COLLISIONS(self, n=None):
+        """
+        Finds the sprites that are touching - where pixels of their masks overlap. Returns a list of (a, b) pairs
+        of sprite numbers, with a less than b. If n is given, returns a list of the sprites touching sprite n instead.
+        Sprites collide even if they are off the edge of the screen.
+
+        Args:
+
+        - n - integer (0-63) - optional - the sprite to check.
+        """
+        table = self.spritetable
+        shown = np.flatnonzero(table[:,6])
+        a, b = np.triu_indices(len(shown), 1)
+        a, b = shown[a], shown[b]
+        x, y, w, h = table[:,0], table[:,1], table[:,2], table[:,3]
+        near = (x[a] < x[b] + w[b]) & (x[b] < x[a] + w[a]) & (y[a] < y[b] + h[b]) & (y[b] < y[a] + h[a])
+        if n is not None: near &= (a == n) | (b == n)
+        a, b = a[near], b[near]
+        # Each row of each mask as a number, with the leftmost pixel the highest bit. The rows of b are lined up with
+        # those of a, then shifted by the distance between them to line up the pixels.
+        words = self.spritemasks.view(">u4")[:,:,0].astype(np.uint64)
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        rows = np.arange(SPRITESIZE)[None,:] - dy[:,None]
+        inside = (rows >= 0) & (rows < SPRITESIZE)
+        wa = words[a]
+        wb = np.where(inside, words[b[:,None], rows.clip(0, SPRITESIZE-1)], 0)
+        right = np.abs(dx).astype(np.uint64)[:,None]
+        hit = np.where(dx[:,None] >= 0, wa & (wb >> right), (wa >> right) & wb).any(1)
+        pairs = list(zip(a[hit].tolist(), b[hit].tolist()))
+        if n is None: return pairs
+        return [j if i == n else i for i, j in pairs]
+
+    def RUN(self, displaylist, dx=0, dy=0):
+        """
+        Runs the commands recorded in a ``DisplayList``, all in one go. The graphics can be moved by dx,dy pixels,
+        so the same list can be drawn in different places. Text and attributes move by whole character cells, so
+        dx and dy should be multiples of 8 if the list has any.
+
+        Args:
+
+        - displaylist - DisplayList - the commands to run.
+        - dx - integer - the number of pixels to move everything right.
+        - dy - integer - the number of pixels to move everything down.
+        """
+        ops, params, chars = displaylist.compile()
+        self.set_attr()
+        self.graphicsx, self.graphicsy = runlist(self.memory, self.rowaddr, self.attrbase, self.cols, self.rows,
+            self.linestride, self.charset, ops, params, chars, self.ink, self.over, self.inverse, self.attr,
+            self.graphicsx, self.graphicsy, int(dx), int(dy))
+        if self.autoupdate: self.UPDATE()
+
+    def DRAWMAP(self, tilemap, view_x, view_y, x=0, y=0, w=None, h=None):
+        """
+        Shows part of a ``TileMap`` on the screen, with the map cell (view_x, view_y) at the top left, all in one go.
+        Cells that already show the right character and attribute are left alone, so moving the view a cell at a time
+        only redraws the cells that change. The characters are drawn from the current character set, and beyond the
+        edges of the map, its fill character and attribute are shown. Returns the number of cells drawn.
+
+        Args:
+
+        - tilemap - TileMap - the map to show.
+        - view_x - integer - the map column to show at the left.
+        - view_y - integer - the map row to show at the top.
+        - x - integer - the leftmost screen column to draw in.
+        - y - integer - the top screen row to draw in.
+        - w - integer - optional - the number of columns to draw. Defaults to the rest of the screen.
+        - h - integer - optional - the number of rows to draw. Defaults to the rest of the screen.
+        """
+        x, y = int(x), int(y)
+        w = self.cols - x if w is None else int(w)
+        h = self.rows - y if h is None else int(h)
+        # Leave out the parts of the area off the screen, moving the view to match
+        view_x, view_y = int(view_x) + max(-x, 0), int(view_y) + max(-y, 0)
+        x2, y2 = min(x + w, self.cols), min(y + h, self.rows)
+        x, y = max(x, 0), max(y, 0)
+        if x >= x2 or y >= y2: return 0
+        n = drawmap(self.memory, self.rowaddr, self.attrbase, self.cols, self.rows, self.linestride, self.charset,
+            tilemap.codes, tilemap.attrs, view_x, view_y, x, y, x2 - x, y2 - y, tilemap.fillcode, tilemap.fillattr)
+        if self.autoupdate: self.UPDATE()
+        return n
+
+    def SCREENSTR(self, x,y):
+        """
+        Examines a text position to see what character might be there. Roughly equivalent to SCREEN$ on the ZX Spectrum.
+        Returns a string containing the possible characters, may be empty.
+
+        This uses the current contents of the character set, from position 32 to 255, and compares them against the
+        pixels on screen. Redefining the character set will affect the results of this function. This function will
+        not be able to detect characters written with INVERSE, or characters with graphics drawn over the top, or with
+        other characters drawn over the top with OVER.
+
+        Args:
+
+        - x - integer (0-31) - the column of the character to examine
+        - y - integer (0-23) - the row of the character to examine.
+        """
+        addr = self.rowaddr[8*y]+x
+        stride = self.linestride
+        vals = self.memory[addr:addr+8*stride:stride]
+        matches = np.flatnonzero((self.charset[32:] == vals).all(1)) + 32
+        return [chr(i) for i in matches.tolist()]
+
+    def UPDATE(self):
+        """
+        Updates the display, INKEYS, and checks for the PAUSE BREAK and ESC key and closing the pygame window.
+
+        There are various reasons for calling this:
+
+        - If MANUALUPDATE has been called, call this every time you want to show the current graphics state to the user.
+        - In a loop repeatedly calling INKEYS, call this to get INKEYS up to date.
+        - In a delay loop, call this to pause briefly, while updating the display, keeping flashing things flashing, respecting BREAK and the window close button.
+        - When doing a lot of computation (i.e. that takes a significant amount of time), call this occasionally so the system doesn't appear to have hung.
+        """
+        self.update()
+        if self.headless: return
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                BYE()
+            elif event.type == pygame.KEYDOWN:
+                if event.scancode == 69 or event.scancode == 1: # PAUSE/BREAK and ESC
+                    BYE()
+                self.keydown(event.key, event.unicode)
+            elif event.type == pygame.KEYUP:
+                self.keyup(event.key)
+
+    def keydown(self, key, u):
+        if u == "£": u="`" # character set malarkey
+        if u and (ord(u) < 32 or ord(u) > 127): u=""
+        for hook in self.keyhooks: hook(True, key, u)
+        if u:
+            self.keysdown.append(u)
+            self.inkeys = u
+            self.keyd[key] = u
+
+    def keyup(self, key):
+        for hook in self.keyhooks: hook(False, key, "")
+        if key in self.keyd:
+            self.keysdown.remove(self.keyd.pop(key))
+            if self.keysdown:
+                self.inkeys = self.keysdown[-1]
+            else:
+                self.inkeys = ""
+
+    def PAUSE(self, frames):
+        """Pauses for a specified number of frames, while updating the screen. Frames are 1/60 of a second unless
+        ``INIT`` was given another FPS, and the pause takes that long even if the screen can't keep up.
+
+        Args:
+
+        - frames - integer - the number of frames to wait for.
+        """
+        if self.paced:
+            # Paced screens go by the clock, as time is only read at the start of each update, before it waits for the
+            # next frame. The pause ends with the frame nearest to when it is due.
+            end = time.monotonic() + (frames - 0.5) / self.fps
+            while time.monotonic() < end:
+                self.UPDATE()
+        else:
+            end = self.time + frames / self.fps - 1e-9
+            while self.time < end:
+                self.UPDATE()
+
+    def AUTOUPDATE(self):
+        """Enable automatic updating, allowing the effects of all text and graphics operations
+        to be seen immediately. Note that this is the default, and so it is only useful
+        to call this if you have previously called ``MANUALUPDATE``."""
+        self.autoupdate = True
+
+    def MANUALUPDATE(self):
+        """Disable automatic updating - all text and graphics operations will only take effect when
+        ``UPDATE`` is called. This is useful for speed or smooth animation. To re-enable automatic updating
+        call ``AUTOUPDATE``."""
+        self.autoupdate = False
+
+    def UDG(self, charno, values):
+        """
+        Redefine a character in the character set, in a manner similar to User Defined Graphics (UDG)
+        on the ZX Spectrum.
+
+        This can be used to redefine already-existing characters, if (for example) you want to use a
+        different font, or sacrifice some or all of the letters, numbers punctuation etc. for more
+        graphics characters. Note also that any characters already drawn to the screen will not
+        be altered by this - if you print an "a", then redefine "a", then print another "a", then
+        the first "a" will be in the old style and the second will be in the new style.
+
+        Example::
+
+            UDG(0x90, (0b00000001,
+                       0b00000011,
+                       0b00000111,
+                       0b00001111,
+                       0b00011111,
+                       0b00111111,
+                       0b01111111,
+                       0b11111111))
+            PRINT("\x90")
+
+        defines a triangle character and assigns it to character number 0x90 (144 in decimal) and prints it.
+
+        Args:
+
+        - charno - integer (32-255) - the character to define
+        - values - tuple of 8 integers, 0-255, representing the character.
+        """
+        if len(values) != 8 or [i for i in values if type(i) != int or i < 0 or i > 255]: raise Exception
+        self.charset[charno] = values
+
+    def GETCHARDEF(self, charno):
+        """
+        Fetches the definition of a character, as a tuple of 8 integers. See ``UDG`` for more details.
+
+        Args:
+
+        - charno - integer (32-255) - the character to get the definition of.
+        """
+        return tuple(self.charset[charno].tolist())
+
+    def RESETCHARS(self):
+        """
+        Resets the character set to its original state. Undoes the effects of ``UDG`` and ``LOADFONT``.
+        Only the character set in use is reset - other banks (see ``CHARBANK``) are left alone.
+        """
+        self.charset[:] = DEFCHARARRAY
+
+    def LOADFONT(self, source, first=32, count=None, offset=0, bank=None):
+        """
+        Loads character definitions from a file or a bytes object, 8 bytes to a character. By default this
+        loads a 768 byte font of the 96 characters from 32 to 127, as saved from a ZX Spectrum. Example::
+
+            # the font in a 48K ROM image
+            LOADFONT("48.rom", offset=0x3d00, count=96)
+
+        Args:
+
+        - source - string or bytes - the name of the file to read, or the font data itself.
+        - first - integer (0-255) - the first character to define.
+        - count - integer - optional - how many characters to load. Defaults to as many whole characters as there are,
+          up to character 255, and raises a ValueError if there isn't one. Any bytes after the last one are ignored.
+        - offset - integer - where in the file or data the font starts, in bytes.
+        - bank - string - optional - the character set bank to load into (see ``CHARBANK``). Defaults to the one in use.
+        """
+        if not 0 <= first <= 255: raise ValueError("there is no character %d" % first)
+        if offset < 0: raise ValueError("the offset can't be negative")
+        charset = self.charset if bank is None else self.getbank(bank)
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, "rb") as f:
+                if count is None: count = fontcount(os.fstat(f.fileno()).st_size, offset)
+                count = max(min(count, 256 - first), 0)
+                f.seek(offset)
+                n = f.readinto(charset[first:first+count].reshape(-1))
+        else:
+            data = memoryview(source).cast("B")
+            if count is None: count = fontcount(len(data), offset)
+            count = max(min(count, 256 - first), 0)
+            n = max(min(len(data) - offset, 8*count), 0)
+            charset[first:first+count].reshape(-1)[:n] = np.frombuffer(data, np.uint8, n, offset)
+        if n != 8*count: raise ValueError("not enough font data for %d characters" % count)
+
+    def getbank(self, name):
+        if name not in self.charbanks:
+            self.charbanks[name] = DEFCHARARRAY.copy()
+        return self.charbanks[name]
+
+    def CHARBANK(self, name):
+        """
+        Switches to another character set, like changing CHARS on the ZX Spectrum. Each bank is a complete character set,
+        which ``UDG``, ``LOADFONT`` and ``RESETCHARS`` change, and switching between them costs nothing, so a program
+        can keep a font for each part of the screen or each level. A new bank starts as the default character set.
+        The first bank is called "default". Returns the name of the bank that was in use. Example::
+
+            CHARBANK("title")
+            LOADFONT("fancy.font")
+            PRINT("Welcome!")
+            CHARBANK("default")
+
+        Args:
+
+        - name - string - the bank to switch to.
+        """
+        old = self.charbank
+        self.charset = self.getbank(name)
+        self.charbank = name
+        return old
+
+    def GETMEMORY(self):
+        """
+        Advanced: Gets the screen memory, as a numpy array. This is a 32k array of unsigned 8-bit
+        integers (mimicing the address space of a 16k ZX Spectrum, with the first 16k representing ROM),
+        and is mostly zeros. The screen memory is laid out as in a ZX Spectrum, with
+        the pixels starting at 0x4000 and the attributes starting at 0x5800, ending at 0x5aff
+
+        This gets the actual array that specgfx works with - changing values in this array (between
+        0x4000 and 0x5aff) will change the screen once you call ``UPDATE``.
+
+        Screens of other sizes than 32x24 (see ``INIT``) have the bitmap a line at a time from 0x4000, followed by
+        the attributes, and the memory is made bigger than 32k if they don't fit.
+        """
+        return self.memory
+
+    def PEEK(self, address):
+        """
+        Reads a byte in the screen memory, at the given address.
+
+        Args:
+
+        - address - integer, from 0 to 0x7fff, but only values from 0x4000 to 0x5aff are of interest.
+        """
+        return self.memory[address]
+
+    def POKE(self, address, value):
+        """
+        Writes a byte to the screen memory, at the given address. Writing between 0x4000 and 0x5aff will
+        change the screen once you call ``UPDATE``.
+
+        Args:
+
+        - address - integer, from 0 to 0x7fff, but only values from 0x4000 to 0x5aff are of interest.
+        - value - integer - the byte to write.
+        """
+        self.memory[address] = value
+
+    def checkrange(self, address, n):
+        address, n = int(address), int(n)
+        if n < 0 or address < 0 or address + n > len(self.memory):
+            raise IndexError("%d bytes at %d are outside the memory, which is %d bytes" % (n, address, len(self.memory)))
+        return address, n
+
+    def PEEKS(self, address, n):
+        """
+        Reads n bytes of memory, starting at the given address. This returns a numpy array which is a view of the
+        memory, not a copy, so it is quick even for large amounts. Use ``POKES`` rather than writing to it, so that
+        the changes are seen by ``TRACE``.
+
+        Args:
+
+        - address - integer - the first address to read.
+        - n - integer - the number of bytes to read.
+        """
+        address, n = self.checkrange(address, n)
+        return self.memory[address:address+n]
+
+    def POKES(self, address, values):
+        """
+        Writes several bytes to the memory, starting at the given address. Example::
+
+            # copy a 6912 byte screen dump onto the screen
+            POKES(0x4000, open("picture.scr", "rb").read())
+
+        Args:
+
+        - address - integer - the first address to write.
+        - values - bytes, or a list or numpy array of integers (0-255) - the bytes to write.
+        """
+        if isinstance(values, (bytes, bytearray, memoryview)):
+            values = np.frombuffer(values, dtype=np.uint8)
+        else:
+            values = np.asarray(values)
+        address, n = self.checkrange(address, len(values))
+        self.memory[address:address+n] = values
+
+    def MEMSET(self, address, n, value):
+        """
+        Sets n bytes of memory, starting at the given address, to the same value. ``MEMSET(0x5800, 768, 0x38)``
+        sets all of the attributes of a 32x24 screen to black ink on white paper.
+
+        Args:
+
+        - address - integer - the first address to write.
+        - n - integer - the number of bytes to write.
+        - value - integer (0-255) - the byte to write.
+        """
+        address, n = self.checkrange(address, n)
+        self.memory[address:address+n] = value
+
+    def MEMCOPY(self, dest, source, n):
+        """
+        Copies n bytes of memory from one address to another. The two areas can overlap.
+
+        Args:
+
+        - dest - integer - the first address to copy to.
+        - source - integer - the first address to copy from.
+        - n - integer - the number of bytes to copy.
+        """
+        dest, n = self.checkrange(dest, n)
+        source, n = self.checkrange(source, n)
+        self.memory[dest:dest+n] = self.memory[source:source+n]
+
+    def GETPIXELS(self, packed=False):
+        """
+        Advanced: Gets the screen's pixels as a numpy array, a line at a time from the top, whatever the memory
+        layout. This is a copy, so changing it doesn't change the screen - use ``SETPIXELS`` for that.
+
+        Args:
+
+        - packed - boolean - if False, returns a 192x256 array of 0s (paper) and 1s (ink). If True, returns the
+          bytes of the bitmap, a 192x32 array with eight pixels in each byte, the leftmost in the top bit. Screens
+          of other sizes give 8*ROWS lines of 8*COLS pixels.
+        """
+        rows = self.memory[self.bitmapindex]
+        if packed: return rows
+        return np.unpackbits(rows, axis=1)
+
+    def SETPIXELS(self, pixels, x=0, y=0, packed=False):
+        """
+        Advanced: Writes an array of pixels to the screen, with its top left corner at (x,y), counting pixels from
+        the top left of the screen. This is the opposite of ``GETPIXELS``, and leaves the attributes as they are.
+
+        Args:
+
+        - pixels - 2D numpy array - the pixels, a line at a time from the top. Anything other than 0 is ink.
+        - x - integer - the column of pixels to start at. Must be a multiple of 8 if packed.
+        - y - integer - the line of pixels to start at.
+        - packed - boolean - whether pixels is bytes of the bitmap, eight pixels in each, as from ``GETPIXELS(packed=True)``.
+        """
+        pixels = np.asarray(pixels)
+        if pixels.ndim != 2: raise ValueError("the pixels must be a 2D array")
+        x, y = int(x), int(y)
+        h, w = pixels.shape
+        if packed:
+            if x % 8: raise ValueError("packed pixels must start at a multiple of 8 across")
+            w *= 8
+        if x < 0 or y < 0 or x + w > self.pixw or y + h > self.pixh:
+            raise IndexError("%dx%d pixels at (%d,%d) don't fit on the screen, which is %dx%d" % (w, h, x, y, self.pixw, self.pixh))
+        if h == 0 or w == 0: return
+        cx, cx2 = x // 8, (x + w + 7) // 8
+        index = self.bitmapindex[y:y+h, cx:cx2]
+        if packed:
+            self.memory[index] = pixels
+        else:
+            # Unpack the bytes the pixels are in, so the pixels either side of them are kept
+            bits = np.unpackbits(self.memory[index], axis=1)
+            bits[:, x-8*cx:x-8*cx+w] = pixels != 0
+            self.memory[index] = np.packbits(bits, axis=1)
+
+    def SCREENHASH(self):
+        """
+        Returns a hash of what is on the screen, as a hex string: the bitmap and attributes, the border, and the
+        character set. Two screens with the same hash show the same thing, so this is a quick way to check a program's
+        output, for example in tests.
+        """
+        h = hashlib.blake2b(self.memory[0x4000:self.screenend], digest_size=16)
+        h.update(bytes((self.border, self.cols % 256, self.cols // 256, self.rows % 256, self.rows // 256)))
+        h.update(self.charset)
+        return h.hexdigest()
+
+    def SCREENDIFF(self, other):
+        """
+        Compares the screen with another, and returns a numpy array of booleans with a row for each row of character
+        cells, True for the cells whose pixels or attributes are different. ``SCREENDIFF(other).any()`` is whether
+        there are any differences, and ``np.argwhere(SCREENDIFF(other))`` gives the row and column of each.
+
+        Args:
+
+        - other - Screen, bytes or numpy array - a screen of the same size, or the bytes of its bitmap and attributes
+          (from 0x4000, 6912 bytes for a 32x24 screen), or all of its memory, as from ``GETMEMORY``.
+        """
+        n = self.screenend - 0x4000
+        if isinstance(other, Screen):
+            if (other.cols, other.rows) != (self.cols, self.rows): raise ValueError("the screens are different sizes")
+            other = other.memory[0x4000:other.screenend]
+        else:
+            if isinstance(other, (bytes, bytearray, memoryview)): other = np.frombuffer(other, dtype=np.uint8)
+            other = np.asarray(other, dtype=np.uint8).ravel()
+            if len(other) == len(self.memory): other = other[0x4000:self.screenend]
+            if len(other) != n: raise ValueError("expected %d or %d bytes, not %d" % (n, len(self.memory), len(other)))
+        changed = self.memory[0x4000:self.screenend] ^ other
+        bitmap = changed[self.bitmapindex - 0x4000].reshape(self.rows, 8, self.cols).any(1)
+        return bitmap | (changed[self.attrbase - 0x4000:].reshape(self.rows, self.cols) != 0)
+
 def INK(n):
     """
     Returns control codes to set the ink colour (0-7).
@@ -540,457 +1682,218 @@ def TAB(n):
 
     return "".join((chr(23),chr(int(n))))
     
-def printitem(ss):
-    if type(ss) is not str: ss = str(ss)
-    for c in ss:
-        printchar(c)
-    
-def PRINT(*s, sep="", end="\n", set=False):
-    """
-    Outputs characters to the screen. By default this does not include a newline (use \\\\n),
-    or spaces between the outputs.
-    
-    Args:
-    
-    -    s - things to print.
-    -    sep - same as Python's sep option for print.
-    -    end - same as Python's end option for print.
-    -    set - boolean - whether any changes made with INK, PAPER, BRIGHT, FLASH, INVERSE or OVER are permanent or not.
-    """
-    global ink,paper,flash,bright,inverse,over
-    if not set: store = (ink,paper,flash,bright,inverse,over)
-    first = True
-    for ss in s:
-        if first:
-            first = False
-        elif sep:
-            printitem(sep)
-        printitem(ss)
-    if end: printitem(end)
-    if not set: 
-        ink,paper,flash,bright,inverse,over = store
-        set_attr()
-    if autoupdate: UPDATE()
-
-def SET(*s, sep="", end=""):
+class DisplayList:
     """
-    Use this to set ink, paper, inverse etc. for text. This works like ``PRINT``, but all changes to ink
-    etc. are permanent.
-    
+    A list of drawing commands, recorded once and run as often as needed with ``RUN``. Running a list is done all in
+    compiled code, so it is much faster than making the same calls one at a time, which is useful for things that are
+    drawn every frame, like dials, charts and scores. The commands have the same names and arguments as the usual ones:
+    ``PLOT``, ``MOVE``, ``DRAW``, ``DRAWTO``, ``CIRCLE``, ``PRINT``, ``SETATTR`` and ``SETATTRS``. Example::
+
+        dial = DisplayList()
+        dial.CIRCLE(40, 40, 30)
+        dial.PLOT(40, 40)
+        dial.DRAW(0, -25, INK=2)
+        dial.PRINT(AT(10, 2), "Speed")
+        RUN(dial)
+        RUN(dial, 128, 0)
+
+    Colours and OVER and INVERSE that aren't given are the screen's when the list is run. ``PRINT`` keeps its own text
+    cursor, which starts at the top left, so use ``AT`` to place text. Text that goes off the bottom of the screen is
+    left out rather than scrolling, and ``DRAWTO`` can't draw arcs. The screen's text cursor is not moved.
+
     Args:
-    
-    -    s - things to print.
-    -    sep - same as Python's sep option for print.
-    -    end - same as Python's end option for print.
-    
-    """
-    PRINT(*s, set=True)
 
-def CLS():
-    """
-    Clears the screen, and moves the text cursor to the top left.
+    - COLS - integer - the width of the screen the list is for, in character cells. This is used to wrap text.
     """
-    global cursorx, cursory
-    set_attr()
-    memory[0x4000:0x5800] = 0
-    memory[0x5800:0x5b00] = attr
-    cursorx, cursory = 0,0
-    set_attr()
-    if autoupdate: UPDATE()
-
-def update():
-    global flashframe, flashc
-    flashc += 1
-    if flashc >= flashrate:
-        flashc = 0
-        flashframe = not flashframe
-    render()
-    pygame.display.flip()
-    clock.tick(60)
-
-def GETKEY():
-    """
-    Waits for a keypress, and returns the ASCII character of the key pressed.
-    """
-    # wait for no key to be pressed 
-    while inkeys:
-        UPDATE()
-    # then wait for a key
-    while not inkeys:
-        UPDATE()
-    return inkeys
-       
-
-def INKEYS():
-    """
-    If one or more keys that produce a character are held down, returns the ASCII character of
-    the most recently held down key. Otherwise, returns "". Equivalent to INKEY$ in ZX Spectrum Basic.
-    """
-    return inkeys
 
-def INPUT(*s, end="", **args):
-    """Interactive input - prints a prompt, returns a string. Not so much like the ZX Spectrum INPUT
-    - more like the INPUT on the Amstrad CPC.
-    
-    Args:
-    
-    - s - things to print for the prompt
-    - args - arguments to pass onto PRINT
-    """
-    global showcursor, keysdown, inkeys
-    args["end"] = end
-    PRINT(*s, **args)
-    #print(s)
-    scx, scy = cursorx, cursory
-    res = ""
-    finished = False
-    pygame.key.set_repeat(500,10)
-    osc = showcursor
-    showcursor = True
-    while not finished:
-        update()
-        for event in pygame.event.get():
-            if event.type == QUIT:
-                BYE()
-            elif event.type == KEYDOWN:
-                u = event.unicode
-                if u == "\r" or u == "\n": # return
-                    finished = True
-                    printchar("\n")
+    def __init__(self, COLS=32):
+        self.cols = int(COLS)
+        # Each op is (command, ink, over, inverse, start, count) - the last two say where its parameters are in
+        # params, or for text, where its characters are in chars. -1 means the screen's ink, over or inverse.
+        self.ops = []
+        self.params = []
+        self.nparams = 0
+        self.chars = []
+        self.cursorx = 0
+        self.cursory = 0
+        self.arrays = None
+
+    def add(self, command, params, INK=None, OVER=None, INVERSE=None):
+        params = np.asarray(params, dtype=np.float64).ravel()
+        self.ops.append((command, -1 if INK is None else int(INK) % 8, -1 if OVER is None else int(bool(OVER)),
+            -1 if INVERSE is None else int(bool(INVERSE)), self.nparams, len(params)))
+        self.params.append(params)
+        self.nparams += len(params)
+        self.arrays = None
+
+    def compile(self):
+        # The commands as arrays, for runlist
+        if self.arrays is None:
+            params = np.concatenate(self.params) if self.params else np.zeros(0)
+            self.arrays = (np.array(self.ops, dtype=np.int32).reshape(-1, 6), params,
+                np.array(self.chars, dtype=np.int32).reshape(-1, 8))
+        return self.arrays
+
+    def __len__(self):
+        return len(self.ops)
+
+    def PLOT(self, x, y, INK=None, OVER=None, INVERSE=None):
+        """Records a ``PLOT``."""
+        self.add(DL_PLOT, (x, y), INK, OVER, INVERSE)
+
+    def MOVE(self, x, y):
+        """Records a ``MOVE``."""
+        self.add(DL_MOVE, (x, y))
+
+    def DRAW(self, dx, dy, a=None, INK=None, OVER=None, INVERSE=None):
+        """Records a ``DRAW``, which can be a line or an arc."""
+        if a is None or abs(a) <= 1e-4:
+            self.add(DL_LINE, (dx, dy), INK, OVER, INVERSE)
+            return
+        # The points of the arc, relative to the middle of the first pixel, worked out as Screen.arc does
+        A = 1/np.tan(a/2)
+        cx = 0.5+(A*dy/2)+dx/2
+        cy = 0.5-(A*dx/2)+dy/2
+        r = np.sqrt((0.5-cx)**2+(0.5-cy)**2)
+        t0 = math.atan2(0.5-cx,0.5-cy)
+        if a > 0:
+            p = np.arange(0,a,1/r)+t0
+        else:
+            p = -np.arange(0,-a,1/r)+t0
+        points = np.column_stack(((r * np.sin(p)) + cx - 0.5, (r * np.cos(p)) + cy - 0.5))
+        self.add(DL_ARC, np.concatenate(((dx, dy), points.ravel())), INK, OVER, INVERSE)
+
+    def DRAWTO(self, x, y, a=None, INK=None, OVER=None, INVERSE=None):
+        """Records a ``DRAWTO``. In a display list, this can only draw straight lines."""
+        if a is not None and abs(a) > 1e-4: raise ValueError("DRAWTO can't draw arcs in a display list, use DRAW")
+        self.add(DL_LINETO, (x, y), INK, OVER, INVERSE)
+
+    def CIRCLE(self, x, y, r, INK=None, OVER=None, INVERSE=None):
+        """Records a ``CIRCLE``."""
+        p = np.arange(0,np.pi*2,1/r)
+        points = np.column_stack((r * np.sin(p), r * np.cos(p)))
+        self.add(DL_CIRCLE, np.concatenate(((x, y), points.ravel())), INK, OVER, INVERSE)
+
+    def SETATTR(self, x, y, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+        """Records a ``SETATTR``."""
+        self.SETATTRS(x, y, 1, 1, ATTR, INK, PAPER, BRIGHT, FLASH)
+
+    def SETATTRS(self, x, y, w, h, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+        """Records a ``SETATTRS``."""
+        self.add(DL_ATTRS, (int(x), int(y), int(w), int(h)) + attrmask(ATTR, INK, PAPER, BRIGHT, FLASH))
+
+    def PRINT(self, *s, sep="", end="\n"):
+        """Records a ``PRINT``. The control codes from ``INK``, ``AT`` and so on are dealt with as the list is made."""
+        text = sep.join(str(ss) for ss in s) + end
+        # The bits of the screen's attribute to keep, and the bits to set, and OVER and INVERSE, or -1 for the screen's
+        mask, attr, over, inverse = 255, 0, -1, -1
+        printstate = ""
+        start = len(self.chars)
+        for ch in text:
+            ch = ord(ch)
+            if printstate:
+                if printstate == "AT1":
+                    self.cursory = ch
+                    printstate = "AT2"
                     continue
-                if u == "\x08" and len(res) > 0: # delete
-                    res = res[:-1]
-                    printchar(12)
-                    continue
-                #print(event)
-                if event.scancode == 69 or event.scancode == 1: # PAUSE/BREAK and ESC
-                    BYE()
-                if u == "£": u="`" # character set malarkey
-                if u and (ord(u) < 32 or ord(u) > 127): u=""
-                if u:
-                    res = res + u
-                    printchar(u)
-    pygame.key.set_repeat(0)
-    showcursor = osc
-    keysdown = []
-    inkeys = ""
-    return res
-
-def MOVE(x,y):
+                elif printstate == "AT2":
+                    self.cursorx = ch
+                elif printstate == "INK":
+                    mask, attr = mask & 0b11111000, (attr & 0b11111000) | ch % 8
+                elif printstate == "PAPER":
+                    mask, attr = mask & 0b11000111, (attr & 0b11000111) | 8 * (ch % 8)
+                elif printstate == "FLASH":
+                    mask, attr = mask & 0b01111111, (attr & 0b01111111) | 128 * (ch % 2)
+                elif printstate == "BRIGHT":
+                    mask, attr = mask & 0b10111111, (attr & 0b10111111) | 64 * (ch % 2)
+                elif printstate == "INVERSE":
+                    inverse = ch % 2
+                elif printstate == "OVER":
+                    over = ch % 2
+                elif printstate == "TAB":
+                    newx = ch % self.cols
+                    if newx < self.cursorx: self.cursory += 1
+                    self.cursorx = newx
+                printstate = ""
+            elif ch < 32:
+                if ch == 10:
+                    self.cursorx = 0
+                    self.cursory += 1
+                elif ch == 12:
+                    self.cursorx -= 1
+                    if self.cursorx < 0:
+                        self.cursorx = self.cols - 1
+                        self.cursory -= 1
+                    self.chars.append((32, self.cursorx, self.cursory, mask, attr, over, inverse, 0))
+                elif ch in stated:
+                    printstate = stated[ch]
+            elif ch > 255:
+                raise ValueError("there is no character %d" % ch)
+            else:
+                self.chars.append((ch, self.cursorx, self.cursory, mask, attr, over, inverse, 1))
+                self.cursorx += 1
+            while self.cursorx >= self.cols:
+                self.cursorx -= self.cols
+                self.cursory += 1
+        self.ops.append((DL_CHARS, -1, -1, -1, start, len(self.chars) - start))
+        self.arrays = None
+
+class TileMap:
     """
-    Moves the graphics cursor to x,y.
-    
-    Args:
-    
-    - x - the x coordinate to move to
-    - y - the y coordinate to move to
-    """
-    global graphicsx, graphicsy
-    graphicsx, graphicsy = int(x),int(y)
-
-def plot(x,y,INK=None,
-    OVER=None,INVERSE=None):
-    global graphicsx, graphicsy
-    x,y = int(x),int(y)
-    graphicsx, graphicsy = x,y
-    if x < 0: return
-    if x >= 256: return
-    if y < 0: return
-    if y >= 192: return
-    midy = y % 8
-    cy = int(y/8)
-    lowy = cy % 8
-    highy = int(cy/8)
-    cx = int(x/8)
-    xp = x % 8
-    xm = 1 << (7-xp)
-    mp = 0x4000+cx+32*lowy+256*midy+256*8*highy
-    if OVER or (OVER is None and over):
-        memory[mp] ^= xm
-    elif INVERSE or (INVERSE is None and inverse):
-        memory[mp] &= (255-xm)
-    else:
-        memory[mp] |= xm
-    mask = 7
-    val = 0
-    if INK is None:
-        val = int(ink)
-    else:
-        val = int(INK)
-    memory[0x5800+cx+32*cy] &= (255-mask)
-    memory[0x5800+cx+32*cy] |= val
+    A grid of characters and their attributes, which can be much bigger than the screen, for things like game levels.
+    ``DRAWMAP`` shows part of it on the screen. The characters and attributes are numpy arrays, ``codes`` and
+    ``attrs``, indexed [y,x], which can be changed directly as well as with ``PUT``. Example::
 
-def POINT(x,y):
-    """
-    Tests the pixel at x,y, returns 1 if it is the ink colour and 0 if it is the paper colour.
+        level = TileMap(200, 50)
+        level.PUT(0, 49, "#" * 200, INK=2)
+        level.codes[40:49, 100] = ord("H")
+        DRAWMAP(level, 90, 26)
 
     Args:
-    
-    - x - the x coordinate to test
-    - y - the y coordinate to test
-    """
-    x,y = int(x),int(y)
-    if x < 0: return
-    if x >= 256: return
-    if y < 0: return
-    if y >= 192: return
-    midy = y % 8
-    cy = int(y/8)
-    lowy = cy % 8
-    highy = int(cy/8)
-    cx = int(x/8)
-    xp = x % 8
-    xm = 1 << (7-xp)
-    mp = 0x4000+cx+32*lowy+256*midy+256*8*highy
-    val = 1 if memory[mp] & xm else 0
-    return val
-        
-def PLOT(x,y,**args):
-    """Moves the graphics cursor to the point (x,y) and plots a pixel. NOTE: graphics coordinates
-    are relative to the top left, so (10,30) is 10 pixels to the right of and 30 below the top left.
-    
-    Args:
-    
-    - x - the x coordinate to move to
-    - y - the y coordinate to move to
-    - INK (0-7) - the colour to plot in
-    - OVER (0-1) - draw in XOR or not
-    - INVERSE (0-1) - erase or not
-    """
-    plot(x,y,**args)
-    if autoupdate: UPDATE()
 
-def DRAWTO(x,y,a=None,**args):
-    """
-    Draws a line from the last graphics point drawn (by ``PLOT`` or ``DRAW``), to the
-    point specified by x and y. Note that the coordinates are absolute.
-    
-    Args:
-    
-    - x - the x coordinate to draw to
-    - y - the y coordinate to draw to
-    - a - optional - draws an arc the angle to turn through, in radians (can be negative)
-    - INK (0-7) - the colour to draw in
-    - OVER (0-1) - draw in XOR or not
-    - INVERSE (0-1) - erase or not
+    - width - integer - the number of columns.
+    - height - integer - the number of rows.
+    - CHAR - string or integer - the character to fill the map with, which is also shown beyond its edges.
+    - ATTR - integer (0-255) - the attribute to fill the map with, also used beyond its edges.
     """
-    dx = x - graphicsx
-    dy = y - graphicsy
-    return DRAW(dx,dy,a,**args)
 
-def DRAW(dx,dy,a=None,**args):
-    """
-    Draws a line from the last graphics point drawn (by PLOT or DRAW). Note that the
-    coordinates are relative from that point, not absolute - ie. they specify the number
-    of pixels to go right or down.
-    
-    When called with the ``a`` argument, draws an arc from the graphics cursor position, ending dx pixels to the
-    right of and dy pixels below that position. Turns through a radians - to the left if a is positive, to the
-    right if a is negative.
-    
-    Args:
-    
-    - dx - the number of pixels to move right (can be negative)
-    - dy - the number of pixels to move down (can be negative)
-    - a - optional - draws an arc the angle to turn through, in radians (can be negative)
-    - INK (0-7) - the colour to draw in
-    - OVER (0-1) - draw in XOR or not
-    - INVERSE (0-1) - erase or not
-    """
+    def __init__(self, width, height, CHAR=" ", ATTR=0b00111000):
+        self.width, self.height = int(width), int(height)
+        if self.width < 1 or self.height < 1: raise ValueError("the map must be at least one cell across and down")
+        self.fillcode = ord(CHAR) if isinstance(CHAR, str) else int(CHAR)
+        if not 0 <= self.fillcode <= 255: raise ValueError("there is no character %d" % self.fillcode)
+        self.fillattr = int(ATTR) % 256
+        self.codes = np.full((self.height, self.width), self.fillcode, dtype=np.uint8)
+        self.attrs = np.full((self.height, self.width), self.fillattr, dtype=np.uint8)
+
+    def PUT(self, x, y, text, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
+        """
+        Writes a string into the map, across from (x,y), and optionally sets the attributes of the cells it covers in
+        the same way as ``SETATTR``. The parts off the edge of the map are left out.
+
+        Args:
+
+        - x - integer - the column to start at.
+        - y - integer - the row.
+        - text - string - the characters to write.
+        - ATTR - integer (0-255) - optional - the new attribute
+        - INK - integer (0-7) - optional - the new ink value
+        - PAPER - integer (0-7) - optional - the new paper value
+        - BRIGHT - integer (0-1) - optional - the new brightness value
+        - FLASH - integer (0-1) - optional - the new flash value
+        """
+        x, y = int(x), int(y)
+        codes = np.array([ord(c) for c in text], dtype=np.int32)
+        if (codes > 255).any(): raise ValueError("there is no character %d" % codes.max())
+        if not 0 <= y < self.height: return
+        start, end = max(x, 0), min(x + len(codes), self.width)
+        if start >= end: return
+        self.codes[y, start:end] = codes[start-x:end-x]
+        mask, attr = attrmask(ATTR, INK, PAPER, BRIGHT, FLASH)
+        cells = self.attrs[y, start:end]
+        cells &= mask
+        cells |= attr
 
-    if a is not None and abs(a) > 1e-4: return arc(dx, dy, a)
-
-    x = graphicsx + 0.5
-    y = graphicsy + 0.5
-    steps = max(abs(dx),abs(dy))
-    if steps < 1: return
-    mdx = dx/steps
-    mdy = dy/steps
-    for i in range(int(steps)):
-        x += mdx
-        y += mdy
-        plot(x, y, **args)
-    if autoupdate: UPDATE()
-
-def arc(dx, dy, a, **args):
-    global graphicsx, graphicsy
-    A = 1/np.tan(a/2)
-    sgx, sgy = graphicsx+dx, graphicsy+dy
-    
-    x = graphicsx + 0.5
-    y = graphicsy + 0.5    
-    cx = x+(A*dy/2)+dx/2
-    cy = y-(A*dx/2)+dy/2
-        
-    r = np.sqrt((x-cx)**2+(y-cy)**2)
-    graphicsx += dx
-    graphicsy += dy
-    
-    t0=math.atan2(x-cx,y-cy)
-    
-    if a > 0:
-        p = np.arange(0,a,1/r)+t0
-    else:
-        p = -np.arange(0,-a,1/r)+t0
-
-    xv = (r * np.sin(p)) + cx
-    yv = (r * np.cos(p)) + cy
-    for x, y in zip(xv, yv):
-        plot(x, y, **args)
-
-    graphicsx, graphicsy = sgx, sgy
-        
-    if autoupdate: UPDATE()
-
-def CIRCLE(x, y, r, **args):
-    """Draws a circle.
-    
-    - x - the x coordinate of the circle center
-    - y - the y coordinate of the circle center
-    - r - the radius of the circle, in pixels
-    - INK (0-7)
-    - PAPER (0-7)
-    - BRIGHT (0-1)
-    - FLASH (0-1)
-    - OVER (0-1) - draw in XOR or not
-    - INVERSE (0-1) - erase or not
-    """
-    global graphicsx, graphicsy
-    sgx, sgy = graphicsx, graphicsy
-
-    # These make the circles come out nicer
-    cx=x
-    cy=y
-
-    p = np.arange(0,np.pi*2,1/r)
-
-    xv = (r * np.sin(p)) + cx
-    yv = (r * np.cos(p)) + cy
-    for x, y in zip(xv, yv):
-        plot(x, y, **args)
-
-    graphicsx, graphicsy = sgx, sgy
-
-    if autoupdate: UPDATE()
-        
-        
-
-    
-def ATTR(x,y):
-    """Gets the attribute at a given text position. The attribute is an 8-bit value. The lowest three bits
-    specify the ink colour, the next three bits specify the paper, the next bit specifies brightness,
-    and the highest bit specified flash.
-    
-    Args:
-    
-    - x - integer (0-31) - the column of the attribute to get
-    - y - integer (0-23) - the row of the attribute to get
-    """
-    x = int(x)
-    y = int(y)
-    if x<0 or x>31 or y<0 or y>23: return -1
-    return memory[0x5800+x+(y*32)]
-    
-def SETATTR(x, y, ATTR=None, INK=None, PAPER=None, BRIGHT=None, FLASH=None):
-    """Sets the attribute at a given text position. The attribute is an 8-bit value. The lowest three bits
-    specify the ink colour, the next three bits specify the paper, the next bit specifies brightness,
-    and the highest bit specified flash.
-    
-    Calling this with only x and y will have no effect. Calling this with x, y and ATTR will change the
-    whole attribute. Calling this with x, y, and at least one of INK, PAPER, BRIGHT and FLASH will
-    
-    Args:
-    
-    - x - integer (0-31) - the column of the attribute to set
-    - y - integer (0-23) - the row of the attribute to set
-    - ATTR - integer (0-255) - optional - the new attribute
-    - INK - integer (0-7) - optional - the new ink value
-    - PAPER - integer (0-7) - optional - the new paper value
-    - BRIGHT - integer (0-1) - optional - the new brightness value
-    - FLASH - integer (0-1) - optional - the new flash value
-    """
-    x = int(x)
-    y = int(y)
-    if x<0 or x>31 or y<0 or y>23: return -1
-    mask = 255
-    attr = 0
-    # todo check input
-    if ATTR is not None:
-        attr = int(ATTR) % 256
-        mask = 0
-    else:
-        if INK is not None:
-            attr += int(INK) % 8
-            mask &= 0b11111000
-        if PAPER is not None:
-            attr += 8 * (int(PAPER) % 8)
-            mask &= 0b11000111
-        if BRIGHT is not None:
-            attr += 64 * (int(BRIGHT) % 2)
-            mask &= 0b10111111
-        if FLASH is not None:
-            attr += 128 * (int(FLASH) % 2)
-            mask &= 0b01111111
-    addr = 0x5800+x+(y*32)
-    #print(hex(addr), mask, attr, memory[addr], mask & memory[addr], (mask & memory[addr]) | attr)
-    memory[addr] = (mask & memory[addr]) | attr
-    if autoupdate: UPDATE()
-    
-def SCREENSTR(x,y):
-    """
-    Examines a text position to see what character might be there. Roughly equivalent to SCREEN$ on the ZX Spectrum.
-    Returns a string containing the possible characters, may be empty.
-    
-    This uses the current contents of the character set, from position 32 to 255, and compares them against the
-    pixels on screen. Redefining the character set will affect the results of this function. This function will
-    not be able to detect characters written with INVERSE, or characters with graphics drawn over the top, or with
-    other characters drawn over the top with OVER.
-    
-    Args:
-    
-    - x - integer (0-31) - the column of the character to examine
-    - y - integer (0-23) - the row of the character to examine.
-    """
-    lowy = y % 8
-    highy = int(y/8)
-    addr = 0x4000+x+32*lowy+256*8*highy
-    vals = tuple([memory[a*256+addr] for a in range(8)])
-    return [chr(i) for i in range(32,256) if charset[i] == vals]
-
-def UPDATE():
-    """
-    Updates the display, INKEYS, and checks for the PAUSE BREAK and ESC key and closing the pygame window. 
-
-    There are various reasons for calling this:
-    
-    - If MANUALUPDATE has been called, call this every time you want to show the current graphics state to the user.
-    - In a loop repeatedly calling INKEYS, call this to get INKEYS up to date.
-    - In a delay loop, call this to pause briefly, while updating the display, keeping flashing things flashing, respecting BREAK and the window close button.
-    - When doing a lot of computation (i.e. that takes a significant amount of time), call this occasionally so the system doesn't appear to have hung.    
-    """
-    global running, flashframe, inkeys
-    update()
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            BYE()
-        elif event.type == KEYDOWN:
-            u = event.unicode
-            if event.scancode == 69 or event.scancode == 1: # PAUSE/BREAK and ESC
-                BYE()
-            if u == "£": u="`" # character set malarkey
-            if u and (ord(u) < 32 or ord(u) > 127): u=""
-            if u:
-                keysdown.append(u)
-                inkeys = u
-                keyd[event.key] = u
-        elif event.type == KEYUP:
-            if event.key in keyd: 
-                keysdown.remove(keyd[event.key])
-                if keysdown:
-                    inkeys = keysdown[-1]
-                else:
-                    inkeys = ""
-        
 def BEEP(duration, pitch):
     """Plays a beep. This is pretty crude, and the pitches become more and more approximate the higher they go.
 
@@ -1002,121 +1905,101 @@ def BEEP(duration, pitch):
     freq = 261.625565 * 2 ** (pitch/12)
     cycles = 44100 / freq
     clen = int(cycles / 2)
+    if not mixer: init_mixer()
     snd = pygame.sndarray.make_sound(np.concatenate([np.zeros(clen,dtype=np.uint8),np.ones(clen,dtype=np.uint8)*255]))
     snd.play(-1)
     pygame.time.wait(int(duration*1000))    
     snd.stop()
-        
-def PAUSE(frames):
-    """Pauses for a specified number of frames, while updating the screen. If specgfx is running well, it runs at 60
-    frames a second.
-    
-    Args:
-    
-    - frames - integer - the number of frames to wait for.
-    """
-    for frame in range(frames):
-        UPDATE()
-    
-def AUTOUPDATE():
-    """Enable automatic updating, allowing the effects of all text and graphics operations
-    to be seen immediately. Note that this is the default, and so it is only useful
-    to call this if you have previously called ``MANUALUPDATE``."""
-    global autoupdate
-    autoupdate = True
-    
-def MANUALUPDATE():
-    """Disable automatic updating - all text and graphics operations will only take effect when
-    ``UPDATE`` is called. This is useful for speed or smooth animation. To re-enable automatic updating
-    call ``AUTOUPDATE``."""
-    global autoupdate
-    autoupdate = False
 
 def BYE():
     """Shut down the display and exit python."""
-    pygame.quit()
+    if pygame is not None: pygame.quit()
     sys.exit(0)
 
-def UDG(charno, values):
-    """
-    Redefine a character in the character set, in a manner similar to User Defined Graphics (UDG)
-    on the ZX Spectrum.
-    
-    This can be used to redefine already-existing characters, if (for example) you want to use a
-    different font, or sacrifice some or all of the letters, numbers punctuation etc. for more
-    graphics characters. Note also that any characters already drawn to the screen will not
-    be altered by this - if you print an "a", then redefine "a", then print another "a", then
-    the first "a" will be in the old style and the second will be in the new style.
-    
-    Example::
-    
-        UDG(0x90, (0b00000001,
-                   0b00000011,
-                   0b00000111,
-                   0b00001111,
-                   0b00011111,
-                   0b00111111,
-                   0b01111111,
-                   0b11111111))
-        PRINT("\x90")
-    
-    defines a triangle character and assigns it to character number 0x90 (144 in decimal) and prints it.
-    
-    Args:
-    
-    - charno - integer (32-255) - the character to define
-    - values - tuple of 8 integers, 0-255, representing the character.
-    """
-    if len(values) != 8 or [i for i in values if type(i) != int or i < 0 or i > 255]: raise Exception
-    charset[charno] = tuple(values)
-    
-def GETCHARDEF(charno):
-    """
-    Fetches the definition of a character, as a tuple of 8 integers. See ``UDG`` for more details.
-    
-    Args:
-    
-    - charno - integer (32-255) - the character to get the definition of.
-    """
-    return charset[charno]
-    
-def RESETCHARS():
-    """
-    Resets the character set to its original state. Undoes the effects of ``UDG``.
-    """
-    for i in range(256):
-        charset[i] = defcharset[i-32] if i>32 and i-32<len(defcharset) else (0,0,0,0,0,0,0,0)
+# The screen used by the upper-case functions below
+_screen = None
 
-def GETMEMORY():
+def INIT(FULL=False, SIZEX=1, HEADLESS=False, LUT=False, INDEXED=False, COLS=32, ROWS=24, SHARED=False, FPS=60):
     """
-    Advanced: Gets the screen memory, as a numpy array. This is a 32k array of unsigned 8-bit
-    integers (mimicing the address space of a 16k ZX Spectrum, with the first 16k representing ROM),
-    and is mostly zeros. The screen memory is laid out as in a ZX Spectrum, with
-    the pixels starting at 0x4000 and the attributes starting at 0x5800, ending at 0x5aff
-    
-    This gets the actual array that specgfx works with - changing values in this array (between
-    0x4000 and 0x5aff) will change the screen once you call ``UPDATE``.
-    """
-    return memory
+    Initialise the specgfx system, making a new ``Screen`` for the other commands to use, and
+    returning it. The display window is opened when the screen is first updated.
 
-def PEEK(address):
-    """
-    Reads a byte in the screen memory, at the given address.
-    
     Args:
-    
-    - address - integer, from 0 to 0x7fff, but only values from 0x4000 to 0x5aff are of interest.
+
+    - FULL - boolean - whether to initialise fullscreen.
+    - SIZEX - integer - size multiplier for the output screen.
+    - HEADLESS - boolean - whether to render without a window.
+    - LUT - boolean - whether to render with a lookup table, which is faster but takes more memory.
+    - INDEXED - boolean - whether to render to an 8-bit surface with a palette, which moves less data.
+    - COLS - integer - the width of the screen in character cells. Sizes other than 32x24 use a simpler memory layout, see ``GETMEMORY``.
+    - ROWS - integer - the height of the screen in character cells.
+    - SHARED - boolean - whether to show the screen from a separate process, with the screen in shared memory.
+    - FPS - number - how many frames a second to show.
     """
-    return memory[address]
-    
-def POKE(address, value):
+    global _screen
+    _screen = Screen(FULL, SIZEX, HEADLESS, LUT, INDEXED, COLS, ROWS, SHARED, FPS)
+    return _screen
+
+def GETSCREEN():
     """
-    Writes a byte to the screen memory, at the given address. Writing between 0x4000 and 0x5aff will
-    change the screen once you call ``UPDATE``.
-    
-    Args:
-    
-    - address - integer, from 0 to 0x7fff, but only values from 0x4000 to 0x5aff are of interest.
-    - value - integer - the byte to write.
+    Advanced: Gets the ``Screen`` that the upper-case commands are working on - i.e. the one made
+    by the last call to ``INIT``.
     """
-    memory[address] = value
\ No newline at end of file
+    return _screen
+
+def facade(name):
+    method = getattr(Screen, name)
+    @functools.wraps(method)
+    def call(*args, **kwargs):
+        return getattr(_screen, name)(*args, **kwargs)
+    sig = inspect.signature(method)
+    call.__signature__ = sig.replace(parameters=list(sig.parameters.values())[1:])
+    return call
+
+SCROLLUP = facade("SCROLLUP")
+BORDER = facade("BORDER")
+PALETTE = facade("PALETTE")
+PRINT = facade("PRINT")
+SET = facade("SET")
+CLS = facade("CLS")
+GETKEY = facade("GETKEY")
+INKEYS = facade("INKEYS")
+INPUT = facade("INPUT")
+MOVE = facade("MOVE")
+POINT = facade("POINT")
+PLOT = facade("PLOT")
+DRAWTO = facade("DRAWTO")
+DRAW = facade("DRAW")
+CIRCLE = facade("CIRCLE")
+ATTR = facade("ATTR")
+SETATTR = facade("SETATTR")
+ATTRS = facade("ATTRS")
+SETATTRS = facade("SETATTRS")
+SCREENSTR = facade("SCREENSTR")
+RUN = facade("RUN")
+DRAWMAP = facade("DRAWMAP")
+UPDATE = facade("UPDATE")
+PAUSE = facade("PAUSE")
+AUTOUPDATE = facade("AUTOUPDATE")
+MANUALUPDATE = facade("MANUALUPDATE")
+UDG = facade("UDG")
+GETCHARDEF = facade("GETCHARDEF")
+RESETCHARS = facade("RESETCHARS")
+LOADFONT = facade("LOADFONT")
+CHARBANK = facade("CHARBANK")
+GETMEMORY = facade("GETMEMORY")
+PEEK = facade("PEEK")
+POKE = facade("POKE")
+SPRITE = facade("SPRITE")
+MOVESPRITE = facade("MOVESPRITE")
+SHOWSPRITE = facade("SHOWSPRITE")
+HIDESPRITE = facade("HIDESPRITE")
+COLLISIONS = facade("COLLISIONS")
+PEEKS = facade("PEEKS")
+POKES = facade("POKES")
+MEMSET = facade("MEMSET")
+MEMCOPY = facade("MEMCOPY")
+GETPIXELS = facade("GETPIXELS")
+SETPIXELS = facade("SETPIXELS")
+SCREENHASH = facade("SCREENHASH")
+SCREENDIFF = facade("SCREENDIFF")
@@ -0,0 +1,279 @@
+"""
+Streams a screen to remote viewers. Rather than sending rendered frames, the server sends the
+bytes of screen memory that have changed since the last frame, along with the border, the flash
+phase and the text cursor, so that a text program only needs a few bytes a frame. Start a server with::
+
+    from specgfx import *
+    INIT(HEADLESS=True)
+    SERVE("0.0.0.0:5858")
+
+and then watch it from another machine with ``python -m specgfx.viewer host:5858``. Keys pressed in the
+viewer are sent back, and show up in ``INKEYS``, ``GETKEY`` and so on. Addresses starting with
+``unix:`` are Unix sockets.
+
+The protocol is a stream of messages. The server starts with ``MAGIC``; after that, each message is a
+``FRAME`` header followed by a payload of the given length. A keyframe's payload is the 6912 bytes of screen
+memory, compressed with zlib. A delta's payload is a list of runs, each a ``RUN`` header (an offset into the
+screen memory and a length) followed by that many bytes. The viewer sends ``KEY`` messages back.
+"""
+
+import os
+import socket
+import stat
+import struct
+import zlib
+
+import numpy as np
+
+from .specgfx import GETSCREEN
+
+MAGIC = b"SPECGFX1"
+# kind, border, flags (1 = flash phase, 2 = show cursor), cursor x, cursor y, payload length
+FRAME = struct.Struct("<BBBBBI")
+RUN = struct.Struct("<HH")
+# kind, key code, character
+KEY = struct.Struct("<Bii")
+
+KEYFRAME = ord("K")
+DELTA = ord("D")
+PRESS = ord("P")
+RELEASE = ord("R")
+
+SCREENSTART = 0x4000
+SCREENEND = 0x5b00
+
+# Changed bytes closer together than this are sent as one run
+GAP = 4
+
+def parseaddress(address):
+    if isinstance(address, str):
+        if address.startswith("unix:"):
+            return socket.AF_UNIX, address[5:]
+        host, _, port = address.rpartition(":")
+        return socket.AF_INET, (host or "0.0.0.0", int(port))
+    return socket.AF_INET, tuple(address)
+
+def removestale(path):
+    # Removes a Unix socket left behind by a server that has gone, so its path can be used again.
+    # Anything that isn't a socket, or that a server is still listening on, is left alone.
+    try:
+        if not stat.S_ISSOCK(os.stat(path).st_mode): return
+    except FileNotFoundError:
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)
+    except OSError:
+        pass
+    finally:
+        probe.close()
+
+def connect(address):
+    family, addr = parseaddress(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(addr)
+    return sock
+
+def deltaruns(old, new):
+    """
+    Encodes the differences between two copies of the screen memory as a delta payload.
+
+    Args:
+
+    - old, new - numpy arrays of unsigned 8-bit integers, the same length.
+    """
+    changed = np.flatnonzero(old != new)
+    if len(changed) == 0: return b""
+    breaks = np.flatnonzero(np.diff(changed) > GAP) + 1
+    starts = changed[np.concatenate(([0], breaks))]
+    ends = changed[np.concatenate((breaks - 1, [len(changed) - 1]))] + 1
+    out = []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        out.append(RUN.pack(start, end - start))
+        out.append(new[start:end].tobytes())
+    return b"".join(out)
+
+def applyruns(payload, screenmem):
+    """
+    Applies a delta payload (see ``deltaruns``) to a copy of the screen memory.
+    """
+    pos = 0
+    while pos < len(payload):
+        start, n = RUN.unpack_from(payload, pos)
+        pos += RUN.size
+        screenmem[start:start+n] = np.frombuffer(payload, np.uint8, n, pos)
+        pos += n
+
+class Client:
+    def __init__(self, sock):
+        self.sock = sock
+        # Messages waiting to be sent, how much of the first one has been sent, and how many bytes are left
+        self.queue = []
+        self.sent = 0
+        self.queued = 0
+        self.inbuf = b""
+        self.needkeyframe = True
+
+    def add(self, msg):
+        if msg:
+            self.queue.append(msg)
+            self.queued += len(msg)
+
+    def skip(self):
+        # Throw away the backlog, apart from any message that has been partly sent
+        self.queue = self.queue[:1] if self.sent else []
+        self.queued = len(self.queue[0]) - self.sent if self.queue else 0
+        self.needkeyframe = True
+
+    def send(self):
+        while self.queue:
+            msg = self.queue[0]
+            n = self.sock.send(memoryview(msg)[self.sent:])
+            self.sent += n
+            self.queued -= n
+            if self.sent < len(msg): return
+            self.queue.pop(0)
+            self.sent = 0
+
+class StreamServer:
+    """
+    Sends a screen's changes to connected viewers every time it is updated. Made by ``SERVE``.
+
+    Args:
+
+    - screen - Screen - the screen to stream.
+    - address - string - "host:port" or "unix:path".
+    - keyframe - integer - how often, in frames, to send the whole screen.
+    - maxbuffer - integer - how many unsent bytes a slow viewer can have before it is skipped ahead to the next keyframe.
+    """
+
+    def __init__(self, screen, address, keyframe=300, maxbuffer=1 << 20):
+        if screen.linear: raise ValueError("only 32x24 screens can be streamed")
+        self.screen = screen
+        self.keyframe = keyframe
+        self.maxbuffer = maxbuffer
+        family, addr = parseaddress(address)
+        self.listener = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        else:
+            removestale(addr)
+        self.path = addr if family == socket.AF_UNIX else None
+        self.listener.bind(addr)
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self.clients = []
+        self.frames = 0
+        self.last = None
+        self.laststate = None
+        screen.framehooks.append(self)
+
+    def __call__(self, screen):
+        self.accept()
+        self.readkeys()
+        if not self.clients:
+            self.last = None
+            return
+        mem = screen.memory[SCREENSTART:SCREENEND]
+        state = (screen.border, int(bool(screen.flashframe)) | 2 * int(bool(screen.showcursor)),
+            screen.cursorx % 256, screen.cursory % 256)
+        keyframe = self.last is None or self.frames % self.keyframe == 0
+        self.frames += 1
+        keymsg = b""
+        if keyframe or [c for c in self.clients if c.needkeyframe]:
+            payload = zlib.compress(mem.tobytes())
+            keymsg = FRAME.pack(KEYFRAME, *state, len(payload)) + payload
+        delta = b""
+        if not keyframe:
+            payload = deltaruns(self.last, mem)
+            if payload or state != self.laststate:
+                delta = FRAME.pack(DELTA, *state, len(payload)) + payload
+        for client in self.clients:
+            if keyframe or client.needkeyframe:
+                client.add(keymsg)
+                client.needkeyframe = False
+            else:
+                client.add(delta)
+        self.last = mem.copy()
+        self.laststate = state
+        self.flush()
+
+    def accept(self):
+        while True:
+            try:
+                sock, addr = self.listener.accept()
+            except BlockingIOError:
+                return
+            sock.setblocking(False)
+            client = Client(sock)
+            client.add(MAGIC)
+            self.clients.append(client)
+
+    def readkeys(self):
+        for client in list(self.clients):
+            try:
+                data = client.sock.recv(4096)
+            except BlockingIOError:
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                self.drop(client)
+                continue
+            client.inbuf += data
+            while len(client.inbuf) >= KEY.size:
+                kind, key, u = KEY.unpack_from(client.inbuf)
+                client.inbuf = client.inbuf[KEY.size:]
+                if kind not in (PRESS, RELEASE) or not 0 <= u < 0x110000:
+                    # Not from a viewer that works, so stop listening to it rather than let it stop the program
+                    self.drop(client)
+                    break
+                if kind == PRESS:
+                    self.screen.keydown(key, chr(u) if u else "")
+                else:
+                    self.screen.keyup(key)
+
+    def flush(self):
+        for client in list(self.clients):
+            if client.queued > self.maxbuffer:
+                # Too far behind - start again from a keyframe
+                client.skip()
+            try:
+                client.send()
+            except BlockingIOError:
+                pass
+            except OSError:
+                self.drop(client)
+
+    def drop(self, client):
+        client.sock.close()
+        self.clients.remove(client)
+
+    def close(self):
+        """Disconnects all viewers and stops streaming."""
+        for client in list(self.clients):
+            self.drop(client)
+        self.listener.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+        if self in self.screen.framehooks: self.screen.framehooks.remove(self)
+
+def SERVE(address, keyframe=300, screen=None):
+    """
+    Starts streaming the screen to remote viewers, which connect with ``python -m specgfx.viewer``.
+    The changes to the screen are sent each time the screen is updated. Returns a ``StreamServer``,
+    call its ``close`` method to stop.
+
+    Args:
+
+    - address - string - "host:port" to listen on, or "unix:path" for a Unix socket.
+    - keyframe - integer - how often, in frames, to send the whole screen.
+    - screen - Screen - optional - the screen to stream. Defaults to the one made by ``INIT``.
+    """
+    return StreamServer(screen or GETSCREEN(), address, keyframe)
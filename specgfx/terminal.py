@@ -0,0 +1,192 @@
+"""
+Shows a screen in a text terminal, so that specgfx programs can be used over ssh without a window. Each character
+of the terminal shows two pixels, one above the other, using the upper half block character with its foreground and
+background colours. Start with::
+
+    from specgfx import *
+    INIT(HEADLESS=True)
+    TERMINAL()
+
+Only the terminal cells that have changed since the last frame are written, so a program that changes little of the
+screen sends very little. Keys typed in the terminal show up in ``INKEYS``, ``GETKEY`` and so on, but as terminals only
+say when a key is typed, not when it is let go, each key counts as held down until another key is typed or a short
+time has passed. ``INPUT`` needs a window, and doesn't work in a terminal.
+"""
+
+import atexit
+import os
+import select
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from .specgfx import GETSCREEN
+from .cyrender import cyrender, spriterender
+
+INDICES = np.arange(16, dtype=np.uint8)
+
+# The ANSI colour numbers of the palette colours: the ZX Spectrum has blue as bit 0 and red as bit 1, ANSI the other way round
+ANSICOLOURS = [((i >> 1) & 1) | ((i >> 1) & 2) | ((i & 1) << 2) for i in range(8)]
+
+def colourcodes(palette, truecolour):
+    # The escape codes for the foreground and background in each palette colour
+    if truecolour:
+        fg = ["38;2;%d;%d;%d" % tuple(c) for c in palette]
+        bg = ["48;2;%d;%d;%d" % tuple(c) for c in palette]
+    else:
+        fg = ["%d" % (30 + ANSICOLOURS[i] if i < 8 else 90 + ANSICOLOURS[i-8]) for i in range(16)]
+        bg = ["%d" % (40 + ANSICOLOURS[i] if i < 8 else 100 + ANSICOLOURS[i-8]) for i in range(16)]
+    return fg, bg
+
+class TerminalDisplay:
+    """
+    Draws a screen in the terminal every time it is updated, and reads keys typed in it. Made by ``TERMINAL``.
+
+    Args:
+
+    - screen - Screen - the screen to show.
+    - out - file - the text stream to write to.
+    - scale - integer - show one pixel out of every scale across and down. Defaults to the smallest that fits the terminal.
+    - truecolour - boolean - whether to use the palette's exact colours, rather than the 16 standard terminal colours.
+    - keyboard - boolean - whether to read keys from standard input.
+    - fps - number - optional - the frames a second to run at, if not the screen's. Headless screens don't wait between
+      frames, so while the terminal shows one it keeps time as if it had a window.
+    - hold - float - how long a typed key counts as being held down for, in seconds.
+    """
+
+    def __init__(self, screen, out=None, scale=None, truecolour=False, keyboard=True, fps=None, hold=0.1):
+        self.screen = screen
+        self.out = out or sys.stdout
+        if scale is None:
+            cols, rows = shutil.get_terminal_size()
+            scale = max(-(-screen.pixw // cols), -(-screen.pixh // (2 * max(rows - 1, 1))), 1)
+        self.scale = int(scale)
+        self.truecolour = truecolour
+        self.hold = hold
+        # The screen keeps time by the clock while it is shown, and goes back to how it was afterwards
+        self.paced = screen.paced
+        self.fps = screen.fps
+        if fps: screen.fps = fps
+        if not screen.paced:
+            screen.paced = True
+            screen.starttime = time.monotonic() - screen.time
+            screen.nextframe = time.monotonic()
+        self.pixels = np.zeros((screen.pixh, screen.pixw), dtype=np.uint8)
+        # What is on the terminal, as the foreground and background colour of each cell, -1 if not known
+        h = -(-screen.pixh // self.scale)
+        w = -(-screen.pixw // self.scale)
+        self.shown = np.full((2, (h + 1) // 2, w), -1, dtype=np.int16)
+        self.palette = None
+        # The key being held down, and when it was typed
+        self.key = None
+        self.keytime = 0
+        self.stdin = None
+        self.termattrs = None
+        if keyboard and sys.stdin.isatty():
+            import termios, tty
+            self.stdin = sys.stdin.fileno()
+            self.termattrs = termios.tcgetattr(self.stdin)
+            tty.setcbreak(self.stdin)
+        # Clear the terminal and hide the cursor
+        self.out.write("\x1b[0m\x1b[2J\x1b[?25l")
+        screen.framehooks.append(self)
+        atexit.register(self.close)
+
+    def __call__(self, screen):
+        self.readkeys()
+        if not screen.skipped: self.draw()
+
+    def draw(self):
+        screen = self.screen
+        cyrender(screen.memory, self.pixels.T, INDICES, screen.flashframe, screen.showcursor, screen.cursorx, screen.cursory,
+            *screen.geometry())
+        if screen.spritesshown:
+            spriterender(self.pixels, INDICES, screen.spritebits, screen.spritemasks, screen.spritetable)
+        if screen.palette != self.palette:
+            # The colours have changed, so everything has to be written again
+            self.palette = list(screen.palette)
+            self.fg, self.bg = colourcodes(self.palette, self.truecolour)
+            self.shown[:] = -1
+        img = self.pixels[::self.scale, ::self.scale]
+        if img.shape[0] % 2: img = np.concatenate((img, img[-1:]))
+        cells = np.stack((img[0::2], img[1::2]))
+        changed = (cells != self.shown).any(0)
+        if not changed.any(): return
+        fg, bg = self.fg, self.bg
+        out = []
+        lastfg = lastbg = None
+        for y in np.flatnonzero(changed.any(1)).tolist():
+            row = changed[y]
+            upper, lower = cells[0, y].tolist(), cells[1, y].tolist()
+            lastx = None
+            for x in np.flatnonzero(row).tolist():
+                if x != lastx:
+                    out.append("\x1b[%d;%dH" % (y + 1, x + 1))
+                codes = []
+                if upper[x] != lastfg: codes.append(fg[upper[x]])
+                if lower[x] != lastbg: codes.append(bg[lower[x]])
+                if codes: out.append("\x1b[%sm" % ";".join(codes))
+                out.append("▀")
+                lastfg, lastbg = upper[x], lower[x]
+                lastx = x + 1
+        self.shown[:] = cells
+        self.out.write("".join(out))
+        self.out.flush()
+
+    def readkeys(self):
+        screen = self.screen
+        if self.key is not None and time.monotonic() - self.keytime > self.hold:
+            screen.keyup(self.key)
+            self.key = None
+        if self.stdin is None: return
+        while select.select([self.stdin], [], [], 0)[0]:
+            data = os.read(self.stdin, 1024)
+            if not data: break
+            text = data.decode("utf-8", "replace")
+            i = 0
+            while i < len(text):
+                u = text[i]
+                if u == "\x1b" and text[i+1:i+2] in ("[", "O"):
+                    # Skip escape sequences, such as for the arrow keys
+                    i += 2
+                    while i < len(text) and not ("@" <= text[i] <= "~"): i += 1
+                    i += 1
+                    continue
+                i += 1
+                if u == "\x7f": u = "\x08"
+                if self.key is not None: screen.keyup(self.key)
+                self.key = ord(u.lower())
+                self.keytime = time.monotonic()
+                screen.keydown(self.key, u)
+
+    def close(self):
+        """Stops showing the screen, and puts the terminal back as it was."""
+        if self in self.screen.framehooks: self.screen.framehooks.remove(self)
+        self.screen.fps = self.fps
+        if not self.paced:
+            self.screen.paced = False
+            self.screen.frames = round(self.screen.time * self.screen.fps)
+        if self.termattrs is not None:
+            import termios
+            termios.tcsetattr(self.stdin, termios.TCSADRAIN, self.termattrs)
+            self.termattrs = None
+        self.out.write("\x1b[0m\x1b[%d;1H\x1b[?25h\n" % (self.shown.shape[1] + 1))
+        self.out.flush()
+        atexit.unregister(self.close)
+
+def TERMINAL(scale=None, truecolour=False, keyboard=True, fps=None, screen=None):
+    """
+    Starts showing the screen in the terminal, and reading keys from it. Use with a headless screen (``INIT(HEADLESS=True)``)
+    to run without a window, for example over ssh. Returns a ``TerminalDisplay``, call its ``close`` method to stop.
+
+    Args:
+
+    - scale - integer - optional - show one pixel out of every scale across and down. Defaults to the smallest that fits the terminal.
+    - truecolour - boolean - whether to use the palette's exact colours. Not all terminals can show these.
+    - keyboard - boolean - whether to read keys typed in the terminal.
+    - fps - number - optional - the frames a second to run at. Defaults to the screen's (see ``INIT``).
+    - screen - Screen - optional - the screen to show. Defaults to the one made by ``INIT``.
+    """
+    return TerminalDisplay(screen or GETSCREEN(), scale=scale, truecolour=truecolour, keyboard=keyboard, fps=fps)
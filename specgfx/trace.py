@@ -0,0 +1,346 @@
+"""
+Traces the calls a program makes to a screen, so that real workloads can be replayed as benchmarks, and to check
+that changes to specgfx still draw the same thing. Start tracing with::
+
+    TRACE("session.sgt")
+
+and every call to an upper-case ``Screen`` method (``PRINT``, ``PLOT``, ``SETATTR``, and the module functions that
+use them) is logged with its arguments and the frame number, until the tracer is closed or the program ends. Calls
+made by other calls, such as the ``UPDATE`` in ``PRINT``, aren't logged separately. Replay with::
+
+    python -m specgfx.replay session.sgt
+
+which runs the calls again on a headless screen, as fast as possible, and reports the throughput, a histogram of the
+time taken by each kind of call, and the ``SCREENHASH`` of the final screen, which should match the one that was traced.
+Changes made by writing to the arrays from ``GETMEMORY`` or ``ATTRS`` directly aren't traced, so the hashes won't
+match for programs that do that. Keyboard input isn't replayed: ``GETKEY``, ``INKEYS`` and ``INPUT`` give the
+results they gave when traced.
+
+The file starts with a ``HEADER``. Each record after that is a ``CALL`` header (the method's number, the frame
+number, the payload length) and a payload of the arguments, keyword arguments and result, encoded by ``encode``.
+Method numbers are given out as they are first used, by a record with the number ``NAME`` whose payload is the
+method's name. The file ends with an ``END`` record, whose payload is the ``SCREENHASH`` of the screen at the end.
+"""
+
+import atexit
+import pickle
+import struct
+import time
+
+import numpy as np
+
+from .specgfx import Screen, GETSCREEN, DisplayList, TileMap
+
+MAGIC = b"SPECTRC1"
+# magic, columns, rows
+HEADER = struct.Struct("<8sHH")
+# method number, frame, payload length
+CALL = struct.Struct("<BII")
+NAME = 254
+END = 255
+
+# Methods whose results are recorded and given back on replay, rather than being called again
+INPUTS = ("GETKEY", "INKEYS", "INPUT")
+
+# Histogram buckets, in nanoseconds: under 1us, under 2us, under 4us and so on up to about a second
+BUCKETS = [1000 << i for i in range(21)]
+
+def encode(obj, out):
+    """
+    Appends the encoding of an argument to the bytearray out. Numbers, strings, bytes, lists, tuples, dicts, numpy
+    arrays, display lists, tile maps and screens are encoded compactly, anything else is pickled. Pickles can run any
+    code when they are read, so ``decode`` only reads them if asked to.
+    """
+    if obj is None:
+        out += b"N"
+    elif obj is True:
+        out += b"T"
+    elif obj is False:
+        out += b"F"
+    elif isinstance(obj, (int, np.integer)) and -(1 << 63) <= obj < (1 << 63):
+        out += b"i" + struct.pack("<q", int(obj))
+    elif isinstance(obj, (float, np.floating)):
+        out += b"d" + struct.pack("<d", float(obj))
+    elif isinstance(obj, str):
+        data = obj.encode("utf-8", "surrogatepass")
+        out += b"s" + struct.pack("<I", len(data)) + data
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        data = bytes(obj)
+        out += b"b" + struct.pack("<I", len(data)) + data
+    elif isinstance(obj, (list, tuple)):
+        out += (b"l" if isinstance(obj, list) else b"t") + struct.pack("<I", len(obj))
+        for item in obj: encode(item, out)
+    elif isinstance(obj, dict) and all(isinstance(k, str) for k in obj):
+        out += b"m" + struct.pack("<I", len(obj))
+        for k, v in obj.items():
+            encode(k, out)
+            encode(v, out)
+    elif isinstance(obj, np.ndarray) and obj.dtype.kind in "biuf":
+        dtype = obj.dtype.str.encode()
+        out += b"a" + bytes((len(dtype), obj.ndim)) + dtype + struct.pack("<%dI" % obj.ndim, *obj.shape)
+        out += np.ascontiguousarray(obj).tobytes()
+    elif isinstance(obj, DisplayList):
+        out += b"D"
+        encode((obj.cols, obj.cursorx, obj.cursory) + obj.compile(), out)
+    elif isinstance(obj, TileMap):
+        out += b"M"
+        encode((obj.fillcode, obj.fillattr, obj.codes, obj.attrs), out)
+    elif isinstance(obj, Screen):
+        # Just what is shown, which is all that the commands that take another screen look at
+        out += b"S"
+        encode((obj.cols, obj.rows, obj.border, obj.memory[0x4000:obj.screenend]), out)
+    else:
+        data = pickle.dumps(obj)
+        out += b"p" + struct.pack("<I", len(data)) + data
+
+def decode(data, pos=0, allowpickle=False):
+    """
+    Decodes an argument encoded by ``encode``, returning it and the position after it.
+
+    Args:
+
+    - data - bytes - the encoded data.
+    - pos - integer - where the argument starts.
+    - allowpickle - boolean - whether to unpickle arguments that were pickled. Only do this for traces from somewhere
+      you trust, as unpickling can run any code. Otherwise these raise a ValueError.
+    """
+    tag = data[pos:pos+1]
+    pos += 1
+    if tag == b"N": return None, pos
+    if tag == b"T": return True, pos
+    if tag == b"F": return False, pos
+    if tag == b"i": return struct.unpack_from("<q", data, pos)[0], pos + 8
+    if tag == b"d": return struct.unpack_from("<d", data, pos)[0], pos + 8
+    if tag in (b"s", b"b", b"p"):
+        n, = struct.unpack_from("<I", data, pos)
+        raw = bytes(data[pos+4:pos+4+n])
+        pos += 4 + n
+        if tag == b"s": return raw.decode("utf-8", "surrogatepass"), pos
+        if tag == b"b": return raw, pos
+        if not allowpickle: raise ValueError("the trace has pickled arguments, which are only read if allowed")
+        return pickle.loads(raw), pos
+    if tag in (b"l", b"t"):
+        n, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        items = []
+        for i in range(n):
+            item, pos = decode(data, pos, allowpickle)
+            items.append(item)
+        return (items if tag == b"l" else tuple(items)), pos
+    if tag == b"m":
+        n, = struct.unpack_from("<I", data, pos)
+        pos += 4
+        d = {}
+        for i in range(n):
+            k, pos = decode(data, pos, allowpickle)
+            d[k], pos = decode(data, pos, allowpickle)
+        return d, pos
+    if tag == b"D":
+        (cols, cursorx, cursory, ops, params, chars), pos = decode(data, pos)
+        dl = DisplayList(cols)
+        dl.ops = [tuple(op) for op in ops.tolist()]
+        dl.params = [params] if len(params) else []
+        dl.nparams = len(params)
+        dl.chars = [tuple(c) for c in chars.tolist()]
+        dl.cursorx, dl.cursory = cursorx, cursory
+        return dl, pos
+    if tag == b"M":
+        (fillcode, fillattr, codes, attrs), pos = decode(data, pos)
+        tilemap = TileMap(codes.shape[1], codes.shape[0], fillcode, fillattr)
+        tilemap.codes[:], tilemap.attrs[:] = codes, attrs
+        return tilemap, pos
+    if tag == b"S":
+        (cols, rows, border, memory), pos = decode(data, pos)
+        screen = Screen(HEADLESS=True, COLS=cols, ROWS=rows)
+        screen.memory[0x4000:screen.screenend] = memory
+        screen.border = border
+        return screen, pos
+    if tag == b"a":
+        n, ndim = data[pos], data[pos+1]
+        dtype = np.dtype(bytes(data[pos+2:pos+2+n]).decode())
+        pos += 2 + n
+        shape = struct.unpack_from("<%dI" % ndim, data, pos)
+        pos += 4 * ndim
+        size = dtype.itemsize * int(np.prod(shape))
+        arr = np.frombuffer(data, dtype, int(np.prod(shape)), pos).reshape(shape).copy()
+        return arr, pos + size
+    raise ValueError("bad trace data")
+
+class Tracer:
+    """
+    Logs the calls made to a screen's upper-case methods. Made by ``TRACE``. This works by putting a wrapper for each
+    method on the screen object, and takes them away again when closed.
+
+    Args:
+
+    - screen - Screen - the screen to trace.
+    - path - string - the file to write.
+    """
+
+    def __init__(self, screen, path):
+        self.screen = screen
+        self.f = open(path, "wb")
+        self.f.write(HEADER.pack(MAGIC, screen.cols, screen.rows))
+        self.ids = {}
+        self.frames = 0
+        self.calls = 0
+        # How deep in traced calls we are, so that calls made by other calls aren't logged
+        self.depth = 0
+        self.names = [name for name in dir(Screen) if name.isupper() and callable(getattr(Screen, name))]
+        for name in self.names:
+            setattr(screen, name, self.wrap(name, getattr(screen, name)))
+        screen.framehooks.append(self)
+        atexit.register(self.close)
+
+    def wrap(self, name, method):
+        def call(*args, **kwargs):
+            if self.depth: return method(*args, **kwargs)
+            self.depth += 1
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                self.depth -= 1
+            self.write(name, args, kwargs, result if name in INPUTS else None)
+            return result
+        return call
+
+    def record(self, number, frame, payload):
+        self.f.write(CALL.pack(number, frame, len(payload)))
+        self.f.write(payload)
+
+    def write(self, name, args, kwargs, result):
+        if self.f.closed: return
+        number = self.ids.get(name)
+        if number is None:
+            number = self.ids[name] = len(self.ids)
+            self.record(NAME, number, name.encode())
+        payload = bytearray()
+        encode((args, kwargs, result), payload)
+        self.record(number, self.frames, payload)
+        self.calls += 1
+
+    def __call__(self, screen):
+        self.frames += 1
+
+    def close(self):
+        """Finishes the file and stops tracing."""
+        if self.f.closed: return
+        self.record(END, self.frames, self.screen.SCREENHASH().encode())
+        self.f.close()
+        for name in self.names:
+            self.screen.__dict__.pop(name, None)
+        if self in self.screen.framehooks: self.screen.framehooks.remove(self)
+        atexit.unregister(self.close)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Trace:
+    """
+    Reads a file written by ``TRACE``. Iterating over it gives ``(name, frame, args, kwargs, result)`` for each call.
+    ``hash`` is the ``SCREENHASH`` of the screen at the end, or None if the trace wasn't closed properly.
+
+    Args:
+
+    - path - string - the file to read.
+    - allowpickle - boolean - whether to read arguments that were pickled, which can run any code. Only allow this
+      for traces from somewhere you trust.
+    """
+
+    def __init__(self, path, allowpickle=False):
+        self.allowpickle = allowpickle
+        with open(path, "rb") as f:
+            self.data = f.read()
+        magic, self.cols, self.rows = HEADER.unpack_from(self.data)
+        if magic != MAGIC: raise ValueError("%s is not a specgfx trace" % path)
+        self.hash = None
+        self.frames = 0
+
+    def __iter__(self):
+        data = self.data
+        names = {}
+        pos = HEADER.size
+        while pos + CALL.size <= len(data):
+            number, frame, n = CALL.unpack_from(data, pos)
+            pos += CALL.size
+            if pos + n > len(data): break
+            payload = data[pos:pos+n]
+            pos += n
+            if number == NAME:
+                names[frame] = payload.decode()
+            elif number == END:
+                self.hash = payload.decode()
+                self.frames = frame
+            else:
+                (args, kwargs, result), end = decode(payload, 0, self.allowpickle)
+                yield names[number], frame, args, kwargs, result
+
+def replay(path, LUT=False, INDEXED=False, allowpickle=False):
+    """
+    Runs a trace again on a new headless screen, timing each call. Returns a report, as a dict with the number of
+    calls and frames, the time taken, the calls and frames a second, the hashes of the final screen when traced and
+    replayed, and for each kind of call, its count, total and mean time in seconds, and a histogram of times in ``BUCKETS``.
+
+    Args:
+
+    - path - string - the trace to replay.
+    - LUT - boolean - whether to render with a lookup table, as in ``INIT``.
+    - INDEXED - boolean - whether to render palette indices, as in ``INIT``.
+    - allowpickle - boolean - whether to read arguments that were pickled, see ``Trace``.
+    """
+    trace = Trace(path, allowpickle)
+    screen = Screen(HEADLESS=True, LUT=LUT, INDEXED=INDEXED, COLS=trace.cols, ROWS=trace.rows)
+    counter = time.perf_counter_ns
+    times = {}
+    frames = [0]
+    screen.framehooks.append(lambda s: frames.__setitem__(0, frames[0] + 1))
+    start = counter()
+    calls = 0
+    for name, frame, args, kwargs, result in trace:
+        t0 = counter()
+        if name == "INPUT":
+            # The prompt and what was typed, without waiting for the keyboard
+            screen.PRINT(*args, **dict(kwargs, end=kwargs.get("end", "")))
+            screen.PRINT(result)
+        elif name not in INPUTS:
+            getattr(screen, name)(*args, **kwargs)
+        times.setdefault(name, []).append(counter() - t0)
+        calls += 1
+    total = (counter() - start) / 1e9
+    report = {
+        "calls": calls,
+        "frames": frames[0],
+        "traced_frames": trace.frames,
+        "seconds": total,
+        "calls_per_second": calls / total if total else 0,
+        "frames_per_second": frames[0] / total if total else 0,
+        "traced_hash": trace.hash,
+        "hash": screen.SCREENHASH(),
+        "buckets": BUCKETS,
+        "methods": {},
+    }
+    for name, ts in sorted(times.items()):
+        ts = np.array(ts)
+        report["methods"][name] = {
+            "count": len(ts),
+            "total": ts.sum() / 1e9,
+            "mean": ts.mean() / 1e9,
+            "histogram": np.bincount(np.searchsorted(BUCKETS, ts, "right"), minlength=len(BUCKETS)+1).tolist(),
+        }
+    return report
+
+def TRACE(path, screen=None):
+    """
+    Starts tracing every call to the screen's upper-case commands to a file, for replaying with
+    ``python -m specgfx.replay``. Tracing stops when the program ends, or when the ``close`` method of
+    the returned ``Tracer`` is called.
+
+    Args:
+
+    - path - string - the file to write.
+    - screen - Screen - optional - the screen to trace. Defaults to the one made by ``INIT``.
+    """
+    return Tracer(screen or GETSCREEN(), path)
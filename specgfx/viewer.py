@@ -0,0 +1,95 @@
+"""
+Shows a screen streamed by ``SERVE`` (see ``specgfx.stream``), and sends keypresses back. Run with::
+
+    python -m specgfx.viewer host:5858
+    python -m specgfx.viewer unix:/tmp/specgfx.sock --sizex 2
+"""
+
+import sys
+import zlib
+import argparse
+
+import numpy as np
+
+from .specgfx import Screen, import_pygame
+from .stream import MAGIC, FRAME, KEY, KEYFRAME, PRESS, RELEASE, SCREENSTART, SCREENEND, connect, applyruns
+
+def recvexact(sock, n):
+    data = b""
+    while len(data) < n:
+        chunk = sock.recv(n - len(data))
+        if not chunk: raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+def view(address, SIZEX=1):
+    """
+    Connects to a stream and shows it in a window until either end closes.
+
+    Args:
+
+    - address - string - "host:port" or "unix:path".
+    - SIZEX - integer - size multiplier for the window.
+    """
+    pygame = import_pygame()
+    sock = connect(address)
+    if recvexact(sock, len(MAGIC)) != MAGIC: raise ConnectionError("not a specgfx stream")
+    sock.setblocking(False)
+
+    screen = Screen(SIZEX=SIZEX)
+    screen.init_display()
+    pygame.display.set_caption("specgfx - %s" % address)
+    mem = screen.memory[SCREENSTART:SCREENEND]
+    buf = b""
+    changed = False
+    while True:
+        try:
+            data = sock.recv(65536)
+            if not data: return
+            buf += data
+        except BlockingIOError:
+            pass
+        while len(buf) >= FRAME.size:
+            kind, border, flags, cursorx, cursory, n = FRAME.unpack_from(buf)
+            if len(buf) < FRAME.size + n: break
+            payload = buf[FRAME.size:FRAME.size+n]
+            buf = buf[FRAME.size+n:]
+            if kind == KEYFRAME:
+                mem[:] = np.frombuffer(zlib.decompress(payload), np.uint8)
+            else:
+                applyruns(payload, mem)
+            screen.border = border
+            screen.flashframe = bool(flags & 1)
+            screen.showcursor = bool(flags & 2)
+            screen.cursorx, screen.cursory = cursorx, cursory
+            changed = True
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                return
+            elif event.type == pygame.KEYDOWN:
+                u = event.unicode
+                sock.sendall(KEY.pack(PRESS, event.key, ord(u) if len(u) == 1 else 0))
+            elif event.type == pygame.KEYUP:
+                sock.sendall(KEY.pack(RELEASE, event.key, 0))
+
+        if changed:
+            screen.render()
+            pygame.display.flip()
+            changed = False
+        screen.clock.tick(60)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m specgfx.viewer", description="View a streamed specgfx screen.")
+    parser.add_argument("address", help="host:port or unix:path")
+    parser.add_argument("--sizex", type=int, default=1, help="size multiplier for the window")
+    args = parser.parse_args(argv)
+    try:
+        view(args.address, args.sizex)
+    except (ConnectionError, OSError) as e:
+        print("%s: %s" % (args.address, e), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
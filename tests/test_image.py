@@ -0,0 +1,20 @@
+import numpy as np
+
+from specgfx import Screen
+from specgfx.image import quantize
+
+def test_grey_dithers():
+    palette = Screen(HEADLESS=True).palette
+    grey = np.full((192, 256, 3), 100, dtype=np.uint8)
+    pixels, attrs = quantize(grey, palette, dither=True)
+    ink, paper = attrs % 8, (attrs // 8) % 8
+    assert (ink != paper).all()
+    # Both colours show, about as much of each as the grey is between them
+    assert 0.2 < pixels.mean() < 0.8
+
+def test_grey_without_dithering_is_one_colour():
+    palette = Screen(HEADLESS=True).palette
+    grey = np.full((192, 256, 3), 100, dtype=np.uint8)
+    pixels, attrs = quantize(grey, palette)
+    colour = np.where(pixels == 1, (attrs % 8).repeat(8, 0).repeat(8, 1), ((attrs // 8) % 8).repeat(8, 0).repeat(8, 1))
+    assert len(np.unique(colour)) == 1
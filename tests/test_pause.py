@@ -0,0 +1,25 @@
+import time
+
+import pytest
+
+from specgfx import Screen
+
+def pacedscreen(fps):
+    # A headless screen that keeps time by the clock, as a screen with a window does
+    screen = Screen(HEADLESS=True, FPS=fps)
+    screen.paced = True
+    screen.starttime = screen.nextframe = time.monotonic()
+    return screen
+
+@pytest.mark.parametrize("frames", [1, 5, 30])
+def test_paced_pause_length(frames):
+    screen = pacedscreen(100)
+    screen.UPDATE()
+    start = time.monotonic()
+    screen.PAUSE(frames)
+    assert abs((time.monotonic() - start) * 100 - frames) < 0.6
+
+def test_headless_pause_counts_frames():
+    screen = Screen(HEADLESS=True)
+    screen.PAUSE(10)
+    assert screen.frames == 10